@@ -0,0 +1,136 @@
+import asyncio
+import math
+import time
+
+"""
+Подписки на пересечение порогов.
+
+Потребитель регистрирует Subscription: колонка оценки (result(%) в root.py, % в root_futures_spot.py) выше enter,
+при желании только для символов symbols и пар бирж pairs. Scanner передаёт в Alerts строки только пересчитанных
+символов (как в OpportunityRanker), и каждая подписка сравнивает их со своим прошлым состоянием. Событие уходит,
+только когда строка пересекла порог:
+- enter - оценка выше enter;
+- exit - оценка опустилась до exit или ниже (exit < enter - гистерезис против дребезга у порога), либо строка пропала из таблицы;
+- update - строка активна и оценка изменилась не меньше чем на step.
+С debounce > 0 enter и exit отправляются, только если условие держится debounce секунд (проверяется при следующих пересчётах).
+Если пересчитанные символы не касаются подписки, она ничего не делает и потребитель не вызывается.
+"""
+
+
+class AlertEvent:
+    def __init__(self, kind, key, value, row, subscription, time) -> None:
+        self.kind = kind # enter, update или exit
+        self.key = key # (символ, биржа 1, биржа 2)
+        self.value = value # Оценка (NaN - строки больше нет в таблице)
+        self.row = row # {колонка: значение} последней строки
+        self.subscription = subscription
+        self.time = time # с
+
+    def __repr__(self) -> str:
+        symbol, exchange_1, exchange_2 = self.key
+        return f"{self.kind:<6} {symbol} {exchange_1}/{exchange_2} {self.subscription.column} {self.value:.4f}"
+
+
+class Subscription:
+    def __init__(self, callback, column, enter, exit=None, symbols=None, pairs=None, debounce=0.0, step=0.0) -> None:
+        self.callback = callback # callback(event) (может быть корутиной) или asyncio.Queue
+        self.column = column
+        self.enter = enter
+        self.exit = enter if exit is None else exit
+        self.symbols = set(symbols) if symbols is not None else None # None - все символы
+        self.pairs = set(pairs) if pairs is not None else None # {(биржа 1, биржа 2)}, None - все пары
+        self.debounce = debounce # с
+        self.step = step
+
+        self.active = {} # {ключ: (оценка последнего события, строка)}
+        self.pending = {} # {ключ: (время начала, оценка, строка)} - ждут debounce: вход неактивных, выход активных
+
+    def evaluate(self, key, value, row, now, events):
+        active = key in self.active
+        above = value > (self.exit if active else self.enter) # NaN - ниже любого порога
+        if active != above:
+            started = self.pending.get(key, (now,))[0]
+            self.pending[key] = (started, value, row)
+            if now - started >= self.debounce:
+                self._emit(key, value, row, now, events)
+            return
+        self.pending.pop(key, None)
+        if active and value != self.active[key][0] and abs(value - self.active[key][0]) >= self.step:
+            self.active[key] = (value, row)
+            events.append(AlertEvent('update', key, value, row, self, now))
+
+    def expire(self, now, events):
+        """Отправляет переходы, условие которых продержалось debounce секунд без новых данных"""
+        for key, (started, value, row) in list(self.pending.items()):
+            if now - started >= self.debounce:
+                self._emit(key, value, row, now, events)
+
+    def _emit(self, key, value, row, now, events):
+        del self.pending[key]
+        if key in self.active:
+            del self.active[key]
+            events.append(AlertEvent('exit', key, value, row, self, now))
+        else:
+            self.active[key] = (value, row)
+            events.append(AlertEvent('enter', key, value, row, self, now))
+
+
+class Alerts:
+    def __init__(self, column, symbol_column='symbol', pair_columns=('main_exchange', 'hadge_exchange')) -> None:
+        self.column = column # Колонка оценки по умолчанию
+        self.symbol_column = symbol_column
+        self.pair_columns = pair_columns # Колонки бирж первой и второй ноги
+        self.subscriptions = []
+
+    def subscribe(self, callback, enter, column=None, **options):
+        """Подписка на строки, у которых column (по умолчанию self.column) выше enter. options - как у Subscription"""
+        subscription = Subscription(callback, column or self.column, enter, **options)
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.subscriptions.remove(subscription)
+
+    def replace(self, symbols, table, now=None):
+        """Строки символов symbols заменены строками table. Возвращает [AlertEvent] по всем подпискам"""
+        events = []
+        if not self.subscriptions:
+            return events
+        now = time.time() if now is None else now
+        current = None
+        for subscription in self.subscriptions:
+            relevant = symbols if subscription.symbols is None else symbols & subscription.symbols
+            if relevant:
+                if current is None:
+                    current = self._rows(table)
+                seen = set()
+                for key, row in current.items():
+                    if key[0] in relevant and (subscription.pairs is None or key[1:] in subscription.pairs):
+                        seen.add(key)
+                        subscription.evaluate(key, row[subscription.column], row, now, events)
+                # Активные и ожидающие строки, которых больше нет в таблице, считаются упавшими ниже порога
+                missing = (subscription.active.keys() | subscription.pending.keys()) - seen
+                for key in [key for key in missing if key[0] in relevant]:
+                    row = subscription.active[key][1] if key in subscription.active else subscription.pending[key][2]
+                    subscription.evaluate(key, math.nan, row, now, events)
+            if subscription.pending:
+                subscription.expire(now, events)
+        return events
+
+    def _rows(self, table):
+        """{(символ, биржа 1, биржа 2): {колонка: значение}}"""
+        columns = list(table.columns)
+        keys = zip(*(table[column].tolist() for column in (self.symbol_column, *self.pair_columns)))
+        return {key: dict(zip(columns, values)) for key, values in zip(keys, zip(*(table[column].tolist() for column in columns)))}
+
+
+async def deliver(events):
+    """Передаёт события подписчикам: в callback (может быть корутиной) или в asyncio.Queue"""
+    for event in events:
+        target = event.subscription.callback
+        if isinstance(target, asyncio.Queue):
+            target.put_nowait(event)
+            continue
+        result = target(event)
+        if asyncio.iscoroutine(result):
+            await result
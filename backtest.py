@@ -0,0 +1,194 @@
+import argparse
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from exchanges import EXCHANGES
+from pairing import price_difference
+from scoring import opportunity_score
+import recorder
+
+"""
+Бэктест стратегий по истории recorder.py.
+
+История раскладывается в матрицы [время, символ] для каждой (биржи, рынка): ask, bid, ставка и время
+следующей выплаты (пропуски заполняются последним известным значением). Для каждой пары бирж все
+символы и весь период считаются сразу операциями NumPy, без цикла по времени:
+- вход, когда оценка (result(%) из root.py или % из root_futures_spot.py, с комиссиями) не ниже entry, выход - когда ниже exit;
+  состояние позиции - последнее событие входа/выхода (np.maximum.accumulate по индексам событий);
+- направление и цены входа фиксируются в момент входа, на каждую ногу открывается notional в USDT;
+- выплата финансирования - шаг, на котором время следующей выплаты сдвинулось вперёд, по ставке до выплаты;
+- комиссии TAKER_FEE или MAKER_FEE бирж с каждой сделки, открытые в конце периода позиции закрываются по последним ценам.
+Пары бирж считаются независимо: один символ может быть открыт на нескольких парах одновременно.
+"""
+
+FEES = {cls.name: {'taker': cls.TAKER_FEE, 'maker': cls.MAKER_FEE} for cls in EXCHANGES}
+
+REPORT_COLUMNS = ['strategy', 'exchange_1', 'exchange_2', 'trades', 'funding', 'price_pnl', 'fees', 'pnl', 'turnover']
+
+
+def ffill(values):
+    """Протягивает последнее известное (не NaN) значение вниз по оси времени"""
+    index = np.where(np.isnan(values), 0, np.arange(len(values))[:, None])
+    np.maximum.accumulate(index, axis=0, out=index)
+    return values[index, np.arange(values.shape[1])]
+
+
+class Panels:
+    """История в виде матриц [время, символ] по каждой паре (биржа, рынок)"""
+    def __init__(self, times, symbols, data) -> None:
+        self.times = times # мс
+        self.symbols = symbols # Стандартные символы по колонкам
+        self.data = data # {(биржа, рынок): {'ask', 'bid', 'rate', 'time': матрица [время, символ]}}
+
+    @classmethod
+    def from_history(cls, history, resample=None):
+        """history - pyarrow.Table или DataFrame в формате recorder ('markets'). resample - шаг сетки времени, с"""
+        if not isinstance(history, pd.DataFrame):
+            history = history.to_pandas()
+        history = history.sort_values('time', kind='stable')
+        moments = history['time'].to_numpy(dtype=np.int64)
+        if resample:
+            moments = moments // int(resample * 1000) * int(resample * 1000)
+        times, time_index = np.unique(moments, return_inverse=True)
+        symbol_index, symbols = pd.factorize(history['symbol'].astype(str))
+
+        data = {}
+        groups = history.groupby([history['exchange'].astype(str), history['market'].astype(str)], sort=False).indices
+        for key, rows in groups.items():
+            grids = {}
+            for column, field in (('ask', 'ask'), ('bid', 'bid'), ('rate', 'funding_rate'), ('time', 'next_funding_time')):
+                grid = np.full((len(times), len(symbols)), np.nan)
+                grid[time_index[rows], symbol_index[rows]] = history[field].to_numpy(dtype=float)[rows] # Позже записанное значение шага побеждает
+                grids[column] = ffill(grid)
+            data[key] = grids
+        return cls(times, np.asarray(symbols, dtype=object), data)
+
+
+def settlements(next_time, held_before):
+    """Индексы (шаг, символ) выплат, прошедших между шагами t-1 и t, пока позиция была открыта"""
+    moved = np.zeros(next_time.shape, dtype=bool)
+    with np.errstate(invalid='ignore'):
+        np.greater(next_time[1:], next_time[:-1], out=moved[1:])
+    moved &= held_before
+    return np.nonzero(moved)
+
+
+def simulate(leg_1, leg_2, side_1, score, notional, fee_1, fee_2, entry, exit, funding_2=True):
+    """Позиции одной пары по всем символам сразу. side_1 - матрица +1 (LONG) / -1 (SHORT) ноги 1, нога 2 всегда противоположна.
+    Возвращает суммы по всем символам: сделки, финансирование, PnL по ценам, комиссии, оборот"""
+    steps, count = score.shape
+    columns = np.arange(count)
+    rows = np.arange(steps)[:, None]
+
+    # Состояние позиции: последнее событие входа (1) или выхода (0)
+    with np.errstate(invalid='ignore'):
+        event = np.where(score >= entry, 1, np.where(score >= exit, -1, 0))
+    last = np.where(event >= 0, rows, -1)
+    np.maximum.accumulate(last, axis=0, out=last)
+    held = (last >= 0) & (event[np.maximum(last, 0), columns] == 1)
+
+    before = np.zeros_like(held)
+    before[1:] = held[:-1]
+    # Шаг входа текущей позиции: направление и цены входа фиксируются на нём и действуют до выхода
+    opened = np.where(held & ~before, rows, 0)
+    np.maximum.accumulate(opened, axis=0, out=opened)
+
+    # Сделки считаются только в точках выхода (и принудительного закрытия в конце периода)
+    ends = before & ~held
+    ends[-1] |= held[-1]
+    step, column = np.nonzero(ends)
+    start = opened[step, column]
+    side = side_1[start, column]
+    short = side < 0
+
+    entry_1 = np.where(short, leg_1['bid'][start, column], leg_1['ask'][start, column])
+    entry_2 = np.where(short, leg_2['ask'][start, column], leg_2['bid'][start, column])
+    exit_1 = np.where(short, leg_1['ask'][step, column], leg_1['bid'][step, column])
+    exit_2 = np.where(short, leg_2['bid'][step, column], leg_2['ask'][step, column])
+    quantity_1, quantity_2 = notional / entry_1, notional / entry_2
+    price_pnl = side * quantity_1 * (exit_1 - entry_1) - side * quantity_2 * (exit_2 - entry_2)
+
+    trades = len(step)
+    turnover = 2 * notional * trades + np.nansum(quantity_1 * exit_1 + quantity_2 * exit_2)
+    fees = (fee_1 + fee_2) * notional * trades + np.nansum(quantity_1 * exit_1 * fee_1 + quantity_2 * exit_2 * fee_2)
+
+    # Финансирование по ставке до выплаты на позицию, открытую на шаге t-1. LONG платит положительную ставку, SHORT получает
+    funding = 0.0
+    for leg, sign in ((leg_1, 1), (leg_2, -1)) if funding_2 else ((leg_1, 1),):
+        step, column = settlements(leg['time'], before)
+        start = opened[step, column]
+        side = sign * side_1[start, column]
+        price = np.where(side < 0, leg['bid'][start, column], leg['ask'][start, column])
+        mid = (leg['ask'][step - 1, column] + leg['bid'][step - 1, column]) / 2
+        funding += np.nansum(-side * notional / price * mid * leg['rate'][step - 1, column])
+    return trades, funding, np.nansum(price_pnl), fees, turnover
+
+
+def backtest(panels, strategy='futures', notional=1000.0, entry=0.1, exit=0.0, fee='taker', chunk=512):
+    """Отчёт по парам бирж. strategy: futures (фьючерс + фьючерс, root.py) или spot (фьючерс + спот, root_futures_spot.py).
+    entry/exit - пороги оценки в %, notional - объём каждой ноги в USDT"""
+    futures = sorted(key[0] for key in panels.data if key[1] == 'futures')
+    if strategy == 'futures':
+        pairs = [((first, 'futures'), (second, 'futures')) for first, second in itertools.permutations(futures, 2)]
+    else:
+        spot = sorted(key[0] for key in panels.data if key[1] == 'spot')
+        pairs = [((first, 'futures'), (second, 'spot')) for first in futures for second in spot]
+
+    report = []
+    for key_1, key_2 in pairs:
+        fee_1, fee_2 = FEES.get(key_1[0], {}).get(fee, 0.0), FEES.get(key_2[0], {}).get(fee, 0.0)
+        totals = np.zeros(5)
+        for start in range(0, len(panels.symbols), chunk):
+            window = slice(start, start + chunk)
+            leg_1 = {column: values[:, window] for column, values in panels.data[key_1].items()}
+            leg_2 = {column: values[:, window] for column, values in panels.data[key_2].items()}
+            rate_1 = leg_1['rate'] * 100
+
+            if strategy == 'futures':
+                short = ~(rate_1 < 0)
+                price_1 = np.where(short, leg_1['bid'], leg_1['ask'])
+                price_2 = np.where(short, leg_2['ask'], leg_2['bid'])
+                score = opportunity_score(rate_1, price_difference(short, price_1, price_2), (fee_1 * 2 + fee_2 * 2) * 100,
+                                          rate_2=leg_2['rate'] * 100, time_1=leg_1['time'], time_2=leg_2['time'])
+                with np.errstate(invalid='ignore'):
+                    score[leg_1['time'] > leg_2['time']] = np.nan # Как в root.py: выплата на основной бирже не позже хеджа
+                side_1 = np.where(short, -1, 1)
+            else:
+                score = opportunity_score(rate_1, 100 - leg_2['ask'] / leg_1['bid'] * 100, (fee_1 + fee_2) * 2 * 100)
+                side_1 = np.full(score.shape, -1) # SHORT фьючерс, LONG спот
+
+            totals += simulate(leg_1, leg_2, side_1, score, notional, fee_1, fee_2, entry, exit, funding_2=strategy == 'futures')
+        trades, funding, price_pnl, fees, turnover = totals
+        report.append([strategy, key_1[0], key_2[0], int(trades), funding, price_pnl, fees, funding + price_pnl - fees, turnover])
+
+    report = pd.DataFrame(report, columns=REPORT_COLUMNS)
+    return report.sort_values(by='pnl', ascending=False).reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бэктест по истории, записанной с --record")
+    parser.add_argument("directory", help="Каталог истории (--record DIR)")
+    parser.add_argument("--strategy", choices=["futures", "spot"], default="futures", help="futures - фьючерс + фьючерс, spot - фьючерс + спот")
+    parser.add_argument("--start", help="Первый день YYYY-MM-DD")
+    parser.add_argument("--end", help="Последний день YYYY-MM-DD")
+    parser.add_argument("--resample", type=float, default=60, help="Шаг сетки времени, с")
+    parser.add_argument("--notional", type=float, default=1000, help="Объём каждой ноги, USDT")
+    parser.add_argument("--entry", type=float, default=0.1, help="Порог входа по оценке, %%")
+    parser.add_argument("--exit", type=float, default=0.0, help="Порог выхода по оценке, %%")
+    parser.add_argument("--fee", choices=["taker", "maker"], default="taker")
+    args = parser.parse_args()
+
+    history = recorder.read(args.directory, 'markets', args.start, args.end)
+    if history is None:
+        raise SystemExit(f"В {args.directory} нет записанной истории")
+    panels = Panels.from_history(history, args.resample)
+    report = backtest(panels, args.strategy, args.notional, args.entry, args.exit, args.fee)
+    print(f"{len(panels.times)} steps x {len(panels.symbols)} symbols")
+    print(report)
+    print(report[['trades', 'funding', 'price_pnl', 'fees', 'pnl', 'turnover']].sum())
+
+
+if __name__ == "__main__":
+    main()
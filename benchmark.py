@@ -0,0 +1,938 @@
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import time
+import tracemalloc
+from email.utils import parsedate_to_datetime
+from functools import partial
+import httpx
+import numpy as np
+import pandas as pd
+
+from http_client import ClientManager, client_manager
+from rate_limit import HOST_LIMITS, RequestScheduler
+from mock_exchange import MockExchange
+import capture
+from pairing import PAIR_COLUMNS, pair_futures
+from scoring import annualized_score, opportunity_score
+from decoder import BACKEND, loads
+from exchanges import EXCHANGES, Instruments, dig
+from market_store import MarketStore, symbol_table
+from symbol_registry import symbol_registry
+from ranker import OpportunityRanker
+from alerts import Alerts
+from settlement import SettlementCalendar
+from clock import server_clock
+from recorder import Recorder, read
+from backtest import Panels, backtest
+from scanner import Scanner
+from shards import ShardedScanner
+from loop_lag import LoopLagMonitor
+from metrics import metrics
+import root
+import root_futures_spot
+
+"""
+Бенчмарки сканера. Все замеры выполняются локально, без обращения к реальным биржам.
+
+python benchmark.py http --cycles 10 --handshake-delay 0.05
+python benchmark.py pairing --exchanges 10 --symbols 3000
+python benchmark.py scoring --rows 10000 100000 1000000
+python benchmark.py ratelimit --symbols 100
+python benchmark.py decode --symbols 2000 [--payloads DIR]
+python benchmark.py ranker --rows 50000 --updates 1000
+python benchmark.py alerts --rows 50000 --updates 1000
+python benchmark.py settlement --symbols 500 --window 10 --hours 24
+python benchmark.py clock --skew 2.345 --latency 0.05 --jitter 0.03 --requests 100
+python benchmark.py recorder --exchanges 4 --symbols 3000 --cycles 200
+python benchmark.py backtest --days 30 --step 300 --symbols 300
+python benchmark.py shards --symbols 3000 --workers 4 --seconds 10
+python benchmark.py offload --symbols 3000 --seconds 10
+python benchmark.py metrics --symbols 3000 --cycles 20
+python benchmark.py replay [--capture DIR] --strategy spot --latency 0.05 --jitter 0.02 --errors 0.01
+"""
+
+# Один цикл сканирования root_futures_spot.py: {биржа: [(хост, [пути одного блока запросов])]}
+# До общего пула каждый блок открывал свой httpx.AsyncClient()
+MEXC_FUNDING_SYMBOLS = 40
+SCAN_CYCLE = {
+    "Bybit": [
+        ("api.bybit.com", ["/v5/market/tickers?category=linear"]),
+        ("api.bybit.com", ["/v5/market/tickers?category=spot"]),
+    ],
+    "Mexc": [
+        ("contract.mexc.com", ["/api/v1/contract/ticker"]),
+        ("contract.mexc.com", [f"/api/v1/contract/funding_rate/S{i}_USDT" for i in range(MEXC_FUNDING_SYMBOLS)]),
+        ("api.mexc.com", ["/api/v3/ticker/bookTicker"]),
+    ],
+    "Bingx": [
+        ("open-api.bingx.com", ["/openApi/swap/v2/quote/ticker"]),
+        ("open-api.bingx.com", ["/openApi/swap/v2/quote/premiumIndex"]),
+        ("open-api.bingx.com", ["/openApi/spot/v1/ticker/24hr"]),
+    ],
+    "Kucoin": [
+        ("api-futures.kucoin.com", ["/api/v1/allTickers"]),
+        ("api-futures.kucoin.com", ["/api/v1/contracts/active"]),
+        ("api.kucoin.com", ["/api/v1/market/allTickers"]),
+    ],
+}
+
+
+async def _scan_fresh_clients(servers):
+    """Старое поведение: новый клиент (и новое соединение) на каждый блок запросов"""
+    async def exchange_scan(blocks):
+        for host, paths in blocks:
+            async with httpx.AsyncClient() as client:
+                await asyncio.gather(*(client.get(servers[host].base_url + path) for path in paths))
+
+    await asyncio.gather(*(exchange_scan(blocks) for blocks in SCAN_CYCLE.values()))
+
+
+async def _scan_shared_clients(servers, manager):
+    async def exchange_scan(blocks):
+        for host, paths in blocks:
+            await asyncio.gather(*(manager.get(servers[host].base_url + path) for path in paths))
+
+    await asyncio.gather(*(exchange_scan(blocks) for blocks in SCAN_CYCLE.values()))
+
+
+async def bench_http(args):
+    hosts = {host for blocks in SCAN_CYCLE.values() for host, _ in blocks}
+    servers = {host: MockExchange(latency=args.latency, handshake_delay=args.handshake_delay) for host in hosts}
+    await asyncio.gather(*(server.start() for server in servers.values()))
+
+    manager = ClientManager(http2=False)
+    modes = [
+        ("new AsyncClient per request", lambda: _scan_fresh_clients(servers)),
+        ("shared ClientManager", lambda: _scan_shared_clients(servers, manager)),
+    ]
+    try:
+        print(f"{'mode':<30}{'handshakes/cycle':>18}{'requests/cycle':>16}{'ms/cycle':>10}")
+        for name, scan in modes:
+            for server in servers.values():
+                server.reset_counters()
+            started = time.perf_counter()
+            for _ in range(args.cycles):
+                await scan()
+            elapsed = (time.perf_counter() - started) / args.cycles
+            connections = sum(server.connections for server in servers.values())
+            requests = sum(server.requests for server in servers.values())
+            print(f"{name:<30}{connections / args.cycles:>18.1f}{requests / args.cycles:>16.1f}{elapsed * 1000:>10.1f}")
+    finally:
+        await manager.close()
+        await asyncio.gather(*(server.stop() for server in servers.values()))
+
+
+class SyntheticExchange:
+    """Биржа со случайным состоянием в формате exchanges.ExchangeAdapter (ставки и комиссии в долях)"""
+    def __init__(self, name, symbols, rng) -> None:
+        self.name = name
+        self.TAKER_FEE = float(rng.choice([0.0002, 0.0005, 0.0006, 0.0011]))
+        listed = [symbol for symbol in symbols if rng.random() < 0.7]
+        mid = rng.uniform(0.01, 100, len(listed))
+        spread = mid * rng.uniform(0.0001, 0.002, len(listed))
+        rates = rng.normal(0, 0.001, len(listed))
+        times = rng.choice([1_000_000, 2_000_000, 3_000_000], len(listed))
+        self.funding_rates = dict(zip(listed, rates.tolist()))
+        self.symbols_prices = {symbol: {'ask': a, 'bid': b} for symbol, a, b in zip(listed, (mid + spread).tolist(), (mid - spread).tolist())}
+        self.rate_times = {symbol: t for symbol, t in zip(listed, times.tolist()) if rng.random() < 0.9}
+
+        # То же состояние в колонках MarketStore, как у ExchangeAdapter (словари выше - для прежней реализации)
+        self.futures_market = MarketStore()
+        symbol_registry.update(name, 'futures', listed)
+        ids = np.array([self.futures_market.intern(symbol) for symbol in listed], dtype=np.intp)
+        self.futures_market.update(ids, ask=mid + spread, bid=mid - spread, rate=rates,
+                                   time=[self.rate_times.get(symbol, np.nan) for symbol in listed])
+
+    def get_name(self):
+        return self.name
+
+
+def _pair_futures_loop(objects):
+    """Прежняя реализация из root.py:main - вложенные циклы по биржам и символам (ставки и комиссии в %)"""
+    percent = {exchange: {key: value * 100 for key, value in exchange.funding_rates.items()} for exchange in objects}
+    main_dict = []
+    for exchange in objects:
+        sorted_dict = dict(sorted(percent[exchange].items(), key=lambda item: abs(item[1]), reverse=True))
+        filtered_dict = {key: value for key, value in sorted_dict.items() if abs(value) >= 0.1}
+        for key, value in filtered_dict.items():
+            for haghe_exchange in objects:
+                if key in percent[haghe_exchange] and exchange != haghe_exchange:
+                    if value < 0:
+                        price_main_symbol = exchange.symbols_prices[key]['ask']
+                        price_hedge_symbol = haghe_exchange.symbols_prices[key]['bid']
+                        final_difference = 100 - price_main_symbol / price_hedge_symbol * 100
+                        main_route, hedge_route = "LONG", "SHORT"
+                    else:
+                        price_main_symbol = exchange.symbols_prices[key]['bid']
+                        price_hedge_symbol = haghe_exchange.symbols_prices[key]['ask']
+                        final_difference = 100 - price_hedge_symbol / price_main_symbol * 100
+                        main_route, hedge_route = "SHORT", "LONG"
+                    time_1 = exchange.rate_times.get(key)
+                    time_2 = haghe_exchange.rate_times.get(key)
+                    fee = exchange.TAKER_FEE * 100 * 2 + haghe_exchange.TAKER_FEE * 100 * 2
+                    main_dict.append([key, exchange.get_name(), main_route, haghe_exchange.get_name(), hedge_route, value, percent[haghe_exchange][key], price_main_symbol, price_hedge_symbol, final_difference, fee, time_1, time_2])
+    return pd.DataFrame(main_dict, columns=PAIR_COLUMNS[:-2]) # Интервалов выплат прежняя реализация не знала
+
+
+def _timeit(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def bench_pairing(args):
+    rng = np.random.default_rng(args.seed)
+    symbols = [f"S{i}/USDT" for i in range(args.symbols)]
+    objects = [SyntheticExchange(f"Exchange{i}", symbols, rng) for i in range(args.exchanges)]
+
+    loop_time, loop_table = _timeit(lambda: _pair_futures_loop(objects), args.repeat)
+    vector_time, vector_table = _timeit(lambda: pair_futures(objects, scale=100), args.repeat)
+
+    key = ['symbol', 'main_exchange', 'hadge_exchange']
+    loop_table = loop_table.sort_values(key).reset_index(drop=True)
+    vector_table = vector_table.sort_values(key).reset_index(drop=True)[loop_table.columns]
+    pd.testing.assert_frame_equal(loop_table, vector_table, check_dtype=False)
+
+    print(f"{args.exchanges} exchanges x {args.symbols} symbols -> {len(vector_table)} pairs")
+    print(f"{'nested loop':<15}{loop_time * 1000:>10.1f} ms")
+    print(f"{'vectorized':<15}{vector_time * 1000:>10.1f} ms  x{loop_time / vector_time:.1f}")
+
+
+def _score_nested_where(dataFrame):
+    """Прежний расчёт result(%) из root.py:main"""
+    result = np.where(
+        (dataFrame['time_1'] == dataFrame['time_2']) |
+        (pd.isna(dataFrame['time_1']) | pd.isna(dataFrame['time_2'])),
+        np.where(
+            (dataFrame['rate_1(%)'] > 0) & (dataFrame['rate_2(%)'] > 0),
+            dataFrame['rate_1(%)'] - dataFrame['rate_2(%)'],
+            np.where(
+                (dataFrame['rate_1(%)'] < 0) & (dataFrame['rate_2(%)'] < 0),
+                abs(dataFrame['rate_1(%)']) - abs(dataFrame['rate_2(%)']),
+                np.where(
+                    (dataFrame['rate_1(%)'] > 0) & (dataFrame['rate_2(%)'] < 0),
+                    abs(dataFrame['rate_1(%)']) + abs(dataFrame['rate_2(%)']),
+                    np.where(
+                        (dataFrame['rate_1(%)'] < 0) & (dataFrame['rate_2(%)'] > 0),
+                        abs(dataFrame['rate_1(%)']) + abs(dataFrame['rate_2(%)']),
+                        abs(dataFrame['rate_1(%)'])
+                    )
+                )
+            )
+        ),
+        abs(dataFrame['rate_1(%)'])
+    )
+    result = result + dataFrame['price_difference(%)']
+    return result - dataFrame['fee(%)']
+
+
+def _score_kernel(dataFrame):
+    return opportunity_score(
+        dataFrame['rate_1(%)'].to_numpy(),
+        dataFrame['price_difference(%)'].to_numpy(),
+        dataFrame['fee(%)'].to_numpy(),
+        rate_2=dataFrame['rate_2(%)'].to_numpy(),
+        time_1=dataFrame['time_1'].to_numpy(),
+        time_2=dataFrame['time_2'].to_numpy(),
+    )
+
+
+def bench_scoring(args):
+    rng = np.random.default_rng(args.seed)
+    print(f"{'rows':>10}{'nested np.where':>18}{'kernel':>12}{'speedup':>10}{'apr kernel':>14}")
+    for rows in args.rows:
+        times = rng.choice([1_000_000, 2_000_000, np.nan], rows)
+        dataFrame = pd.DataFrame({
+            'rate_1(%)': rng.choice([-0.3, -0.1, 0.0, 0.1, 0.3], rows) * rng.random(rows),
+            'rate_2(%)': rng.choice([-0.3, -0.1, 0.0, 0.1, 0.3], rows) * rng.random(rows),
+            'price_difference(%)': rng.normal(0, 0.5, rows),
+            'fee(%)': rng.choice([0.14, 0.26, 0.32], rows),
+            'time_1': times,
+            'time_2': np.where(rng.random(rows) < 0.7, times, 2_000_000),
+            'interval_1(h)': rng.choice([1, 4, 8, np.nan], rows),
+            'interval_2(h)': rng.choice([1, 4, 8, np.nan], rows),
+        })
+        old_time, old = _timeit(lambda: _score_nested_where(dataFrame), args.repeat)
+        new_time, new = _timeit(lambda: _score_kernel(dataFrame), args.repeat)
+        np.testing.assert_allclose(np.asarray(old), new)
+        apr_time, _ = _timeit(lambda: annualized_score(
+            dataFrame['rate_1(%)'].to_numpy(), dataFrame['price_difference(%)'].to_numpy(), dataFrame['fee(%)'].to_numpy(),
+            dataFrame['interval_1(h)'].to_numpy(), dataFrame['time_1'].to_numpy(), rate_2=dataFrame['rate_2(%)'].to_numpy(),
+            interval_2=dataFrame['interval_2(h)'].to_numpy(), time_2=dataFrame['time_2'].to_numpy(), now=0), args.repeat)
+        print(f"{rows:>10}{old_time * 1000:>15.2f} ms{new_time * 1000:>9.2f} ms{old_time / new_time:>9.1f}x{apr_time * 1000:>11.2f} ms")
+
+
+def _ticker_payload(endpoint, symbols, rng, numbers_as_strings):
+    """Ответ в формате endpoint: строки с нужными полями и несколькими лишними, как у биржи"""
+    rows = []
+    for symbol in symbols:
+        mid = rng.uniform(0.01, 100)
+        values = {
+            endpoint.symbol: symbol,
+            endpoint.ask: mid * 1.0005,
+            endpoint.bid: mid * 0.9995,
+            endpoint.funding_rate: rng.normal(0, 0.001),
+            endpoint.next_funding_time: 1_700_000_000_000,
+            'volume24h': rng.uniform(0, 1e9), 'turnover24h': rng.uniform(0, 1e9),
+            'highPrice24h': mid * 1.1, 'lowPrice24h': mid * 0.9, 'lastPrice': mid,
+        }
+        values.pop(None, None)
+        rows.append({key: str(value) if numbers_as_strings and key != endpoint.symbol else value for key, value in values.items()})
+    payload = rows
+    for part in reversed(endpoint.rows.split('.') if endpoint.rows else []):
+        payload = {part: payload}
+    return json.dumps(payload).encode()
+
+
+def _measure(function, repeat):
+    """(лучшее время в с, пик выделенной памяти в байтах)"""
+    seconds, _ = _timeit(function, repeat)
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def bench_decode(args):
+    """Разбор ответов с тикерами: json + float по строкам против RowsDecoder. --payloads - каталог с записанными ответами"""
+    rng = np.random.default_rng(args.seed)
+    print(f"decoder backend: {BACKEND}")
+    print(f"{'endpoint':<45}{'rows':>6}{'json+float':>12}{'loads':>9}{'records':>9}{'KiB json':>10}{'KiB rec':>9}")
+    for cls in EXCHANGES:
+        for endpoint in cls.tickers:
+            name = f"{cls.name} {endpoint.market} {endpoint.url.split('/')[-1]}"
+            path = os.path.join(args.payloads, name.replace(' ', '_').replace('?', '_') + ".json") if args.payloads else None
+            if path and os.path.exists(path):
+                with open(path, 'rb') as file:
+                    content = file.read()
+            else:
+                symbols = [f"S{i}USDT" for i in range(args.symbols)]
+                content = _ticker_payload(endpoint, symbols, rng, numbers_as_strings=cls.name != "Mexc")
+
+            exchange = cls()
+            for row in dig(json.loads(content), endpoint.rows):
+                exchange.primary_data[row[endpoint.symbol]] = row[endpoint.symbol]
+                exchange.primary_data_spot[row[endpoint.symbol]] = row[endpoint.symbol]
+                exchange.symbols_prices[row[endpoint.symbol]] = {'ask': 1.0, 'bid': 1.0}
+
+            def stdlib():
+                exchange.parse_tickers(endpoint, json.loads(content))
+
+            def fast_loads():
+                exchange.parse_tickers(endpoint, loads(content))
+
+            def records():
+                exchange.parse_records(endpoint, endpoint.decoder.decode(content))
+
+            stdlib_time, stdlib_peak = _measure(stdlib, args.repeat)
+            loads_time, _ = _measure(fast_loads, args.repeat)
+            if endpoint.decoder.decode(content) is None:
+                records_time, records_peak = float('nan'), float('nan')
+            else:
+                records_time, records_peak = _measure(records, args.repeat)
+            rows = len(dig(json.loads(content), endpoint.rows))
+            print(f"{name:<45}{rows:>6}{stdlib_time * 1000:>10.2f}ms{loads_time * 1000:>7.2f}ms{records_time * 1000:>7.2f}ms"
+                  f"{stdlib_peak / 1024:>10.0f}{records_peak / 1024:>9.0f}")
+
+
+def bench_ranker(args):
+    """Обновление строк одного символа: concat + полная сортировка (прежний Scanner) против OpportunityRanker"""
+    rng = np.random.default_rng(args.seed)
+    symbols = np.array([f"S{i}/USDT" for i in range(args.rows // args.per_symbol)], dtype=object)
+
+    def rows_for(chosen):
+        count = len(chosen) * args.per_symbol
+        return pd.DataFrame({'symbol': np.repeat(chosen, args.per_symbol), 'result(%)': rng.normal(0, 1, count), 'price': rng.uniform(1, 2, count)})
+
+    table = rows_for(symbols).sort_values(by='result(%)', ascending=False)
+    ranker = OpportunityRanker('result(%)', 'symbol', args.top)
+    ranker.replace(symbols, table)
+    updates = [rows_for(symbols[rng.integers(len(symbols), size=1)]) for _ in range(args.updates)]
+
+    def full_sort():
+        nonlocal table
+        for rows in updates:
+            changed = set(rows['symbol'])
+            table = pd.concat([table[~table['symbol'].isin(changed)], rows]).sort_values(by='result(%)', ascending=False)
+            table.head(args.top)
+
+    def ranked():
+        for rows in updates:
+            ranker.replace(set(rows['symbol']), rows)
+            ranker.top()
+
+    full_time, _ = _timeit(full_sort, 1)
+    ranker_time, _ = _timeit(ranked, 1)
+    print(f"{len(table)} rows, {args.updates} updates of one symbol, top {args.top}")
+    print(f"{'concat + sort':<15}{full_time / args.updates * 1e6:>10.0f} us/update")
+    print(f"{'ranker':<15}{ranker_time / args.updates * 1e6:>10.0f} us/update  x{full_time / ranker_time:.1f}")
+
+
+def bench_alerts(args):
+    """Поиск пересечений порога после обновления одного символа: сравнение полных таблиц (merge) против Alerts"""
+    rng = np.random.default_rng(args.seed)
+    symbols = np.array([f"S{i}/USDT" for i in range(args.rows // args.per_symbol)], dtype=object)
+    pairs = [(f"E{i}", f"E{j}") for i in range(5) for j in range(5) if i != j][:args.per_symbol]
+
+    def rows_for(chosen):
+        count = len(chosen) * len(pairs)
+        return pd.DataFrame({'symbol': np.repeat(chosen, len(pairs)), 'main_exchange': [pair[0] for pair in pairs] * len(chosen),
+                             'hadge_exchange': [pair[1] for pair in pairs] * len(chosen), 'result(%)': rng.normal(0, 1, count)})
+
+    table = rows_for(symbols)
+    updates = [rows_for(symbols[rng.integers(len(symbols), size=1)]) for _ in range(args.updates)]
+    keys = ['symbol', 'main_exchange', 'hadge_exchange']
+    counts = {}
+
+    def diff_tables():
+        nonlocal table
+        events = 0
+        for rows in updates:
+            changed = set(rows['symbol'])
+            current = pd.concat([table[~table['symbol'].isin(changed)], rows])
+            merged = table.merge(current, on=keys, how='outer', suffixes=('_old', '_new'))
+            before, after = merged['result(%)_old'] > args.threshold, merged['result(%)_new'] > args.threshold
+            events += int((before != after).sum())
+            table = current
+        counts['diff'] = events
+
+    alerts = Alerts('result(%)')
+    alerts.subscribe(lambda event: None, args.threshold)
+    alerts.replace(set(symbols), table)
+
+    def subscribed():
+        counts['alerts'] = sum(sum(event.kind != 'update' for event in alerts.replace(set(rows['symbol']), rows)) for rows in updates)
+
+    initial = table
+    diff_time, _ = _timeit(diff_tables, 1)
+    table = initial
+    alerts_time, _ = _timeit(subscribed, 1)
+    print(f"{len(table)} rows, {args.updates} updates of one symbol, threshold {args.threshold}")
+    print(f"{'merge tables':<15}{diff_time / args.updates * 1e6:>10.0f} us/update{counts['diff']:>8} crossings")
+    print(f"{'alerts':<15}{alerts_time / args.updates * 1e6:>10.0f} us/update{counts['alerts']:>8} crossings  x{diff_time / alerts_time:.1f}")
+
+
+def bench_recorder(args):
+    """Стоимость записи одного цикла в цикле событий, время сброса на диск и чтения через memory map"""
+    import tempfile
+    rng = np.random.default_rng(args.seed)
+    symbols = [f"S{i}/USDT" for i in range(args.symbols)]
+    objects = [SyntheticExchange(f"Exchange{i}", symbols, rng) for i in range(args.exchanges)]
+    for exchange in objects:
+        exchange.spot_market = MarketStore()
+    table = pair_futures(objects, scale=100).head(50)
+
+    with tempfile.TemporaryDirectory() as directory:
+        recorder = Recorder(directory, args.format, flush_rows=10 ** 12, flush_interval=float('inf'))
+        started = time.perf_counter()
+        for cycle in range(args.cycles):
+            recorder.record_markets(objects, timestamp=1_700_000_000_000 + cycle * 2000)
+            recorder.record_table('futures_futures', table, timestamp=1_700_000_000_000 + cycle * 2000)
+        record_time = time.perf_counter() - started
+        rows = recorder.rows
+
+        started = time.perf_counter()
+        recorder.flush()
+        flush_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        history = read(directory, 'markets')
+        read_time = time.perf_counter() - started
+        assert history.num_rows == rows - len(table) * args.cycles
+
+        size = sum(os.path.getsize(os.path.join(path, name)) for path, _, names in os.walk(directory) for name in names)
+        print(f"{args.cycles} cycles, {rows} rows, {args.format}")
+        print(f"{'record':<10}{record_time / args.cycles * 1e6:>10.0f} us/cycle (in the event loop)")
+        print(f"{'flush':<10}{flush_time * 1000:>10.0f} ms ({size / 2 ** 20:.1f} MiB)")
+        print(f"{'read':<10}{read_time * 1000:>10.0f} ms")
+
+
+def synthetic_panels(exchanges, symbols, steps, step, rng):
+    """История в формате backtest.Panels: общие блуждающие цены, ставки с шумом, выплаты каждые 8 часов"""
+    times = 1_700_000_000_000 + np.arange(steps, dtype=np.int64) * step * 1000
+    mid = np.exp(np.cumsum(rng.normal(0, 0.001, (steps, symbols)), axis=0)) * rng.uniform(0.1, 100, symbols)
+    period = 8 * 60 * 60 * 1000
+    next_time = ((times // period + 1) * period).astype(float)[:, None].repeat(symbols, axis=1)
+    data = {}
+    for name in exchanges:
+        quote = mid * (1 + rng.normal(0, 0.002, (steps, symbols)))
+        spread = quote * 0.0005
+        rate = rng.normal(0.0001, 0.001, symbols) + np.cumsum(rng.normal(0, 0.00005, (steps, symbols)), axis=0)
+        data[(name, 'futures')] = {'ask': quote + spread, 'bid': quote - spread, 'rate': rate, 'time': next_time}
+        data[(name, 'spot')] = {'ask': mid + spread, 'bid': mid - spread, 'rate': np.full((steps, symbols), np.nan),
+                                'time': np.full((steps, symbols), np.nan)}
+    return Panels(times, np.array([f"S{i}/USDT" for i in range(symbols)], dtype=object), data)
+
+
+def bench_backtest(args):
+    rng = np.random.default_rng(args.seed)
+    steps = int(args.days * 86400 / args.step)
+    panels = synthetic_panels(["Bybit", "Kucoin", "Mexc", "Bingx"][:args.exchanges], args.symbols, steps, args.step, rng)
+    print(f"{args.days} days x {args.step} s = {steps} steps, {args.exchanges} exchanges x {args.symbols} symbols")
+    for strategy in ("futures", "spot"):
+        started = time.perf_counter()
+        report = backtest(panels, strategy, entry=args.entry)
+        elapsed = time.perf_counter() - started
+        totals = report[['trades', 'funding', 'pnl', 'turnover']].sum()
+        print(f"{strategy:<8}{elapsed:>8.2f} s  trades {totals['trades']:.0f}, funding {totals['funding']:.0f}, "
+              f"pnl {totals['pnl']:.0f}, turnover {totals['turnover']:.0f} USDT")
+
+
+# Биржи без запросов списков символов: листинг и тикеры задаёт synthetic_fetch.
+# Классы на уровне модуля, чтобы передаваться в процессы-шарды
+OFFLINE_EXCHANGES = []
+for _cls in EXCHANGES:
+    OFFLINE_EXCHANGES.append(type(f"Offline{_cls.__name__}", (_cls,), {'instruments': [], '__module__': __name__}))
+    globals()[OFFLINE_EXCHANGES[-1].__name__] = OFFLINE_EXCHANGES[-1]
+
+_PAYLOADS = {} # {(биржа, url): [варианты ответа]} - генерируются один раз в каждом процессе
+
+
+async def synthetic_fetch(exchange, symbols=3000, variants=4):
+    """Опрос без сети: разбор заранее сгенерированных ответов тикеров фьючерсов, как в load_tickers"""
+    names = [f"S{i}USDT" for i in range(symbols)]
+    if not exchange.primary_data:
+        exchange.set_listings('futures', {name: f"S{i}/USDT" for i, name in enumerate(names)})
+    for endpoint in exchange.tickers:
+        if endpoint.market != 'futures':
+            continue
+        payloads = _PAYLOADS.get((exchange.get_name(), endpoint.url))
+        if payloads is None:
+            rng = np.random.default_rng(len(_PAYLOADS))
+            payloads = _PAYLOADS[(exchange.get_name(), endpoint.url)] = [
+                _ticker_payload(endpoint, names, rng, numbers_as_strings=exchange.get_name() != "Mexc") for _ in range(variants)]
+        content = payloads[np.random.randint(variants)]
+        records = endpoint.decoder.decode(content)
+        if records is None:
+            exchange.parse_tickers(endpoint, loads(content))
+        else:
+            exchange.parse_records(endpoint, records)
+
+
+async def _run_scanner(make_scanner, seconds):
+    """(опросов, таблиц, задержки цикла событий в мс) за seconds секунд работы"""
+    counters = {'polls': 0, 'tables': 0}
+
+    def publish(table):
+        counters['tables'] += 1
+
+    scanner = make_scanner(publish, counters)
+    monitor = LoopLagMonitor().start()
+    try:
+        await asyncio.wait_for(scanner.run(), seconds)
+    except asyncio.TimeoutError:
+        pass
+    await monitor.stop()
+    polls = scanner.received if isinstance(scanner, ShardedScanner) else counters['polls']
+    return polls, counters['tables'], monitor.summary()
+
+
+def _print_scanner_row(name, seconds, polls, tables, lag):
+    print(f"{name:<22}{polls / seconds:>9.1f}{tables / seconds:>10.1f}{lag['p50']:>8.1f}ms{lag['p99']:>8.1f}ms{lag['max']:>8.1f}ms")
+
+
+def _offline_scanner(fetch, args, **options):
+    """Scanner root.py по биржам OFFLINE_EXCHANGES: fetch(exchange, counters)"""
+    def make(publish, counters):
+        return Scanner([cls(spot=False) for cls in OFFLINE_EXCHANGES], lambda exchange: fetch(exchange, counters), root.build_table,
+                       'symbol', 'result(%)', publish, default_interval=args.interval, top_k=50,
+                       watch=('funding_rates', 'symbols_prices', 'rate_times'), **options)
+    return make
+
+
+async def bench_shards(args):
+    """Один процесс против ShardedScanner: опросы, пересчёты таблицы и задержка цикла событий"""
+    fetch = partial(synthetic_fetch, symbols=args.symbols)
+
+    async def counted(exchange, counters):
+        await fetch(exchange)
+        counters['polls'] += 1
+
+    def sharded(publish, counters):
+        return ShardedScanner([cls(spot=False) for cls in OFFLINE_EXCHANGES], fetch, root.build_table,
+                              'symbol', 'result(%)', publish, workers=args.workers, default_interval=args.interval, top_k=50,
+                              watch=('funding_rates', 'symbols_prices', 'rate_times'))
+
+    print(f"{len(OFFLINE_EXCHANGES)} exchanges x {args.symbols} symbols, poll interval {args.interval} s, {args.seconds} s per mode")
+    print(f"{'mode':<22}{'polls/s':>9}{'tables/s':>10}{'lag p50':>10}{'lag p99':>10}{'lag max':>10}")
+    for name, make in (("single process", _offline_scanner(counted, args)), (f"{args.workers} shard processes", sharded)):
+        _print_scanner_row(name, args.seconds, *await _run_scanner(make, args.seconds))
+
+
+async def bench_offload(args):
+    """Таблица в цикле событий против расчёта в потоке по снимку рынков (Scanner offload=True)"""
+    fetch = partial(synthetic_fetch, symbols=args.symbols)
+
+    async def counted(exchange, counters):
+        await fetch(exchange)
+        counters['polls'] += 1
+
+    print(f"{len(OFFLINE_EXCHANGES)} exchanges x {args.symbols} symbols, poll interval {args.interval} s, {args.seconds} s per mode")
+    print(f"{'mode':<22}{'polls/s':>9}{'tables/s':>10}{'lag p50':>10}{'lag p99':>10}{'lag max':>10}")
+    for name, offload in (("scoring in loop", False), ("scoring in thread", True)):
+        _print_scanner_row(name, args.seconds, *await _run_scanner(_offline_scanner(counted, args, offload=offload), args.seconds))
+
+
+def bench_metrics(args):
+    """Накладные расходы метрик: цикл разбора тикеров и расчёта таблицы и отдельный span с выключенными и включёнными метриками"""
+    objects = [cls(spot=False) for cls in OFFLINE_EXCHANGES]
+    loop = asyncio.new_event_loop()
+
+    async def poll():
+        for exchange in objects:
+            await synthetic_fetch(exchange, symbols=args.symbols)
+
+    def cycle():
+        loop.run_until_complete(poll())
+        with metrics.span('scoring_seconds', stage='build_table'):
+            root.build_table(objects)
+
+    def spans():
+        for _ in range(args.spans):
+            with metrics.span('parse_seconds', exchange="Bybit", endpoint="futures tickers"):
+                pass
+
+    cycle() # Листинги и ответы генерируются до замера
+    print(f"{len(OFFLINE_EXCHANGES)} exchanges x {args.symbols} symbols, best of {args.cycles} cycles")
+    print(f"{'metrics':<10}{'cycle':>10}{'span':>10}")
+    for enabled in (False, True):
+        metrics.enabled = enabled
+        metrics.reset()
+        cycle_time, _ = _timeit(cycle, args.cycles)
+        span_time, _ = _timeit(spans, 5)
+        print(f"{'on' if enabled else 'off':<10}{cycle_time * 1000:>8.2f}ms{span_time / args.spans * 1e9:>8.0f}ns")
+    print(f"series: {len(metrics.histograms)} histograms, {len(metrics.counters)} counters")
+    metrics.enabled = False
+    loop.close()
+
+
+def synthetic_capture(symbols, rng):
+    """Ответы на все запросы адаптеров EXCHANGES в формате capture.load: списки символов, тикеры и ставки Mexc по символам"""
+    names = [f"S{i}" for i in range(symbols)]
+    now = int(time.time() * 1000)
+    rows, paths = {}, {} # {url: [строки]}, {url: путь к строкам}. Kucoin берёт символы и ставки из одного ответа
+    for cls in EXCHANGES:
+        as_strings = cls.name != "Mexc"
+        for request in cls.instruments + cls.tickers:
+            paths[request.url] = request.rows
+            for name, row in zip(names, rows.setdefault(request.url, [{} for _ in names])):
+                row[request.symbol] = f"{name}-USDT"
+                if isinstance(request, Instruments):
+                    if request.base is not None:
+                        row[request.base], row[request.quote] = name, "USDT"
+                    if request.enabled is not None:
+                        row[request.enabled] = True
+                    if request.contract_size is not None:
+                        row[request.contract_size] = 1
+                    if request.funding_interval is not None:
+                        row[request.funding_interval] = 8 * 3_600_000 // request.interval_unit
+                    continue
+                mid = rng.uniform(0.01, 100)
+                values = {request.ask: mid * 1.0005, request.bid: mid * 0.9995, request.funding_rate: rng.normal(0, 0.0003),
+                          request.next_funding_time: 3_600_000 if request.relative_time else now + 3_600_000,
+                          request.funding_interval: 8 * 3_600_000 // request.interval_unit}
+                values.pop(None, None)
+                row.update((key, str(value) if as_strings else value) for key, value in values.items())
+
+    routes = {}
+    for url, listed in rows.items():
+        payload = listed
+        for part in reversed(paths[url].split('.') if paths[url] else []):
+            payload = {part: payload}
+        routes[capture.route_key('/' + url.partition('://')[2])] = json.dumps(payload).encode()
+    for name in names:
+        routes[f"/contract.mexc.com/api/v1/contract/funding_rate/{name}-USDT"] = json.dumps(
+            {"data": {"nextSettleTime": now + 3_600_000, "collectCycle": 8}}).encode()
+    return routes
+
+
+async def _stage(function):
+    """(с, с CPU процесса) одной стадии: function - обычная функция или возвращающая awaitable"""
+    started, cpu = time.perf_counter(), time.process_time()
+    result = function()
+    if inspect.isawaitable(result):
+        await result
+    return time.perf_counter() - started, time.process_time() - cpu
+
+
+async def bench_replay(args):
+    """Сквозной цикл root.py или root_futures_spot.py против мока, воспроизводящего записанные (--capture) или синтетические ответы.
+    Мок работает в том же процессе: время и CPU стадии fetch включают его работу"""
+    routes = capture.load(args.capture) if args.capture else synthetic_capture(args.symbols, np.random.default_rng(args.seed))
+    server = MockExchange(routes, latency=args.latency, jitter=args.jitter, errors=args.errors, disconnects=args.disconnects, seed=args.seed)
+    await server.start()
+    client_manager.redirect = server.base_url
+    if not args.limits:
+        client_manager.scheduler = RequestScheduler(limits={}) # Лимиты бирж не ограничивают мок, повторы остаются
+
+    spot = args.strategy == 'spot'
+    script = root_futures_spot if spot else root
+    objects = [cls(spot=spot) for cls in EXCHANGES]
+    failures = []
+
+    async def fetch():
+        results = await asyncio.gather(*(exchange.main__get_symbols() for exchange in objects), return_exceptions=True)
+        failures.extend(result for result in results if isinstance(result, Exception))
+
+    stages = [('fetch', fetch)]
+    if spot:
+        stages.append(('filter', lambda: [exchange.reset_not_valid_pair() for exchange in objects]))
+    stages.append(('build_table', lambda: script.build_table(objects)))
+
+    samples = {name: [] for name, _ in stages} # {стадия: [(с, с CPU, запросов)]}, первый цикл - с загрузкой списков символов
+    try:
+        for _ in range(args.cycles + 1):
+            for name, function in stages:
+                requests = server.requests
+                samples[name].append((*await _stage(function), server.requests - requests))
+
+        peaks = {}
+        tracemalloc.start()
+        for name, function in stages:
+            tracemalloc.reset_peak()
+            current = tracemalloc.get_traced_memory()[0]
+            await _stage(function)
+            peaks[name] = tracemalloc.get_traced_memory()[1] - current
+        tracemalloc.stop()
+    finally:
+        await client_manager.close()
+        await server.stop()
+        client_manager.redirect = None
+
+    print(f"{args.strategy}: {len(routes)} routes, latency {args.latency} s ± {args.jitter} s, errors {args.errors}, disconnects {args.disconnects}")
+    print(f"{'stage':<14}{'cold':>10}{'wall p50':>12}{'wall max':>12}{'cpu p50':>12}{'requests':>10}{'peak MiB':>10}")
+    for name, _ in stages:
+        wall, cpu, requests = (np.array(column) for column in zip(*samples[name]))
+        print(f"{name:<14}{wall[0] * 1000:>8.1f}ms{np.median(wall[1:]) * 1000:>10.1f}ms{wall[1:].max() * 1000:>10.1f}ms"
+              f"{np.median(cpu[1:]) * 1000:>10.1f}ms{requests[1:].mean():>10.1f}{peaks[name] / 2 ** 20:>10.1f}")
+    cycle = np.sum([[sample[0] for sample in samples[name]] for name, _ in stages], axis=0)
+    requests = np.sum([[sample[2] for sample in samples[name]] for name, _ in stages], axis=0)
+    print(f"{'cycle':<14}{cycle[0] * 1000:>8.1f}ms{np.median(cycle[1:]) * 1000:>10.1f}ms{cycle[1:].max() * 1000:>10.1f}ms{'':>12}{requests[1:].mean():>10.1f}")
+    print(f"injected failures {server.failed}, retries {client_manager.scheduler.retried}, failed exchange cycles {len(failures)}")
+
+
+def bench_settlement(args):
+    """Опросы бирж за hours часов: постоянный интервал fast против SettlementCalendar на синтетическом расписании выплат"""
+    rng = np.random.default_rng(args.seed)
+    exchanges = [cls(spot=False) for cls in OFFLINE_EXCHANGES]
+    ids = np.array([symbol_table.intern(f"S{i}/USDT") for i in range(args.symbols)], dtype=np.intp)
+    schedules = [] # [(id листингованных символов, период выплат в мс)] по биржам
+    for exchange in exchanges:
+        listed = ids[rng.random(len(ids)) < 0.7]
+        periods = rng.choice([1, 4, 8], size=len(listed), p=[args.hourly, (1 - args.hourly) / 2, (1 - args.hourly) / 2]) * 3_600_000
+        exchange.futures_market.update(listed, ask=np.ones(len(listed)), bid=np.ones(len(listed)))
+        schedules.append((listed, periods))
+
+    def roll(now):
+        """Время следующей выплаты каждого символа на момент now, как в rate_times"""
+        for exchange, (listed, periods) in zip(exchanges, schedules):
+            exchange.futures_market.time[listed] = (now // periods + 1) * periods
+
+    calendar = SettlementCalendar(args.window * 60, args.fast, args.slow)
+    end = args.hours * 3_600_000
+    polls, near = 0, 0
+    moments = [0.0] * len(exchanges) # Время следующего опроса каждой биржи, мс
+    while min(moments) < end:
+        number = int(np.argmin(moments))
+        now = moments[number]
+        roll(now)
+        interval = calendar.interval(exchanges[number], exchanges, now)
+        polls += 1
+        near += interval == calendar.fast
+        moments[number] = now + interval * 1000
+
+    fixed = len(exchanges) * end / 1000 / args.fast
+    print(f"{len(exchanges)} exchanges x {args.symbols} symbols, {args.hourly:.0%} hourly settlements, window {args.window} min, {args.hours} h")
+    print(f"{'mode':<22}{'polls':>10}{'near settlement':>17}")
+    print(f"{f'every {args.fast} s':<22}{fixed:>10.0f}{'':>17}")
+    print(f"{'settlement calendar':<22}{polls:>10}{near:>17}  x{fixed / polls:.1f} fewer requests")
+
+
+async def bench_clock(args):
+    """Оценка сдвига часов мока ServerClock по заголовку Date против одного ответа (Date - время получения)"""
+    server = MockExchange(routes={"/time": {"data": []}}, latency=args.latency, jitter=args.jitter, skew=args.skew, seed=args.seed)
+    await server.start()
+    host = server.base_url.split("//")[1]
+    manager = ClientManager(http2=False, scheduler=RequestScheduler(limits={}))
+    checkpoints = {1, 2, 5, 10, 20, 50, 100, 200, 500, args.requests}
+    try:
+        print(f"skew {args.skew * 1000:.0f} ms, latency {args.latency * 1000:.0f}±{args.jitter * 1000:.0f} ms")
+        print(f"{'responses':<11}{'single Date':>13}{'ServerClock':>13}{'bounds ±':>10}")
+        single = []
+        for count in range(1, args.requests + 1):
+            response = await manager.get(f"{server.base_url}/time")
+            received = time.time()
+            single.append(abs(date_ms(response.headers['date']) - received * 1000 - args.skew * 1000))
+            if count in checkpoints:
+                low, high = server_clock.bounds[host]
+                error = abs(server_clock.offset(host) - args.skew * 1000)
+                print(f"{count:<11}{np.mean(single):>11.0f}ms{error:>11.0f}ms{(high - low) / 2:>8.0f}ms")
+    finally:
+        await manager.close()
+        await server.stop()
+
+
+def date_ms(date):
+    """Заголовок Date -> UTC мс"""
+    return parsedate_to_datetime(date).timestamp() * 1000
+
+
+async def bench_ratelimit(args):
+    """Запросы funding_rate по символам Mexc против мока с лимитом 20 запросов / 2 с"""
+    server = MockExchange(routes={"/api/v1/contract/funding_rate": {"data": {"nextSettleTime": 1}}}, rate_limit=(20, 2.0))
+    await server.start()
+    host = server.base_url.split("//")[1]
+    paths = [f"/api/v1/contract/funding_rate?symbol=S{i}_USDT" for i in range(args.symbols)]
+
+    async def ok(get, path):
+        response = await get(server.base_url + path)
+        return response.status_code == 200
+
+    modes = [
+        ("unbounded gather", ClientManager(http2=False, scheduler=RequestScheduler(limits={}, retries=0))),
+        ("RequestScheduler", ClientManager(http2=False, scheduler=RequestScheduler(limits={host: HOST_LIMITS["contract.mexc.com"]}))),
+    ]
+    try:
+        print(f"{'mode':<20}{'ok':>6}{'lost':>6}{'429s':>6}{'seconds':>9}")
+        for name, manager in modes:
+            server.reset_counters()
+            server.recent.clear()
+            started = time.perf_counter()
+            results = await asyncio.gather(*(ok(manager.get, path) for path in paths))
+            elapsed = time.perf_counter() - started
+            await manager.close()
+            print(f"{name:<20}{sum(results):>6}{results.count(False):>6}{server.rejected:>6}{elapsed:>9.2f}")
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки сканера")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    http = commands.add_parser("http", help="Общий пул соединений против нового клиента на каждый запрос")
+    http.add_argument("--cycles", type=int, default=10)
+    http.add_argument("--latency", type=float, default=0.005, help="Время ответа мока, с")
+    http.add_argument("--handshake-delay", type=float, default=0.05, help="Эмуляция TCP+TLS рукопожатия, с")
+    http.set_defaults(run=lambda args: asyncio.run(bench_http(args)))
+
+    pairing = commands.add_parser("pairing", help="Вложенные циклы root.py против векторного self-join")
+    pairing.add_argument("--exchanges", type=int, default=10)
+    pairing.add_argument("--symbols", type=int, default=3000)
+    pairing.add_argument("--repeat", type=int, default=3)
+    pairing.add_argument("--seed", type=int, default=1)
+    pairing.set_defaults(run=bench_pairing)
+
+    scoring = commands.add_parser("scoring", help="Вложенный np.where против opportunity_score")
+    scoring.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    scoring.add_argument("--repeat", type=int, default=5)
+    scoring.add_argument("--seed", type=int, default=1)
+    scoring.set_defaults(run=bench_scoring)
+
+    ratelimit = commands.add_parser("ratelimit", help="Запросы по символам против мока с лимитом частоты")
+    ratelimit.add_argument("--symbols", type=int, default=100)
+    ratelimit.set_defaults(run=lambda args: asyncio.run(bench_ratelimit(args)))
+
+    decode = commands.add_parser("decode", help="Разбор ответов с тикерами: stdlib json против RowsDecoder")
+    decode.add_argument("--symbols", type=int, default=2000)
+    decode.add_argument("--payloads", help="Каталог с записанными ответами <Биржа>_<рынок>_<запрос>.json")
+    decode.add_argument("--repeat", type=int, default=5)
+    decode.add_argument("--seed", type=int, default=1)
+    decode.set_defaults(run=bench_decode)
+
+    ranker = commands.add_parser("ranker", help="Полная пересортировка таблицы против OpportunityRanker")
+    ranker.add_argument("--rows", type=int, default=50_000)
+    ranker.add_argument("--per-symbol", type=int, default=10, help="Строк (пар бирж) на символ")
+    ranker.add_argument("--updates", type=int, default=1000)
+    ranker.add_argument("--top", type=int, default=50)
+    ranker.add_argument("--seed", type=int, default=1)
+    ranker.set_defaults(run=bench_ranker)
+
+    alerts = commands.add_parser("alerts", help="Сравнение полных таблиц против подписок Alerts")
+    alerts.add_argument("--rows", type=int, default=50_000)
+    alerts.add_argument("--per-symbol", type=int, default=10, help="Строк (пар бирж) на символ, не больше 20")
+    alerts.add_argument("--updates", type=int, default=1000)
+    alerts.add_argument("--threshold", type=float, default=2.0)
+    alerts.add_argument("--seed", type=int, default=1)
+    alerts.set_defaults(run=bench_alerts)
+
+    recorder = commands.add_parser("recorder", help="Запись истории: стоимость цикла, сброс и чтение")
+    recorder.add_argument("--exchanges", type=int, default=4)
+    recorder.add_argument("--symbols", type=int, default=3000)
+    recorder.add_argument("--cycles", type=int, default=200)
+    recorder.add_argument("--format", choices=["arrow", "parquet"], default="arrow")
+    recorder.add_argument("--seed", type=int, default=1)
+    recorder.set_defaults(run=bench_recorder)
+
+    backtest_parser = commands.add_parser("backtest", help="Скорость векторного бэктеста на синтетической истории")
+    backtest_parser.add_argument("--days", type=float, default=30)
+    backtest_parser.add_argument("--step", type=float, default=300, help="Шаг истории, с")
+    backtest_parser.add_argument("--exchanges", type=int, default=4)
+    backtest_parser.add_argument("--symbols", type=int, default=300)
+    backtest_parser.add_argument("--entry", type=float, default=0.1)
+    backtest_parser.add_argument("--seed", type=int, default=1)
+    backtest_parser.set_defaults(run=bench_backtest)
+
+    shards = commands.add_parser("shards", help="Опрос бирж в главном процессе против процессов-шардов")
+    shards.add_argument("--symbols", type=int, default=3000)
+    shards.add_argument("--workers", type=int, default=4)
+    shards.add_argument("--interval", type=float, default=0.1, help="Интервал опроса каждой биржи, с")
+    shards.add_argument("--seconds", type=float, default=10, help="Длительность замера каждого режима, с")
+    shards.set_defaults(run=lambda args: asyncio.run(bench_shards(args)))
+
+    offload = commands.add_parser("offload", help="Расчёт таблицы в цикле событий против потока со снимком рынков")
+    offload.add_argument("--symbols", type=int, default=3000)
+    offload.add_argument("--interval", type=float, default=0.1, help="Интервал опроса каждой биржи, с")
+    offload.add_argument("--seconds", type=float, default=10, help="Длительность замера каждого режима, с")
+    offload.set_defaults(run=lambda args: asyncio.run(bench_offload(args)))
+
+    metrics_parser = commands.add_parser("metrics", help="Накладные расходы метрик: выключены против включены")
+    metrics_parser.add_argument("--symbols", type=int, default=3000)
+    metrics_parser.add_argument("--cycles", type=int, default=20)
+    metrics_parser.add_argument("--spans", type=int, default=100_000, help="Сколько span в замере стоимости одного")
+    metrics_parser.set_defaults(run=bench_metrics)
+
+    settlement = commands.add_parser("settlement", help="Постоянный интервал опроса против календаря выплат")
+    settlement.add_argument("--symbols", type=int, default=500)
+    settlement.add_argument("--hourly", type=float, default=0.05, help="Доля символов с ежечасными выплатами (остальные 4 и 8 ч)")
+    settlement.add_argument("--window", type=float, default=10, help="За сколько минут до выплаты опрашивать часто")
+    settlement.add_argument("--fast", type=float, default=1.0, help="Частый интервал опроса, с")
+    settlement.add_argument("--slow", type=float, default=30.0, help="Наибольший интервал опроса, с")
+    settlement.add_argument("--hours", type=float, default=24)
+    settlement.add_argument("--seed", type=int, default=1)
+    settlement.set_defaults(run=bench_settlement)
+
+    clock = commands.add_parser("clock", help="Сдвиг часов биржи: один заголовок Date против ServerClock")
+    clock.add_argument("--skew", type=float, default=2.345, help="Сдвиг часов мока, с")
+    clock.add_argument("--latency", type=float, default=0.05, help="Задержка ответа мока, с")
+    clock.add_argument("--jitter", type=float, default=0.03, help="Случайная добавка к задержке, ± с")
+    clock.add_argument("--requests", type=int, default=100)
+    clock.add_argument("--seed", type=int, default=1)
+    clock.set_defaults(run=lambda args: asyncio.run(bench_clock(args)))
+
+    replay = commands.add_parser("replay", help="Сквозной цикл скрипта против мока: время, CPU, запросы и память по стадиям")
+    replay.add_argument("--capture", metavar="DIR", help="Ответы, записанные с --capture (по умолчанию синтетические)")
+    replay.add_argument("--strategy", choices=["futures", "spot"], default="futures", help="futures - root.py, spot - root_futures_spot.py")
+    replay.add_argument("--symbols", type=int, default=1000, help="Символов в синтетических ответах")
+    replay.add_argument("--cycles", type=int, default=10)
+    replay.add_argument("--latency", type=float, default=0.0, help="Задержка ответа мока, с")
+    replay.add_argument("--jitter", type=float, default=0.0, help="Случайная добавка к задержке, ± с")
+    replay.add_argument("--errors", type=float, default=0.0, help="Доля ответов 503")
+    replay.add_argument("--disconnects", type=float, default=0.0, help="Доля оборванных соединений")
+    replay.add_argument("--limits", action="store_true", help="Соблюдать лимиты частоты бирж (HOST_LIMITS)")
+    replay.add_argument("--seed", type=int, default=1)
+    replay.set_defaults(run=lambda args: asyncio.run(bench_replay(args)))
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import json
+import os
+
+"""
+Запись ответов бирж для воспроизведения.
+
+Capture подключается к http_client.client_manager (флаг --capture DIR в скриптах) и сохраняет тело последнего
+успешного ответа на каждый запрос адаптеров: списки символов, тикеры, ставки Mexc по символам, стаканы.
+Ключ маршрута - '/<хост><путь>?<query>' без параметров из VOLATILE_PARAMS, поэтому один и тот же запрос
+в каждом цикле перезаписывает один файл. Каталог:
+    <directory>/index.json - {маршрут: файл}
+    <directory>/NNNNN.json - тела ответов как есть
+mock_exchange.py воспроизводит записанное (MockExchange.from_capture), а скрипты с --replay URL
+отправляют туда все запросы вместо бирж.
+"""
+
+VOLATILE_PARAMS = {'timestamp'} # Параметры, которые меняются с каждым запросом (Bingx spot): в ключ маршрута не входят
+
+INDEX = "index.json"
+
+
+def route_key(target):
+    """Ключ маршрута из пути с query: без VOLATILE_PARAMS, порядок остальных параметров сохраняется"""
+    path, _, query = target.partition('?')
+    params = [param for param in query.split('&') if param and param.split('=', 1)[0] not in VOLATILE_PARAMS]
+    return path + ('?' + '&'.join(params) if params else '')
+
+
+def replay_url(base_url, url):
+    """URL биржи -> тот же запрос к моку: https://api.bybit.com/v5/... -> <base_url>/api.bybit.com/v5/..."""
+    rest = url.partition('://')[2]
+    return base_url.rstrip('/') + '/' + rest
+
+
+class Capture:
+    def __init__(self, directory) -> None:
+        self.directory = directory
+        self.responses = {} # {маршрут: тело последнего ответа}
+        self.requests = 0 # Сколько ответов записано (с повторами)
+
+    def add(self, response):
+        """Сохраняет ответ httpx. Ответы с ошибкой не записываются: ошибки добавляет мок"""
+        if response.status_code != 200:
+            return
+        url = response.request.url
+        self.responses[route_key('/' + url.netloc.decode() + url.raw_path.decode())] = response.content
+        self.requests += 1
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        index = load_index(self.directory)
+        for route, body in self.responses.items():
+            name = index.get(route) or f"{len(index):05d}.json"
+            with open(os.path.join(self.directory, name), 'wb') as file:
+                file.write(body)
+            index[route] = name
+        with open(os.path.join(self.directory, INDEX), 'w') as file:
+            json.dump(index, file, indent=1)
+        return len(self.responses)
+
+
+def load_index(directory):
+    path = os.path.join(directory, INDEX)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+
+def load(directory):
+    """{маршрут: тело ответа} записанного каталога - routes для MockExchange"""
+    routes = {}
+    for route, name in load_index(directory).items():
+        with open(os.path.join(directory, name), 'rb') as file:
+            routes[route] = file.read()
+    return routes
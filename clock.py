@@ -0,0 +1,72 @@
+import time
+from email.utils import parsedate_to_datetime
+
+import numpy as np
+
+"""
+Модель времени.
+
+Все моменты (время выплаты в MarketStore.time и rate_times, записи recorder) хранятся в UTC, мс с эпохи Unix.
+Московское время (+3 часа) добавляется только при выводе таблиц (DISPLAY_OFFSET).
+
+ServerClock оценивает сдвиг часов каждой биржи по заголовку Date её ответов. Date округлён до секунды, поэтому
+один ответ ограничивает сдвиг интервалом [Date - получение ответа, Date + 1 с - отправка запроса], а пересечение
+интервалов многих ответов сужает его до задержки сети. От now(хост) отсчитываются относительные времена выплат
+(Kucoin) и расчётные часы выплат Mexc.
+
+Интервал между выплатами символа (1, 4 или 8 часов) хранится в колонке interval MarketStore: из ответа биржи,
+если она его отдаёт, иначе по разнице старого и нового времени выплаты (learn_intervals).
+"""
+
+MINUTE = 60 * 1000
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+DISPLAY_OFFSET = 3 * HOUR # Таблицы показывают время выплат по Москве
+DEFAULT_INTERVAL = 8 * HOUR # Интервал выплат, пока он не известен
+INTERVALS = (HOUR, 2 * HOUR, 4 * HOUR, 8 * HOUR) # Интервалы, которые принимаются по разнице времён выплат
+
+
+class ServerClock:
+    def __init__(self) -> None:
+        self.bounds = {} # {хост: (нижняя, верхняя граница сдвига часов хоста относительно локальных, мс)}
+
+    def observe(self, host, date, started, finished):
+        """Учитывает ответ хоста: date - заголовок Date, started/finished - time.time() отправки запроса и получения ответа"""
+        if not date:
+            return
+        try:
+            server = parsedate_to_datetime(date).timestamp() * 1000
+        except (TypeError, ValueError):
+            return
+        low, high = server - finished * 1000, server + 1000 - started * 1000
+        bounds = self.bounds.get(host)
+        if bounds is not None and max(low, bounds[0]) <= min(high, bounds[1]):
+            low, high = max(low, bounds[0]), min(high, bounds[1])
+        # Иначе интервалы не пересекаются: часы биржи или локальные переведены, оценка начинается заново
+        self.bounds[host] = (low, high)
+
+    def offset(self, host=None):
+        """Сдвиг часов хоста, мс. Для хоста без ответов и без host - медиана по всем хостам (0, пока ответов нет)"""
+        bounds = self.bounds.get(host)
+        if bounds is not None:
+            return (bounds[0] + bounds[1]) / 2
+        if not self.bounds:
+            return 0.0
+        return float(np.median([(low + high) / 2 for low, high in self.bounds.values()]))
+
+    def now(self, host=None):
+        """Текущее время по часам хоста, UTC мс"""
+        return time.time() * 1000 + self.offset(host)
+
+    def report(self):
+        return ", ".join(f"{host} {(low + high) / 2:+.0f}±{(high - low) / 2:.0f} ms" for host, (low, high) in sorted(self.bounds.items()))
+
+
+def learn_intervals(previous, current):
+    """Интервал выплат по смене времени выплаты previous -> current (массивы, мс). NaN - смены не было или разница не из INTERVALS"""
+    with np.errstate(invalid='ignore'):
+        step = np.round((current - previous) / HOUR) * HOUR
+    return np.where(np.isin(step, INTERVALS), step, np.nan)
+
+
+server_clock = ServerClock()
@@ -0,0 +1,69 @@
+import json
+from typing import List, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+"""
+Разбор JSON ответов бирж.
+
+loads - самый быстрый из установленных декодеров: orjson, msgspec или стандартный json.
+RowsDecoder разбирает ответ с тикерами сразу в компактные записи (msgspec.Struct) только с нужными
+полями: ask, bid, ставка и время выплаты приходят уже числами, остальные поля строки не создаются.
+Если msgspec не установлен или ответ не подходит под схему (например, пустая строка вместо цены),
+используется обычный разбор через loads.
+"""
+
+if orjson is not None:
+    BACKEND = "orjson"
+    loads = orjson.loads
+elif msgspec is not None:
+    BACKEND = "msgspec"
+    loads = msgspec.json.Decoder().decode
+else:
+    BACKEND = "json"
+    loads = json.loads
+
+RECORD_FIELDS = ('symbol', 'ask', 'bid', 'funding_rate', 'next_funding_time', 'funding_interval')
+
+
+class RowsDecoder:
+    """Декодер ответа с тикерами. fields - {поле записи: поле строки ответа}, rows - путь к списку строк"""
+    def __init__(self, rows, fields) -> None:
+        self.fields = [field for field in RECORD_FIELDS if fields.get(field) is not None]
+        self.decoder = None
+        if msgspec is None:
+            return
+
+        # Все поля необязательные: строка без поля пропускается при разборе, а не ломает весь ответ
+        record = msgspec.defstruct(
+            "Record",
+            [('symbol', Optional[str], None)] + [(field, Optional[float], None) for field in self.fields[1:]],
+            rename={field: fields[field] for field in self.fields},
+            gc=False,
+        )
+        schema = List[record]
+        for part in reversed(rows.split('.') if rows else []):
+            schema = msgspec.defstruct(f"Level_{part}", [(part, schema)], gc=False)
+        self.path = rows.split('.') if rows else []
+        # strict=False - числа в строках ("0.0001") переводятся в float при разборе
+        self.decoder = msgspec.json.Decoder(schema, strict=False)
+
+    def decode(self, content):
+        """Список записей с атрибутами self.fields или None, если быстрый разбор невозможен"""
+        if self.decoder is None:
+            return None
+        try:
+            result = self.decoder.decode(content)
+        except msgspec.ValidationError:
+            return None
+        for part in self.path:
+            result = getattr(result, part)
+        return result
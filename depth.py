@@ -0,0 +1,63 @@
+import asyncio
+import math
+import time
+
+import numpy as np
+
+"""
+Цены исполнения по стакану.
+
+Таблицы строятся по лучшим ask/bid, но на реальном объёме позиция проходит несколько уровней стакана.
+DepthBooks запрашивает стаканы только для отобранных кандидатов (лучших строк таблицы), хранит их ttl секунд
+и считает средневзвешенную цену исполнения на notional в котируемой валюте (USDT) для каждой ноги.
+"""
+
+
+def fill_price(levels, notional):
+    """Средняя цена исполнения на notional по уровням [[цена, объём]] от лучшего. NaN - глубины не хватает"""
+    if levels is None or len(levels) == 0:
+        return math.nan
+    value = np.cumsum(levels[:, 0] * levels[:, 1])
+    index = int(np.searchsorted(value, notional))
+    if index >= len(levels):
+        return math.nan
+    before = value[index - 1] if index else 0.0
+    quantity = levels[:index, 1].sum() + (notional - before) / levels[index, 0]
+    return notional / quantity
+
+
+class DepthBooks:
+    def __init__(self, notional, ttl=5.0) -> None:
+        self.notional = notional # Объём позиции на каждой ноге в котируемой валюте
+        self.ttl = ttl # Сколько секунд стакан считается свежим
+        self.books = {} # {(биржа, рынок, символ): (время получения, asks, bids)}
+
+        self.hits = 0
+        self.misses = 0
+
+    async def fetch(self, legs):
+        """Загружает стаканы ног [(биржа, рынок, стандартный символ)], которых нет в кэше или они устарели"""
+        now = time.monotonic()
+        missing = {}
+        for exchange, market, symbol in legs:
+            key = (exchange.get_name(), market, symbol)
+            cached = self.books.get(key)
+            if cached is not None and now - cached[0] < self.ttl:
+                self.hits += 1
+            elif key not in missing:
+                self.misses += 1
+                missing[key] = exchange.fetch_book(market, symbol)
+
+        results = await asyncio.gather(*missing.values(), return_exceptions=True)
+        for key, result in zip(missing, results):
+            if isinstance(result, BaseException):
+                print(f"{key[0]} {key[2]}: {result!r}")
+                result = None
+            self.books[key] = (now, *(result or (None, None)))
+
+    def price(self, exchange, market, symbol, side):
+        """Цена исполнения notional: side 'buy' - по asks, 'sell' - по bids. NaN - нет стакана или глубины"""
+        cached = self.books.get((exchange.get_name(), market, symbol))
+        if cached is None:
+            return math.nan
+        return fill_price(cached[1] if side == 'buy' else cached[2], self.notional)
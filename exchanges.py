@@ -0,0 +1,543 @@
+import asyncio
+import time
+from functools import partial
+from operator import attrgetter, itemgetter
+from urllib.parse import urlsplit
+import numpy as np
+
+from http_client import client_manager
+from fetch_graph import FetchGraph
+from funding_cache import funding_cache
+from clock import DAY, HOUR, MINUTE, learn_intervals, server_clock
+from decoder import RowsDecoder, loads
+from market_store import MarketStore
+from symbol_registry import symbol_registry
+from metrics import metrics
+
+"""
+Общий каркас для всех бирж.
+
+Биржа описывается декларативно: списком запросов первичных данных (Instruments) и списком запросов
+тикеров (Endpoint) с путями к полям ask/bid/fundingRate/nextFundingTime. Разбор ответов общий
+для всех бирж, поэтому добавление биржи - это новый класс с описанием запросов, а ускорение разбора
+сразу действует для всех бирж. Ответы с тикерами разбираются decoder.RowsDecoder сразу в записи с нужными полями.
+
+Запросы одного цикла выполняются через FetchGraph: каждый запрос тикеров зависит только от списка символов
+своего рынка (и от цен, если requires_quote), поэтому независимые запросы идут одновременно.
+
+Ставки финансирования хранятся в долях (0.0001 = 0.01%), комиссии тоже в долях. Цены, ставки, время выплаты (UTC, мс)
+и интервал выплат лежат в market_store.MarketStore (массивы по id символа), symbols_prices/funding_rates/rate_times/
+funding_intervals - их словарные представления. Относительное время выплаты отсчитывается от часов биржи (clock.server_clock).
+"""
+
+
+SHARED_RESPONSE_AGE = 60 # с: сколько готовый ответ тикеров годится вместо запроса списка символов с тем же url
+
+
+def dig(payload, path):
+    """Достаёт вложенное значение по пути вида 'result.list' ('' - сам ответ)"""
+    for part in path.split('.') if path else []:
+        payload = payload[part]
+    return payload
+
+
+class Instruments:
+    """Запрос списка символов биржи: биржевый символ -> стандартный 'BASE/QUOTE'"""
+    def __init__(self, url, rows, market='futures', symbol='symbol', base=None, quote=None, separator=None, enabled=None,
+                 contract_size=None, funding_interval=None, interval_unit=1, weight=1) -> None:
+        self.url = url
+        self.rows = rows # Путь к списку символов в ответе
+        self.market = market # futures или spot
+        self.symbol = symbol
+        self.base = base # Поля базовой и котируемой валюты
+        self.quote = quote
+        self.separator = separator # Либо разделитель внутри биржевого символа ('BTC-USDT')
+        self.enabled = enabled # Поле-флаг доступности торговли (None - не проверяется)
+        self.contract_size = contract_size # Поле размера контракта в монетах, если объём стакана в контрактах
+        self.funding_interval = funding_interval # Поле интервала выплат фьючерса
+        self.interval_unit = interval_unit # мс в единице funding_interval
+        self.weight = weight # Вес запроса в лимите биржи
+
+
+class Endpoint:
+    """Запрос тикеров: какие поля строки ответа соответствуют ask, bid, ставке и времени выплаты"""
+    def __init__(self, url, rows, market='futures', symbol='symbol', ask=None, bid=None, funding_rate=None,
+                 next_funding_time=None, relative_time=False, funding_interval=None, interval_unit=1, requires_quote=False, params=None,
+                 weight=1) -> None:
+        self.url = url
+        self.rows = rows
+        self.market = market
+        self.symbol = symbol
+        self.ask = ask
+        self.bid = bid
+        self.funding_rate = funding_rate
+        self.next_funding_time = next_funding_time
+        self.relative_time = relative_time # Время выплаты задано как остаток в мс, а не момент времени
+        self.funding_interval = funding_interval
+        self.interval_unit = interval_unit # мс в единице funding_interval
+        self.requires_quote = requires_quote # Ставку сохранять только для символов, у которых уже есть цены
+        self.params = params # Функция, возвращающая query параметры запроса
+        self.weight = weight # Вес запроса в лимите биржи
+
+        fields = [symbol] + [field for field in (ask, bid, funding_rate, next_funding_time, funding_interval) if field is not None]
+        self.getter = itemgetter(*fields) # Одно обращение на строку вместо отдельных row[...]
+        self.decoder = RowsDecoder(rows, {'symbol': symbol, 'ask': ask, 'bid': bid, 'funding_rate': funding_rate,
+                                          'next_funding_time': next_funding_time, 'funding_interval': funding_interval})
+        self.attributes = attrgetter(*self.decoder.fields) # То же для записей RowsDecoder
+
+
+class Book:
+    """Запрос стакана L2 одного символа: url с {symbol}, пути к спискам уровней [цена, объём, ...]"""
+    def __init__(self, url, asks, bids, market='futures', weight=1) -> None:
+        self.url = url
+        self.asks = asks
+        self.bids = bids
+        self.market = market
+        self.weight = weight
+
+
+class ExchangeAdapter:
+    name = None
+    TAKER_FEE = 0
+    MAKER_FEE = 0
+    instruments = [] # [Instruments]
+    tickers = [] # [Endpoint] в порядке выполнения
+    books = {} # {рынок: Book}
+
+    def __init__(self, spot=True, metadata_cache=None) -> None:
+        self.spot = spot # Загружать ли спот (для фьючерс + фьючерс не нужен)
+        self.metadata_cache = metadata_cache # MetadataCache - первичные данные с диска при старте
+        self.revalidation = None # Фоновое обновление первичных данных после загрузки из кэша
+
+        self.primary_data = {} # {биржевый символ:стандартный символ}
+        self.primary_data_spot = {} # {биржевый символ:стандартный символ} spot
+        self.reverse_data = {} # {стандартный символ:биржевый символ}
+        self.reverse_data_spot = {} # {стандартный символ:биржевый символ} spot
+        self.multipliers = {'futures': {}, 'spot': {}} # {рынок: {биржевый символ: множитель цены}} для тикеров вида 1000PEPE
+        self.contract_sizes = {'futures': {}, 'spot': {}} # {рынок: {биржевый символ: монет в контракте}}
+        self.futures_market = MarketStore() # ask, bid, ставка и время выплаты фьючерсов по id символа
+        self.spot_market = MarketStore() # ask, bid спота
+        self.funding_rates = self.futures_market.rates # {стандартный символ:текущая ставка финансиварония}
+        self.symbols_prices = self.futures_market.quotes # {стандартный символ:{ask1, bid1}}
+        self.symbols_prices_spot = self.spot_market.quotes # {стандартный символ:{ask1, bid1}} spot
+        self.rate_times = self.futures_market.times # {стандартный символ:время выплаты финансирования} UTC, мс
+        self.funding_intervals = self.futures_market.intervals # {стандартный символ:интервал между выплатами, мс}
+
+        self.last_graph = None # FetchGraph последнего цикла, для отчёта о критическом пути
+        self.on_listings = None # callback(exchange, market) после замены листинга рынка (процессы-шарды shards.py)
+
+        # Один запрос может быть и списком символов, и тикерами (Kucoin contracts/active): ответ скачивается один раз
+        self.shared_urls = {request.url for request in self.instruments} & {endpoint.url for endpoint in self.tickers}
+        # {url: (time.monotonic() начала запроса, Task с телом ответа)}: задача попадает сюда до ожидания,
+        # поэтому список символов и тикеры, запрошенные одновременно, ждут одну загрузку
+        self.shared = {}
+        self.cycle_started = 0.0 # time.monotonic() начала последнего цикла: тикеры не берут ответы прошлых циклов
+
+    def get_name(self):
+        return self.name
+
+    def enabled(self, market):
+        return market == 'futures' or self.spot
+
+    async def get(self, endpoint, url, weight=1, **kwargs):
+        """Запрос через общий клиент. Длительность и ошибки попадают в метрики по (бирже, запросу)"""
+        try:
+            with metrics.span('http_request_seconds', exchange=self.name, endpoint=endpoint):
+                response = await client_manager.get(url, weight=weight, **kwargs)
+        except Exception as e:
+            metrics.count('http_errors_total', exchange=self.name, endpoint=endpoint, error=type(e).__name__)
+            raise
+        if response.status_code >= 400:
+            metrics.count('http_errors_total', exchange=self.name, endpoint=endpoint, error=f"HTTP {response.status_code}")
+        return response
+
+    async def request(self, request):
+        return await self.get(self.node_name(request), request.url, weight=request.weight,
+                              params=request.params() if getattr(request, 'params', None) else None)
+
+    """Загрузка первичных, необходимых данных для работы с символами биржи"""
+    async def _get_primary_data(self):
+        await asyncio.gather(*(self.load_instruments(instruments) for instruments in self.instruments if self.enabled(instruments.market)))
+
+    async def load_primary_data(self):
+        """Первичные данные из кэша на диске (с фоновым обновлением) или с биржи"""
+        if self.metadata_cache is not None and self.metadata_cache.load(self):
+            self.revalidation = asyncio.create_task(self.refresh_primary_data())
+        else:
+            await self.refresh_primary_data()
+
+    async def refresh_primary_data(self):
+        await self._get_primary_data()
+        if self.metadata_cache is not None:
+            self.metadata_cache.save(self)
+
+    async def content(self, request, since):
+        """Тело ответа. Запрос с url из shared_urls не повторяется, пока идёт такой же запрос
+        или есть ответ на запрос, начатый не раньше since"""
+        if request.url not in self.shared_urls:
+            return (await self.request(request)).content
+        started, task = self.shared.get(request.url, (None, None))
+        if task is None or task.done() and (started < since or task.cancelled() or task.exception() is not None):
+            started, task = time.monotonic(), asyncio.ensure_future(self.request(request))
+            self.shared[request.url] = (started, task)
+        # shield: отмена одного из ожидающих (узел графа или фоновое обновление) не прерывает загрузку для другого
+        return (await asyncio.shield(task)).content
+
+    async def load_instruments(self, instruments):
+        content = await self.content(instruments, time.monotonic() - SHARED_RESPONSE_AGE)
+        self.parse_instruments(instruments, loads(content))
+
+    def parse_instruments(self, instruments, payload):
+        listings, multipliers, contract_sizes, intervals = {}, {}, {}, {}
+        rows = dig(payload, instruments.rows)
+        for symbol in rows:
+            try:
+                if instruments.enabled is not None and not symbol[instruments.enabled]:
+                    continue
+                exchange_symbol = symbol[instruments.symbol] # Символ биржи (например, 'BTCUSDT')
+                if instruments.separator is None:
+                    base, quote = symbol[instruments.base], symbol[instruments.quote]
+                else:
+                    base, quote = exchange_symbol.split(instruments.separator)[:2]
+                standard_symbol, multiplier = symbol_registry.standard(base, quote) # В стандартном виде 'BTC/USDT'
+                if instruments.contract_size is not None:
+                    contract_sizes[exchange_symbol] = float(symbol[instruments.contract_size])
+                if instruments.funding_interval is not None and symbol.get(instruments.funding_interval):
+                    intervals[exchange_symbol] = float(symbol[instruments.funding_interval]) * instruments.interval_unit
+            except (KeyError, TypeError, ValueError, AttributeError):
+                continue
+            listings[exchange_symbol] = standard_symbol
+            if multiplier != 1:
+                multipliers[exchange_symbol] = multiplier
+        metrics.count('dropped_rows_total', len(rows) - len(listings), exchange=self.name, endpoint=self.node_name(instruments), reason='malformed')
+        self.contract_sizes[instruments.market] = contract_sizes
+        self.set_listings(instruments.market, listings, multipliers)
+        for exchange_symbol, interval in intervals.items():
+            if exchange_symbol in self.primary_data:
+                self.funding_intervals[self.primary_data[exchange_symbol]] = interval
+
+    def set_listings(self, market, listings, multipliers=None):
+        """Заменяет список символов рынка: {биржевый символ: стандартный символ}, {биржевый символ: множитель цены}"""
+        multipliers = multipliers or {}
+        if market == 'futures':
+            primary, reverse = self.primary_data, self.reverse_data
+        else:
+            primary, reverse = self.primary_data_spot, self.reverse_data_spot
+
+        chosen = {} # {стандартный символ: биржевый символ}. Если есть и PEPE, и 1000PEPE - берётся PEPE
+        denied = 0
+        for exchange_symbol, standard_symbol in listings.items():
+            if symbol_registry.denied(self.name, standard_symbol):
+                denied += 1
+                continue
+            current = chosen.get(standard_symbol)
+            if current is None or multipliers.get(current, 1) > multipliers.get(exchange_symbol, 1):
+                chosen[standard_symbol] = exchange_symbol
+
+        metrics.count('dropped_rows_total', denied, exchange=self.name, endpoint=f"{market} symbols", reason='denied')
+        reverse.clear()
+        reverse.update(chosen)
+        primary.clear()
+        primary.update((exchange_symbol, standard_symbol) for standard_symbol, exchange_symbol in chosen.items())
+        self.multipliers[market] = {exchange_symbol: multipliers[exchange_symbol] for exchange_symbol in primary if exchange_symbol in multipliers}
+        symbol_registry.update(self.name, market, chosen)
+        if self.on_listings is not None:
+            self.on_listings(self, market)
+
+    """Основная функция, которая загружает все первичные + основные данные по символам для биржи"""
+    async def main__get_symbols(self):
+        if len(self.primary_data) == 0 and self.metadata_cache is not None and self.metadata_cache.load(self):
+            self.revalidation = asyncio.create_task(self.refresh_primary_data())
+        loading = len(self.primary_data) == 0
+
+        self.last_graph = self.build_graph()
+        try:
+            await self.last_graph.run()
+        finally:
+            metrics.observe('exchange_cycle_seconds', self.last_graph.duration(), exchange=self.name)
+        if loading and self.metadata_cache is not None:
+            self.metadata_cache.save(self)
+
+    def node_name(self, request):
+        if isinstance(request, Instruments):
+            return f"{request.market} symbols"
+        return f"{request.market} {urlsplit(request.url).path}"
+
+    def build_graph(self):
+        """Граф запросов цикла. Первичные данные попадают в граф, только если ещё не загружены"""
+        graph = FetchGraph(self.name)
+        self.cycle_started = time.monotonic()
+        if len(self.primary_data) == 0:
+            for instruments in self.instruments:
+                if self.enabled(instruments.market):
+                    graph.add(self.node_name(instruments), partial(self.load_instruments, instruments))
+
+        for endpoint in self.tickers:
+            if not self.enabled(endpoint.market):
+                continue
+            depends = [self.node_name(instruments) for instruments in self.instruments if instruments.market == endpoint.market]
+            if endpoint.requires_quote:
+                depends += [self.node_name(other) for other in self.tickers if other.market == endpoint.market and other.ask is not None]
+            graph.add(self.node_name(endpoint), partial(self.load_tickers, endpoint), depends)
+
+        if type(self).after_tickers is not ExchangeAdapter.after_tickers:
+            graph.add("after_tickers", self.after_tickers, [self.node_name(endpoint) for endpoint in self.tickers if endpoint.market == 'futures'])
+        return graph
+
+    async def load_tickers(self, endpoint):
+        content = await self.content(endpoint, self.cycle_started)
+        with metrics.span('parse_seconds', exchange=self.name, endpoint=self.node_name(endpoint)):
+            records = endpoint.decoder.decode(content)
+            if records is None:
+                self.parse_tickers(endpoint, loads(content))
+            else:
+                self.parse_records(endpoint, records)
+
+    async def after_tickers(self):
+        """Дополнительные запросы конкретной биржи, выполняются после всех фьючерсных тикеров"""
+        pass
+
+    def parse_tickers(self, endpoint, payload):
+        """Разбор обычного JSON ответа: строки - словари, числа могут быть строками"""
+        getter = endpoint.getter
+        payload = dig(payload, endpoint.rows)
+        rows = []
+        for row in payload:
+            try:
+                values = getter(row)
+                rows.append((values[0], *map(float, values[1:])))
+            except (KeyError, TypeError, ValueError):
+                continue
+        metrics.count('dropped_rows_total', len(payload) - len(rows), exchange=self.name, endpoint=self.node_name(endpoint), reason='malformed')
+        self.store_tickers(endpoint, rows)
+
+    def parse_records(self, endpoint, records):
+        """Разбор записей RowsDecoder: числа уже float, строки без нужного поля пропускаются"""
+        rows = [values for values in map(endpoint.attributes, records) if None not in values]
+        metrics.count('dropped_rows_total', len(records) - len(rows), exchange=self.name, endpoint=self.node_name(endpoint), reason='missing_field')
+        self.store_tickers(endpoint, rows)
+
+    def store_tickers(self, endpoint, rows):
+        """rows - список кортежей (биржевой символ, [ask, bid], [ставка], [время выплаты], [интервал выплат]) с числами float"""
+        if endpoint.market == 'futures':
+            primary, store = self.primary_data, self.futures_market
+        else:
+            primary, store = self.primary_data_spot, self.spot_market
+        multipliers = self.multipliers[endpoint.market]
+
+        intern = store.intern
+        ids, kept = [], []
+        for values in rows:
+            key = primary.get(values[0])
+            if key is not None:
+                ids.append(intern(key))
+                kept.append(values)
+        if metrics.enabled:
+            labels = {'exchange': self.name, 'endpoint': self.node_name(endpoint)}
+            metrics.count('rows_total', len(ids), **labels)
+            metrics.count('dropped_rows_total', len(rows) - len(ids), reason='unlisted', **labels)
+        if not ids:
+            return
+
+        ids = np.array(ids)
+        columns = iter(np.array(column, dtype=float) for column in list(zip(*kept))[1:])
+        if endpoint.ask is not None:
+            ask, bid = next(columns), next(columns)
+            if multipliers:
+                # Цена 1000PEPE - цена 1000 монет PEPE
+                scale = np.array([multipliers.get(values[0], 1) for values in kept], dtype=float)
+                ask, bid = ask / scale, bid / scale
+            store.update(ids, ask=ask, bid=bid)
+        if endpoint.funding_rate is not None:
+            rate = next(columns)
+            if endpoint.requires_quote:
+                # Ставка только для символов с ценой; время и интервал выплат записываются для всех
+                has_quote = ~np.isnan(store.ask[ids])
+                metrics.count('dropped_rows_total', int(len(ids) - has_quote.sum()), exchange=self.name, endpoint=self.node_name(endpoint), reason='no_quote')
+                store.update(ids[has_quote], rate=rate[has_quote])
+            else:
+                store.update(ids, rate=rate)
+        if endpoint.next_funding_time is not None:
+            next_time = next(columns)
+            if endpoint.relative_time:
+                # Остаток до выплаты от часов биржи, с точностью до минуты, чтобы время не дрожало от задержки ответа
+                next_time = np.round((next_time + server_clock.now(urlsplit(endpoint.url).netloc)) / MINUTE) * MINUTE
+            else:
+                next_time = np.floor(next_time)
+            self.store_times(store, ids, next_time)
+        if endpoint.funding_interval is not None:
+            store.update(ids, interval=next(columns) * endpoint.interval_unit)
+
+    def store_times(self, store, ids, next_time):
+        """Записывает время выплаты (UTC, мс) и интервал выплат, определённый по смене времени выплаты"""
+        interval = learn_intervals(store.time[ids], next_time)
+        learned = ~np.isnan(interval)
+        store.update(ids, time=next_time)
+        if learned.any():
+            store.update(ids[learned], interval=interval[learned])
+
+    async def fetch_book(self, market, symbol):
+        """Стакан (asks, bids) стандартного символа: массивы [[цена за монету, объём в монетах]] от лучшего уровня.
+        None - у биржи нет запроса стакана для рынка или символ не листингован"""
+        book = self.books.get(market)
+        exchange_symbol = (self.reverse_data if market == 'futures' else self.reverse_data_spot).get(symbol)
+        if book is None or exchange_symbol is None:
+            return None
+        response = await self.get(f"{market} book", book.url.format(symbol=exchange_symbol), weight=book.weight)
+        payload = loads(response.content)
+
+        # 1000PEPE: цена за 1000 монет, объём в контрактах по contract_size монет 1000PEPE
+        multiplier = self.multipliers[market].get(exchange_symbol, 1)
+        size = self.contract_sizes[market].get(exchange_symbol, 1) * multiplier
+        sides = []
+        for path in (book.asks, book.bids):
+            levels = np.array([level[:2] for level in dig(payload, path)], dtype=float).reshape(-1, 2)
+            levels[:, 0] /= multiplier
+            levels[:, 1] *= size
+            sides.append(levels)
+        return tuple(sides)
+
+    def to_standard(self, exchange_symbol: str) -> str:
+        """Переводит биржевой символ в стандартный"""
+        return self.primary_data.get(exchange_symbol, exchange_symbol)
+
+    def to_exchange(self, standard_symbol: str) -> str:
+        """Переводит стандартный символ в формат биржи"""
+        return self.reverse_data.get(standard_symbol, standard_symbol)
+
+    """Удаляет символы из self.funding_rates, у который ставка финансрования меньше 0.01%"""
+    def reset_not_valid_pair(self):
+        rates = self.funding_rates.values_array()
+        low = ~(rates > 0.0001)
+        if metrics.enabled:
+            metrics.count('dropped_rows_total', int((low & ~np.isnan(rates)).sum()), exchange=self.name, endpoint='futures rates', reason='low_rate')
+        self.futures_market.clear('rate', low)
+
+
+class Bybit(ExchangeAdapter):
+    name = "Bybit"
+    TAKER_FEE = 0.0011
+    MAKER_FEE = 0.00036
+    instruments = [
+        Instruments("https://api.bybit.com/v5/market/instruments-info?category=linear", 'result.list', base='baseCoin', quote='quoteCoin',
+                    funding_interval='fundingInterval', interval_unit=MINUTE),
+        Instruments("https://api.bybit.com/v5/market/instruments-info?category=spot", 'result.list', 'spot', base='baseCoin', quote='quoteCoin'),
+    ]
+    tickers = [
+        Endpoint("https://api.bybit.com/v5/market/tickers?category=linear", 'result.list', ask='ask1Price', bid='bid1Price',
+                 funding_rate='fundingRate', next_funding_time='nextFundingTime'),
+        Endpoint("https://api.bybit.com/v5/market/tickers?category=spot", 'result.list', 'spot', ask='ask1Price', bid='bid1Price'),
+    ]
+    books = {
+        'futures': Book("https://api.bybit.com/v5/market/orderbook?category=linear&symbol={symbol}&limit=50", 'result.a', 'result.b'),
+        'spot': Book("https://api.bybit.com/v5/market/orderbook?category=spot&symbol={symbol}&limit=50", 'result.a', 'result.b', 'spot'),
+    }
+
+
+class Mexc(ExchangeAdapter):
+    name = "Mexc"
+    TAKER_FEE = 0.0002
+    MAKER_FEE = 0
+    instruments = [
+        Instruments("https://contract.mexc.com/api/v1/contract/detail", 'data', base='baseCoin', quote='quoteCoin', contract_size='contractSize'),
+        Instruments("https://api.mexc.com/api/v3/exchangeInfo", 'symbols', 'spot', base='baseAsset', quote='quoteAsset', enabled='isSpotTradingAllowed', weight=10),
+    ]
+    tickers = [
+        Endpoint("https://contract.mexc.com/api/v1/contract/ticker", 'data', ask='ask1', bid='bid1', funding_rate='fundingRate'),
+        Endpoint("https://api.mexc.com/api/v3/ticker/bookTicker", '', 'spot', ask='askPrice', bid='bidPrice', weight=2),
+    ]
+    books = {
+        'futures': Book("https://contract.mexc.com/api/v1/contract/depth/{symbol}?limit=50", 'data.asks', 'data.bids'),
+        'spot': Book("https://api.mexc.com/api/v3/depth?symbol={symbol}&limit=50", 'asks', 'bids', 'spot'),
+    }
+    target_hours = [0, 8, 16] # Часы выплат (UTC), если время не удалось получить
+
+    """Запрос ставки финансирования на отдельный символ"""
+    async def fetch_funding_rate(self, symbol):
+        try:
+            symbol_mexc = self.to_exchange(symbol)
+            try:
+                response = await self.get("futures funding_rate", f"https://contract.mexc.com/api/v1/contract/funding_rate/{symbol_mexc}")
+            except Exception as e:
+                # Ошибка одного символа не прерывает цикл биржи, поэтому считается здесь, как в Scanner._poll
+                metrics.count('poll_errors_total', exchange=self.name, error=type(e).__name__)
+                print(f"{self.name}: {e!r}")
+                return
+            data = loads(response.content)['data']
+            self.rate_times[symbol] = float(data['nextSettleTime'])
+            interval = data['collectCycle'] * HOUR if data.get('collectCycle') else None
+            funding_cache.set(self.name, symbol, self.rate_times[symbol], interval)
+            interval = funding_cache.interval(self.name, symbol) # Из ответа или по разнице выплат
+            if interval is not None:
+                self.funding_intervals[symbol] = interval
+        except (KeyError, TypeError, ValueError):
+            metrics.count('dropped_rows_total', exchange=self.name, endpoint="futures funding_rate", reason='malformed')
+
+    """Генерация запросов для подходящих символов"""
+    async def fetch_all_funding_rates(self, symbols):
+        tasks = [self.fetch_funding_rate(symbol) for symbol in symbols]
+        await asyncio.gather(*tasks)
+
+    def nearest_time_to_targets(self, now):
+        """Ближайший после now (UTC, мс) из часов target_hours"""
+        day = now // DAY * DAY
+        targets = [day + hour * HOUR for hour in self.target_hours] + [day + DAY + min(self.target_hours) * HOUR]
+        return int(min(target for target in targets if target > now))
+
+    async def after_tickers(self):
+        # Время выплаты в тикере Mexc отсутствует, запрашиваем его только для символов с заметной ставкой.
+        # Пока закэшированное время выплаты не наступило, запрос (20 в 2 секунды на бирже) не нужен
+        now = server_clock.now("contract.mexc.com")
+        symbols_local = [key for key, value in self.funding_rates.items() if abs(value) > 0.0005 and funding_cache.get(self.name, key, now) is None]
+        await self.fetch_all_funding_rates(symbols_local)
+
+        nearest_unix_time_ms = funding_cache.fallback(self.name, now, lambda: self.nearest_time_to_targets(now))
+        for symbol in self.funding_rates:
+            settle_time = funding_cache.get(self.name, symbol, now)
+            self.rate_times[symbol] = settle_time if settle_time is not None else nearest_unix_time_ms
+
+
+class Bingx(ExchangeAdapter):
+    name = "Bingx"
+    TAKER_FEE = 0.0005
+    MAKER_FEE = 0.0002
+    instruments = [
+        Instruments("https://open-api.bingx.com/openApi/swap/v2/quote/contracts", 'data', separator='-'),
+        Instruments("https://open-api.bingx.com/openApi/spot/v1/common/symbols", 'data.symbols', 'spot', separator='-'),
+    ]
+    tickers = [
+        Endpoint("https://open-api.bingx.com/openApi/swap/v2/quote/ticker", 'data', ask='askPrice', bid='bidPrice'),
+        Endpoint("https://open-api.bingx.com/openApi/swap/v2/quote/premiumIndex", 'data', funding_rate='lastFundingRate',
+                 next_funding_time='nextFundingTime', requires_quote=True),
+        Endpoint("https://open-api.bingx.com/openApi/spot/v1/ticker/24hr", 'data', 'spot', ask='askPrice', bid='bidPrice',
+                 params=lambda: {'timestamp': int(time.time() * 1000)}),
+    ]
+    books = {
+        'futures': Book("https://open-api.bingx.com/openApi/swap/v2/quote/depth?symbol={symbol}&limit=50", 'data.asks', 'data.bids'),
+        'spot': Book("https://open-api.bingx.com/openApi/spot/v1/market/depth?symbol={symbol}&limit=50", 'data.asks', 'data.bids', 'spot'),
+    }
+
+
+class Kucoin(ExchangeAdapter):
+    name = "Kucoin"
+    TAKER_FEE = 0.0006
+    MAKER_FEE = 0.0002
+    instruments = [
+        Instruments("https://api-futures.kucoin.com/api/v1/contracts/active", 'data', base='baseCurrency', quote='quoteCurrency', contract_size='multiplier'),
+        Instruments("https://api.kucoin.com/api/v2/symbols", 'data', 'spot', base='baseCurrency', quote='quoteCurrency', enabled='enableTrading'),
+    ]
+    tickers = [
+        Endpoint("https://api-futures.kucoin.com/api/v1/allTickers", 'data', ask='bestAskPrice', bid='bestBidPrice'),
+        # nextFundingRateTime - сколько мс осталось до выплаты, fundingRateGranularity - интервал выплат в мс
+        Endpoint("https://api-futures.kucoin.com/api/v1/contracts/active", 'data', funding_rate='fundingFeeRate',
+                 next_funding_time='nextFundingRateTime', relative_time=True, funding_interval='fundingRateGranularity'),
+        # buy - лучшая цена покупателя (bid), sell - лучшая цена продавца (ask)
+        Endpoint("https://api.kucoin.com/api/v1/market/allTickers", 'data.ticker', 'spot', ask='sell', bid='buy', weight=15),
+    ]
+    books = {
+        'futures': Book("https://api-futures.kucoin.com/api/v1/level2/depth20?symbol={symbol}", 'data.asks', 'data.bids', weight=5),
+        'spot': Book("https://api.kucoin.com/api/v1/market/orderbook/level2_20?symbol={symbol}", 'data.asks', 'data.bids', 'spot', weight=2),
+    }
+
+
+EXCHANGES = [Bybit, Kucoin, Mexc, Bingx]
@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+"""
+Граф запросов одной биржи.
+
+Каждый узел - корутина и список узлов, данные которых ей нужны. Независимые узлы выполняются
+одновременно, поэтому цикл биржи занимает время самой длинной цепочки зависимых запросов,
+а не сумму всех запросов. После выполнения граф сообщает критический путь - цепочку,
+которая определила длительность цикла.
+"""
+
+
+class FetchGraph:
+    def __init__(self, name='') -> None:
+        self.name = name
+        self.nodes = {} # {имя узла:(функция без аргументов, возвращающая корутину, [зависимости])}
+        self.started = {} # {имя узла:время начала}
+        self.finished = {} # {имя узла:время окончания}
+
+    def add(self, name, function, depends=()):
+        """Зависимости, которых нет в графе, считаются уже выполненными (например, первичные данные загружены)"""
+        self.nodes[name] = (function, [depend for depend in depends if depend in self.nodes])
+
+    async def run(self):
+        tasks = {}
+
+        async def run_node(name, function, depends):
+            if depends:
+                await asyncio.gather(*(tasks[depend] for depend in depends))
+            self.started[name] = time.perf_counter()
+            try:
+                await function()
+            finally:
+                self.finished[name] = time.perf_counter()
+
+        for name, (function, depends) in self.nodes.items():
+            tasks[name] = asyncio.ensure_future(run_node(name, function, depends))
+
+        results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    def critical_path(self):
+        """[(узел, длительность в с)] от первого запроса до последнего завершившегося"""
+        if not self.finished:
+            return []
+        name = max(self.finished, key=self.finished.get)
+        path = [name]
+        while True:
+            depends = [depend for depend in self.nodes[name][1] if depend in self.finished]
+            if not depends:
+                break
+            name = max(depends, key=self.finished.get)
+            path.append(name)
+        return [(name, self.finished[name] - self.started[name]) for name in reversed(path)]
+
+    def duration(self):
+        if not self.finished:
+            return 0.0
+        return max(self.finished.values()) - min(self.started.values())
+
+    def report(self) -> str:
+        path = " -> ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.critical_path())
+        return f"{self.name}: {self.duration() * 1000:.0f} ms, critical path: {path}"
@@ -0,0 +1,61 @@
+import numpy as np
+
+from clock import learn_intervals
+
+"""
+Кэш расписания выплат финансирования.
+
+Для каждой пары (биржа, символ) хранится время следующей выплаты и интервал между выплатами.
+Пока выплата не наступила, время отдаётся из кэша без запросов к бирже. Как только время прошло,
+запись считается недействительной и символ снова запрашивается. Интервал берётся из ответа биржи
+или вычисляется по разнице между соседними выплатами (clock.learn_intervals: только значения из clock.INTERVALS).
+"""
+
+
+class FundingScheduleCache:
+    def __init__(self) -> None:
+        self.entries = {} # {(биржа, символ):(время следующей выплаты, интервал в мс или None)}
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, exchange, symbol, now):
+        """Время следующей выплаты, если оно ещё не наступило, иначе None"""
+        entry = self.entries.get((exchange, symbol))
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[0] <= now:
+            # Запись остаётся, чтобы по следующему времени вычислить интервал
+            self.invalidations += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def set(self, exchange, symbol, next_time, interval=None):
+        previous = self.entries.get((exchange, symbol))
+        if interval is None and previous is not None:
+            interval = previous[1]
+            if next_time > previous[0]:
+                learned = learn_intervals(previous[0], next_time)
+                # Разница в несколько интервалов (символ пропустил выплаты) - не интервал, остаётся прежний
+                if not np.isnan(learned):
+                    interval = int(learned)
+        self.entries[(exchange, symbol)] = (next_time, interval)
+
+    def interval(self, exchange, symbol):
+        entry = self.entries.get((exchange, symbol))
+        return entry[1] if entry else None
+
+    def fallback(self, exchange, now, compute):
+        """Расчётное время выплаты биржи (например, ближайший из часов 0/8/16 UTC), пересчитывается только после его наступления"""
+        next_time = self.get(exchange, None, now)
+        if next_time is None:
+            next_time = compute()
+            self.set(exchange, None, next_time)
+        return next_time
+
+
+funding_cache = FundingScheduleCache()
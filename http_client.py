@@ -0,0 +1,90 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+import httpx
+
+from rate_limit import RequestScheduler
+from capture import replay_url
+from clock import server_clock
+
+"""
+Общий HTTP-клиент для всех бирж.
+
+Раньше каждый запрос открывал новый httpx.AsyncClient(), то есть новое TCP+TLS соединение.
+Здесь на каждый хост держится один долгоживущий клиент с пулом keep-alive соединений,
+поэтому рукопожатие выполняется один раз, а дальше соединения переиспользуются.
+Все запросы проходят через RequestScheduler: лимиты частоты биржи, повторы после 429 и временных ошибок.
+redirect отправляет все запросы в локальный мок (--replay), capture записывает ответы (--capture, capture.py).
+По заголовку Date каждого ответа clock.server_clock уточняет сдвиг часов биржи.
+"""
+
+try:
+    import h2  # noqa: F401 HTTP/2 доступен только при установленном пакете h2 (pip install httpx[http2])
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+DEFAULT_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=20, keepalive_expiry=60)
+DEFAULT_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+
+# {хост: (лимиты пула, таймауты)}
+HOST_SETTINGS = {
+    "api.bybit.com": (DEFAULT_LIMITS, DEFAULT_TIMEOUT),
+    # Для Mexc ставки финансирования запрашиваются по одному символу, поэтому пул больше
+    "contract.mexc.com": (httpx.Limits(max_connections=50, max_keepalive_connections=50, keepalive_expiry=60), httpx.Timeout(10.0, connect=5.0)),
+    "api.mexc.com": (DEFAULT_LIMITS, DEFAULT_TIMEOUT),
+    "open-api.bingx.com": (DEFAULT_LIMITS, httpx.Timeout(15.0, connect=5.0)),
+    "api-futures.kucoin.com": (DEFAULT_LIMITS, DEFAULT_TIMEOUT),
+    "api.kucoin.com": (DEFAULT_LIMITS, DEFAULT_TIMEOUT),
+}
+
+
+class ClientManager:
+    def __init__(self, host_settings=None, http2=HTTP2_AVAILABLE, scheduler=None) -> None:
+        self.host_settings = HOST_SETTINGS if host_settings is None else host_settings # {хост: (limits, timeout)}
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.scheduler = RequestScheduler() if scheduler is None else scheduler
+        self.clients = {} # {хост: httpx.AsyncClient}
+        self.redirect = None # Базовый URL mock_exchange.py: запросы уходят туда, лимиты остаются по хосту биржи
+        self.capture = None # capture.Capture - запись ответов
+
+    def client(self, url: str) -> httpx.AsyncClient:
+        """Возвращает клиент для хоста из url, создавая его при первом обращении"""
+        host = urlsplit(url).netloc
+        client = self.clients.get(host)
+        if client is None or client.is_closed:
+            limits, timeout = self.host_settings.get(host, (DEFAULT_LIMITS, DEFAULT_TIMEOUT))
+            client = httpx.AsyncClient(http2=self.http2, limits=limits, timeout=timeout)
+            self.clients[host] = client
+        return client
+
+    async def get(self, url: str, weight=1, **kwargs) -> httpx.Response:
+        """weight - вес запроса в лимите биржи"""
+        host = urlsplit(url).netloc
+        if self.redirect is not None:
+            url = replay_url(self.redirect, url)
+        client = self.client(url)
+
+        async def send():
+            started = time.time()
+            response = await client.get(url, **kwargs)
+            server_clock.observe(host, response.headers.get('date'), started, time.time())
+            return response
+
+        response = await self.scheduler.request(host, send, weight)
+        if self.capture is not None:
+            self.capture.add(response)
+        return response
+
+    async def post(self, url: str, weight=1, **kwargs) -> httpx.Response:
+        client = self.client(url)
+        return await self.scheduler.request(urlsplit(url).netloc, lambda: client.post(url, **kwargs), weight)
+
+    async def close(self):
+        """Закрывает все соединения. Клиенты привязаны к event loop, поэтому вызывать перед выходом из asyncio.run"""
+        clients = list(self.clients.values())
+        self.clients.clear()
+        await asyncio.gather(*(client.aclose() for client in clients))
+
+
+client_manager = ClientManager()
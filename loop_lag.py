@@ -0,0 +1,58 @@
+import asyncio
+import time
+from collections import deque
+
+import numpy as np
+
+from metrics import metrics
+
+"""
+Задержка цикла событий.
+
+LoopLagMonitor каждые interval секунд засыпает на interval и замеряет, насколько позже он проснулся.
+Если синхронный код (pandas, разбор ответов) занимает цикл, таймер срабатывает позже, и эта разница -
+столько же ждали ответы бирж, тикеры WebSocket и остальные задачи.
+"""
+
+
+class LoopLagMonitor:
+    def __init__(self, interval=0.01, window=10_000) -> None:
+        self.interval = interval # с
+        self.samples = deque(maxlen=window) # Последние задержки, с
+        self.peak = 0.0 # Наибольшая задержка за всё время, с
+        self.task = None
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+        return self
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self.samples.append(lag)
+            self.peak = max(self.peak, lag)
+            metrics.observe('loop_lag_seconds', lag)
+
+    def reset(self):
+        self.samples.clear()
+        self.peak = 0.0
+
+    def summary(self):
+        """{'p50', 'p99', 'max'} в мс по последним замерам"""
+        if not self.samples:
+            return {'p50': float('nan'), 'p99': float('nan'), 'max': float('nan')}
+        samples = np.fromiter(self.samples, dtype=float) * 1000
+        return {'p50': float(np.percentile(samples, 50)), 'p99': float(np.percentile(samples, 99)), 'max': float(samples.max())}
+
+    def report(self):
+        summary = self.summary()
+        return f"loop lag p50 {summary['p50']:.1f} ms, p99 {summary['p99']:.1f} ms, max {summary['max']:.1f} ms"
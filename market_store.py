@@ -0,0 +1,204 @@
+from collections.abc import MutableMapping
+
+import numpy as np
+
+"""
+Компактное хранилище состояния рынка.
+
+Стандартные символы один раз переводятся в целые id (общие для всех бирж), а ask, bid, ставка
+финансирования, время выплаты (UTC, мс) и интервал выплат каждой биржи и рынка хранятся в непрерывных массивах NumPy по этим id.
+Обновление тикеров - запись в массив на месте, без словаря на символ, а pairing читает колонки напрямую.
+NaN - значения нет. Для старого кода остаются словарные представления symbols_prices, funding_rates, rate_times.
+"""
+
+
+class SymbolTable:
+    """Стандартный символ <-> целый id"""
+    def __init__(self) -> None:
+        self.ids = {} # {стандартный символ:id}
+        self.names = [] # [стандартный символ] по id
+        self._array = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, symbol):
+        index = self.ids.get(symbol)
+        if index is None:
+            index = self.ids[symbol] = len(self.names)
+            self.names.append(symbol)
+            self._array = None
+        return index
+
+    def array(self):
+        """Символы как массив object (для выборки по маске), пересоздаётся только при появлении новых символов"""
+        if self._array is None:
+            self._array = np.array(self.names, dtype=object)
+        return self._array
+
+
+symbol_table = SymbolTable()
+
+
+class MarketStore:
+    """Состояние одного рынка одной биржи: колонки ask, bid, rate, time, interval по id символа"""
+    COLUMNS = ('ask', 'bid', 'rate', 'time', 'interval')
+
+    def __init__(self, symbols=None, capacity=1024) -> None:
+        self.symbols = symbol_table if symbols is None else symbols
+        self.size = 0
+        for column in self.COLUMNS:
+            setattr(self, column, np.full(capacity, np.nan))
+
+        self.quotes = Quotes(self)
+        self.rates = Column(self, 'rate')
+        self.times = Column(self, 'time', int)
+        self.intervals = Column(self, 'interval', int)
+
+    def reserve(self):
+        """Расширяет массивы до числа символов в таблице (с запасом в 2 раза)"""
+        count = len(self.symbols)
+        if count > self.size:
+            capacity = len(self.ask)
+            if count > capacity:
+                capacity = max(count, capacity * 2)
+                for column in self.COLUMNS:
+                    values = np.full(capacity, np.nan)
+                    values[:self.size] = getattr(self, column)[:self.size]
+                    setattr(self, column, values)
+            self.size = count
+
+    def intern(self, symbol):
+        index = self.symbols.intern(symbol)
+        if index >= self.size:
+            self.reserve()
+        return index
+
+    def update(self, ids, **columns):
+        """Запись сразу по многим символам: ids - массив id, columns - {колонка: массив значений}"""
+        self.reserve()
+        for column, values in columns.items():
+            getattr(self, column)[ids] = values
+
+    def copy_from(self, other):
+        """Копирует все колонки другого хранилища в свои массивы (без новых выделений, если ёмкости хватает)"""
+        size = other.size
+        if len(self.ask) < size:
+            for column in self.COLUMNS:
+                setattr(self, column, np.full(len(getattr(other, column)), np.nan))
+        for column in self.COLUMNS:
+            getattr(self, column)[:size] = getattr(other, column)[:size]
+        self.size = size
+
+    def clear(self, column, mask):
+        """Удаляет значения колонки у символов, отмеченных маской"""
+        getattr(self, column)[:self.size][mask] = np.nan
+
+
+class Column(MutableMapping):
+    """Словарное представление одной колонки: {стандартный символ: значение}"""
+    def __init__(self, store, column, convert=float) -> None:
+        self.store = store
+        self.column = column
+        self.convert = convert
+
+    def values_array(self):
+        return getattr(self.store, self.column)[:self.store.size]
+
+    def __getitem__(self, symbol):
+        index = self.store.symbols.ids.get(symbol)
+        if index is None or index >= self.store.size:
+            raise KeyError(symbol)
+        value = getattr(self.store, self.column)[index]
+        if value != value:
+            raise KeyError(symbol)
+        return self.convert(value)
+
+    def __setitem__(self, symbol, value):
+        getattr(self.store, self.column)[self.store.intern(symbol)] = value
+
+    def __delitem__(self, symbol):
+        self[symbol]
+        getattr(self.store, self.column)[self.store.symbols.ids[symbol]] = np.nan
+
+    def __contains__(self, symbol):
+        index = self.store.symbols.ids.get(symbol)
+        return index is not None and index < self.store.size and not np.isnan(getattr(self.store, self.column)[index])
+
+    def present(self):
+        return ~np.isnan(self.values_array())
+
+    def __iter__(self):
+        names = self.store.symbols.names
+        return (names[index] for index in np.flatnonzero(self.present()).tolist())
+
+    def __len__(self):
+        return int(self.present().sum())
+
+    def snapshot(self):
+        """Копия колонки для сравнения в Scanner"""
+        return self.values_array().copy()
+
+    def changed(self, before):
+        """Символы, значение которых изменилось (или появилось / пропало) с момента snapshot"""
+        return _changed(self.store.symbols, [before], [self.values_array()])
+
+
+class Quotes(MutableMapping):
+    """Словарное представление цен: {стандартный символ: {'ask': ..., 'bid': ...}}. Словарь создаётся только при чтении"""
+    def __init__(self, store) -> None:
+        self.store = store
+
+    def __getitem__(self, symbol):
+        index = self.store.symbols.ids.get(symbol)
+        if index is None or index >= self.store.size or np.isnan(self.store.ask[index]):
+            raise KeyError(symbol)
+        return {'ask': float(self.store.ask[index]), 'bid': float(self.store.bid[index])}
+
+    def __setitem__(self, symbol, quote):
+        self.set(symbol, quote['ask'], quote['bid'])
+
+    def set(self, symbol, ask, bid):
+        index = self.store.intern(symbol)
+        self.store.ask[index] = ask
+        self.store.bid[index] = bid
+
+    def __delitem__(self, symbol):
+        self[symbol]
+        index = self.store.symbols.ids[symbol]
+        self.store.ask[index] = self.store.bid[index] = np.nan
+
+    def __contains__(self, symbol):
+        index = self.store.symbols.ids.get(symbol)
+        return index is not None and index < self.store.size and not np.isnan(self.store.ask[index])
+
+    def present(self):
+        return ~np.isnan(self.store.ask[:self.store.size])
+
+    def __iter__(self):
+        names = self.store.symbols.names
+        return (names[index] for index in np.flatnonzero(self.present()).tolist())
+
+    def __len__(self):
+        return int(self.present().sum())
+
+    def snapshot(self):
+        size = self.store.size
+        return self.store.ask[:size].copy(), self.store.bid[:size].copy()
+
+    def changed(self, before):
+        size = self.store.size
+        return _changed(self.store.symbols, before, (self.store.ask[:size], self.store.bid[:size]))
+
+
+def _changed(symbols, before, after):
+    """Символы, у которых отличается хотя бы одна колонка. NaN == NaN считается без изменений"""
+    size = len(after[0])
+    mask = np.zeros(size, dtype=bool)
+    for old, new in zip(before, after):
+        count = len(old)
+        current = new[:count]
+        mask[:count] |= (current != old) & ~(np.isnan(current) & np.isnan(old))
+        mask[count:] |= ~np.isnan(new[count:])
+    names = symbols.names
+    return {names[index] for index in np.flatnonzero(mask).tolist()}
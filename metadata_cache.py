@@ -0,0 +1,69 @@
+import json
+import sqlite3
+import time
+import zlib
+
+"""
+Кэш первичных данных бирж на диске.
+
+primary_data, primary_data_spot, множители цен, размеры контрактов и интервалы выплат фьючерсов каждой биржи сохраняются в SQLite (сжатый JSON, обратные словари
+reverse_data/reverse_data_spot и листинги в symbol_registry восстанавливаются из прямых). При старте кэш загружается за миллисекунды,
+а свежие данные запрашиваются у биржи в фоне, поэтому первая таблица не ждёт запросов списков символов.
+Запись недействительна, если сменилась версия формата, список запросов биржи или истёк max_age.
+"""
+
+CACHE_VERSION = 4
+
+
+class MetadataCache:
+    def __init__(self, path='metadata_cache.sqlite', max_age=24 * 60 * 60) -> None:
+        self.path = path
+        self.max_age = max_age # с
+        self.connection = None
+
+    def connect(self):
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path)
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS metadata (exchange TEXT PRIMARY KEY, version TEXT, saved_at REAL, data BLOB)"
+            )
+        return self.connection
+
+    def version(self, exchange):
+        urls = ",".join(instruments.url for instruments in exchange.instruments)
+        return f"{CACHE_VERSION}:{zlib.crc32(urls.encode())}"
+
+    def load(self, exchange) -> bool:
+        """Заполняет первичные данные биржи из кэша. False - записи нет или она устарела"""
+        row = self.connect().execute(
+            "SELECT data FROM metadata WHERE exchange = ? AND version = ? AND saved_at > ?",
+            (exchange.get_name(), self.version(exchange), time.time() - self.max_age),
+        ).fetchone()
+        if row is None:
+            return False
+
+        data = json.loads(zlib.decompress(row[0]))
+        if exchange.spot and not data['spot']:
+            return False
+        for market in ('futures', 'spot'):
+            exchange.contract_sizes[market] = data['contract_sizes'][market]
+            exchange.set_listings(market, data[market], data['multipliers'][market])
+        # Интервалы из списка символов (Bybit), тикеров (Kucoin) или по смене времени выплаты (Bingx): без них до первых тикеров действует DEFAULT_INTERVAL
+        listed = set(exchange.primary_data.values())
+        for symbol, interval in data['intervals'].items():
+            if symbol in listed:
+                exchange.funding_intervals[symbol] = interval
+        return True
+
+    def save(self, exchange):
+        data = zlib.compress(json.dumps({'futures': exchange.primary_data, 'spot': exchange.primary_data_spot, 'multipliers': exchange.multipliers,
+                                        'contract_sizes': exchange.contract_sizes, 'intervals': dict(exchange.funding_intervals)}, separators=(',', ':')).encode())
+        connection = self.connect()
+        connection.execute(
+            "INSERT OR REPLACE INTO metadata (exchange, version, saved_at, data) VALUES (?, ?, ?, ?)",
+            (exchange.get_name(), self.version(exchange), time.time(), data),
+        )
+        connection.commit()
+
+
+metadata_cache = MetadataCache()
@@ -0,0 +1,199 @@
+import asyncio
+import bisect
+import json
+import time
+
+"""
+Метрики горячего пути.
+
+Гистограммы длительностей (запросы к биржам, разбор ответов, цикл биржи, расчёт таблицы) и счётчики
+(отброшенные строки по причине, ошибки запросов). По умолчанию выключены: metrics.span() возвращает
+общий пустой контекст, а счётчики не вызываются, поэтому накладные расходы - одна проверка флага.
+Включаются флагом --metrics PORT в скриптах: GET /metrics - формат Prometheus, GET /stats - JSON.
+Процессы-шарды (shards.py) присылают свои снимки, они выводятся с меткой process.
+"""
+
+# Границы гистограмм длительностей, с
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PREFIX = "scanner_"
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # Последняя корзина - больше всех границ (+Inf)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        return {'buckets': list(self.buckets), 'counts': list(self.counts), 'sum': self.sum, 'count': self.count}
+
+
+class _Span:
+    __slots__ = ('metrics', 'name', 'labels', 'started')
+
+    def __init__(self, metrics, name, labels) -> None:
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NO_SPAN = _NoSpan()
+
+
+class Metrics:
+    def __init__(self, enabled=False) -> None:
+        self.enabled = enabled
+        self.histograms = {} # {(имя, ((метка, значение), ...)): Histogram}
+        self.counters = {} # {(имя, ((метка, значение), ...)): число}
+        self.remote = {} # {процесс: snapshot()} - метрики процессов-шардов
+        self.started = time.time()
+        self.server = None
+
+    def span(self, name, **labels):
+        """with metrics.span('parse_seconds', exchange=...): - длительность блока в гистограмму name"""
+        if not self.enabled:
+            return NO_SPAN
+        return _Span(self, name, labels)
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(value)
+
+    def count(self, name, value=1, **labels):
+        if not self.enabled or not value:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def reset(self):
+        self.histograms.clear()
+        self.counters.clear()
+        self.remote.clear()
+
+    def snapshot(self):
+        """Все метрики процесса в JSON-совместимом виде"""
+        return {
+            'histograms': [{'name': name, 'labels': dict(labels), **histogram.snapshot()} for (name, labels), histogram in self.histograms.items()],
+            'counters': [{'name': name, 'labels': dict(labels), 'value': value} for (name, labels), value in self.counters.items()],
+        }
+
+    def stats(self):
+        """JSON для /stats: по процессам, гистограммы со средним и квантилями по корзинам"""
+        processes = {'main': self.snapshot(), **self.remote}
+        result = {'uptime': time.time() - self.started, 'processes': {}}
+        for process, snapshot in processes.items():
+            histograms = []
+            for histogram in snapshot['histograms']:
+                count = histogram['count']
+                histograms.append({
+                    'name': histogram['name'], 'labels': histogram['labels'], 'count': count, 'sum': histogram['sum'],
+                    'mean': histogram['sum'] / count if count else None,
+                    'p50': _quantile(histogram, 0.5), 'p99': _quantile(histogram, 0.99),
+                })
+            result['processes'][process] = {'histograms': histograms, 'counters': snapshot['counters']}
+        return result
+
+    def prometheus(self):
+        """Текстовый формат Prometheus по всем процессам"""
+        families = {} # {имя: (тип, [строки])}
+        for process, snapshot in {'main': self.snapshot(), **self.remote}.items():
+            for histogram in snapshot['histograms']:
+                lines = families.setdefault(histogram['name'], ('histogram', []))[1]
+                labels = {**histogram['labels'], 'process': process}
+                cumulative = 0
+                for bound, count in zip([*histogram['buckets'], '+Inf'], histogram['counts']):
+                    cumulative += count
+                    lines.append(f"{PREFIX}{histogram['name']}_bucket{_labels({**labels, 'le': bound})} {cumulative}")
+                lines.append(f"{PREFIX}{histogram['name']}_sum{_labels(labels)} {histogram['sum']}")
+                lines.append(f"{PREFIX}{histogram['name']}_count{_labels(labels)} {histogram['count']}")
+            for counter in snapshot['counters']:
+                lines = families.setdefault(counter['name'], ('counter', []))[1]
+                lines.append(f"{PREFIX}{counter['name']}{_labels({**counter['labels'], 'process': process})} {counter['value']}")
+
+        text = []
+        for name, (kind, lines) in families.items():
+            text.append(f"# TYPE {PREFIX}{name} {kind}")
+            text.extend(lines)
+        return "\n".join(text) + "\n"
+
+    async def serve(self, port, host='127.0.0.1'):
+        """HTTP сервер метрик: /metrics (Prometheus) и /stats (JSON)"""
+        self.server = await asyncio.start_server(self._handle, host, port)
+        return self.server
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = (await reader.readuntil(b"\r\n\r\n")).split(b"\r\n", 1)[0].decode("latin-1")
+            path = request_line.split(" ")[1].split("?")[0] if " " in request_line else "/"
+            if path == "/metrics":
+                status, content_type, body = b"200 OK", b"text/plain; version=0.0.4", self.prometheus().encode()
+            elif path == "/stats":
+                status, content_type, body = b"200 OK", b"application/json", json.dumps(self.stats()).encode()
+            else:
+                status, content_type, body = b"404 Not Found", b"text/plain", b"/metrics or /stats\n"
+            writer.write(b"HTTP/1.1 " + status + b"\r\nContent-Type: " + content_type
+                         + f"\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+
+def _quantile(histogram, q):
+    """Верхняя граница корзины, в которую попадает квантиль q (None - наблюдений нет или квантиль выше всех границ)"""
+    count = histogram['count']
+    if not count:
+        return None
+    rank, cumulative = q * count, 0
+    for bound, bucket in zip(histogram['buckets'], histogram['counts']):
+        cumulative += bucket
+        if cumulative >= rank:
+            return bound
+    return None
+
+
+metrics = Metrics()
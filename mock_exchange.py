@@ -0,0 +1,223 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import deque
+from email.utils import formatdate
+
+import capture
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+"""
+Локальный мок биржи для бенчмарков.
+
+Простой HTTP/1.1 сервер с поддержкой keep-alive. Отдаёт заранее заданные JSON ответы
+и считает количество принятых соединений (каждое соединение = одно рукопожатие).
+handshake_delay эмулирует стоимость TCP+TLS рукопожатия реальной биржи, latency - время ответа.
+rate_limit=(запросов, секунд) - как биржа, отвечает 429 с Retry-After при превышении лимита.
+jitter - случайная добавка к latency (±, с), errors и disconnects - доли ответов 503 и оборванных соединений.
+Заголовок Date отдаётся с точностью до секунды, как у бирж; skew - на сколько секунд часы мока уходят от локальных.
+
+MockExchange.from_capture воспроизводит ответы, записанные capture.py: все биржи на одном сервере,
+хост биржи - первая часть пути. Запуск отдельным процессом для скриптов с --replay:
+    python mock_exchange.py DIR --port 8900 --latency 0.05 --jitter 0.02 --errors 0.01
+
+MockStream - WebSocket сервер, который воспроизводит записанные кадры биржи для streaming.py.
+"""
+
+
+class MockExchange:
+    def __init__(self, routes=None, latency=0.0, handshake_delay=0.0, rate_limit=None, jitter=0.0, errors=0.0, disconnects=0.0, seed=None, skew=0.0) -> None:
+        self.routes = routes or {} # {путь (можно с query):ответ в виде dict/list или bytes}
+        self.latency = latency
+        self.handshake_delay = handshake_delay
+        self.rate_limit = rate_limit # (запросов, за сколько секунд) или None
+        self.jitter = jitter # с
+        self.errors = errors # Доля ответов 503
+        self.disconnects = disconnects # Доля запросов, на которые соединение закрывается без ответа
+        self.skew = skew # Сдвиг часов в заголовке Date, с
+        self.random = random.Random(seed)
+
+        self.connections = 0 # Количество принятых соединений
+        self.requests = 0 # Количество обработанных запросов
+        self.rejected = 0 # Количество ответов 429
+        self.failed = 0 # Количество ответов 503 и оборванных соединений
+        self.recent = deque() # Время запросов в текущем окне лимита
+        self.server = None
+        self.port = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    @classmethod
+    def from_capture(cls, directory, **options):
+        return cls(routes=capture.load(directory), **options)
+
+    async def start(self, port=0):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def reset_counters(self):
+        self.connections = 0
+        self.requests = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def _retry_after(self):
+        """Сколько секунд ждать до освобождения лимита (None - запрос укладывается в лимит)"""
+        if self.rate_limit is None:
+            return None
+        limit, window = self.rate_limit
+        now = time.monotonic()
+        while self.recent and self.recent[0] <= now - window:
+            self.recent.popleft()
+        if len(self.recent) >= limit:
+            return self.recent[0] + window - now
+        self.recent.append(now)
+        return None
+
+    def _payload(self, target: str) -> bytes:
+        body = self.routes.get(target)
+        if body is None:
+            body = self.routes.get(capture.route_key(target))
+        if body is None:
+            body = self.routes.get(target.split('?')[0], {"data": []})
+        if isinstance(body, bytes):
+            return body
+        return json.dumps(body).encode()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        if self.handshake_delay:
+            await asyncio.sleep(self.handshake_delay)
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                request_line, *headers = head.decode("latin-1").split("\r\n")
+                target = request_line.split(" ")[1]
+                keep_alive = not any(h.lower() == "connection: close" for h in headers)
+
+                self.requests += 1
+                delay = self.latency + (self.random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if self.disconnects and self.random.random() < self.disconnects:
+                    self.failed += 1
+                    break
+
+                retry_after = self._retry_after()
+                if retry_after is not None:
+                    self.rejected += 1
+                    status, extra, body = b"429 Too Many Requests", f"Retry-After: {retry_after:.2f}\r\n".encode(), b'{"code": 429}'
+                elif self.errors and self.random.random() < self.errors:
+                    self.failed += 1
+                    status, extra, body = b"503 Service Unavailable", b"", b'{"code": 503}'
+                else:
+                    status, extra, body = b"200 OK", b"", self._payload(target)
+                writer.write(
+                    b"HTTP/1.1 " + status + b"\r\n"
+                    b"Content-Type: application/json\r\n"
+                    + f"Date: {formatdate(time.time() + self.skew, usegmt=True)}\r\n".encode()
+                    + extra
+                    + f"Content-Length: {len(body)}\r\n".encode()
+                    + (b"Connection: keep-alive\r\n\r\n" if keep_alive else b"Connection: close\r\n\r\n")
+                    + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+class MockStream:
+    def __init__(self, frames, interval=0.0, drop_after=None) -> None:
+        self.frames = frames # Записанные кадры: str/bytes отправляются как есть, остальное через json.dumps
+        self.interval = interval # Пауза между кадрами, с
+        self.drop_after = drop_after # Разорвать первое соединение после N кадров (проверка переподключения)
+
+        self.connections = 0
+        self.received = [] # Сообщения клиента (подписки, ping) по соединениям
+        self.server = None
+        self.port = None
+
+    @property
+    def url(self) -> str:
+        return f"ws://127.0.0.1:{self.port}"
+
+    async def start(self):
+        if websockets is None:
+            raise ImportError("Для MockStream нужен пакет websockets: pip install websockets")
+        self.server = await websockets.serve(self._handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _read(self, ws, received):
+        async for message in ws:
+            received.append(message)
+
+    async def _handle(self, ws, *args):
+        self.connections += 1
+        connection = self.connections
+        received = []
+        self.received.append(received)
+        reader = asyncio.create_task(self._read(ws, received))
+        try:
+            for number, frame in enumerate(self.frames):
+                if connection == 1 and self.drop_after is not None and number >= self.drop_after:
+                    return
+                await ws.send(frame if isinstance(frame, (str, bytes)) else json.dumps(frame))
+                if self.interval:
+                    await asyncio.sleep(self.interval)
+            await reader
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            reader.cancel()
+
+
+async def serve(server, port):
+    await server.start(port)
+    print(f"{len(server.routes)} routes at {server.base_url}, stop with Ctrl+C")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальный мок бирж: воспроизводит ответы, записанные с --capture")
+    parser.add_argument("directory", help="Каталог записи (--capture DIR)")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.0, help="Задержка ответа, с")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Случайная добавка к задержке, ± с")
+    parser.add_argument("--errors", type=float, default=0.0, help="Доля ответов 503")
+    parser.add_argument("--disconnects", type=float, default=0.0, help="Доля оборванных соединений")
+    parser.add_argument("--skew", type=float, default=0.0, help="Сдвиг часов мока в заголовке Date, с")
+    args = parser.parse_args()
+
+    server = MockExchange.from_capture(args.directory, latency=args.latency, jitter=args.jitter, errors=args.errors, disconnects=args.disconnects,
+                                     skew=args.skew)
+    try:
+        asyncio.run(serve(server, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+
+from symbol_registry import symbol_registry
+from metrics import metrics
+from clock import DEFAULT_INTERVAL, HOUR
+
+"""
+Векторное построение пар бирж для стратегии фьючерс + фьючерс.
+
+Колонки всех бирж (id символа, биржа, rate, ask, bid, time, interval, fee) читаются напрямую из market_store.MarketStore
+и склеиваются в массивы, после чего все пары основная биржа / биржа хеджирования строятся одним self-join
+по id символа (argsort + searchsorted, без pandas merge). В join попадают только символы,
+листингованные хотя бы на двух фьючерсных биржах (symbol_registry.futures_futures), а направления сделок, цены и разница цен считаются над колонками целиком.
+"""
+
+PAIR_COLUMNS = ['symbol', 'main_exchange', 'route_1', 'hadge_exchange', 'route_2', 'rate_1(%)', 'rate_2(%)', 'price_1', 'price_2', 'price_difference(%)', 'fee(%)', 'time_1', 'time_2', 'interval_1(h)', 'interval_2(h)']
+
+
+def snapshot(objects, symbols=None, scale=1):
+    """Колонки {имя: массив} по всем (биржа, символ), у которых есть и ставка финансирования, и цены.
+    scale - множитель ставок и комиссий (100 - в процентах)"""
+    parts = []
+    for number, exchange in enumerate(objects):
+        store = exchange.futures_market
+        size = store.size
+        mask = ~np.isnan(store.rate[:size]) & ~np.isnan(store.ask[:size]) & symbol_registry.mask('futures_futures', size)
+        if symbols is not None:
+            selected = np.zeros(size, dtype=bool)
+            selected[[index for index in map(store.symbols.ids.get, symbols) if index is not None and index < size]] = True
+            mask &= selected
+        ids = np.flatnonzero(mask)
+        parts.append({
+            'code': ids,
+            'exchange': np.full(len(ids), number),
+            'rate': store.rate[ids] * scale,
+            'ask': store.ask[ids],
+            'bid': store.bid[ids],
+            'time': store.time[ids],
+            'interval': store.interval[ids] / HOUR,
+            'fee': np.full(len(ids), float(exchange.TAKER_FEE) * scale),
+        })
+    return {column: np.concatenate([part[column] for part in parts]) for column in parts[0]} if parts else {}
+
+
+def join_symbols(codes, left):
+    """Индексы пар строк (left[i], j) с одинаковым кодом символа. codes - коды символов всех строк"""
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    starts = np.searchsorted(sorted_codes, codes[left], 'left')
+    counts = np.searchsorted(sorted_codes, codes[left], 'right') - starts
+
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(left, counts), order[np.repeat(starts, counts) + offsets]
+
+
+def price_difference(short, price_1, price_2):
+    """Разница цен в % в пользу сделки: SHORT на основной бирже продаёт по price_1 и покупает хедж по price_2"""
+    return 100 - np.where(short, price_2 / price_1, price_1 / price_2) * 100
+
+
+def drop_denied(objects, codes, exchanges, left, right):
+    """Убирает пары из symbol_registry.deny_futures_pairs (один тикер - разные монеты на двух фьючерсных биржах)"""
+    numbers = {exchange.get_name(): number for number, exchange in enumerate(objects)}
+    keep = np.ones(len(left), dtype=bool)
+    for exchange_1, exchange_2, symbol in symbol_registry.deny_futures_pairs:
+        code = symbol_registry.symbols.ids.get(symbol)
+        if code is None or exchange_1 not in numbers or exchange_2 not in numbers:
+            continue
+        keep &= ~((codes[left] == code) & (exchanges[left] == numbers[exchange_1]) & (exchanges[right] == numbers[exchange_2]))
+    metrics.count('dropped_pairs_total', int(len(keep) - keep.sum()), table='futures_futures', reason='denied_pair')
+    return left[keep], right[keep]
+
+
+def pair_futures(objects, min_rate=0.1, symbols=None, scale=1, interval=None):
+    """Все пары бирж по общим символам. Основная биржа - та, где |ставка| >= min_rate (в единицах scale).
+    interval - min_rate задан на выплату раз в interval часов: ставки с другим интервалом сначала приводятся к нему"""
+    data = snapshot(objects, symbols=symbols, scale=scale)
+    if not data:
+        return pd.DataFrame(columns=PAIR_COLUMNS)
+    codes, exchanges, rate = data['code'], data['exchange'], data['rate']
+
+    threshold = np.abs(rate)
+    if interval is not None:
+        threshold = threshold * interval / np.where(np.isnan(data['interval']), DEFAULT_INTERVAL / HOUR, data['interval'])
+    left, right = join_symbols(codes, np.flatnonzero(threshold >= min_rate))
+    other = exchanges[left] != exchanges[right]
+    left, right = left[other], right[other]
+    left, right = drop_denied(objects, codes, exchanges, left, right)
+
+    ask, bid = data['ask'], data['bid']
+    time, fee = data['time'], data['fee']
+    names = np.array([exchange.get_name() for exchange in objects], dtype=object)[exchanges]
+    symbol = objects[0].futures_market.symbols.array()[codes]
+
+    # Положительная ставка - SHORT на основной бирже по bid, LONG на хедже по ask. Отрицательная - наоборот
+    short = rate[left] >= 0
+    price_1 = np.where(short, bid[left], ask[left])
+    price_2 = np.where(short, ask[right], bid[right])
+    difference = price_difference(short, price_1, price_2)
+
+    return pd.DataFrame({
+        'symbol': symbol[left],
+        'main_exchange': names[left],
+        'route_1': np.where(short, 'SHORT', 'LONG').astype(object),
+        'hadge_exchange': names[right],
+        'route_2': np.where(short, 'LONG', 'SHORT').astype(object),
+        'rate_1(%)': rate[left],
+        'rate_2(%)': rate[right],
+        'price_1': price_1,
+        'price_2': price_2,
+        'price_difference(%)': difference,
+        'fee(%)': fee[left] * 2 + fee[right] * 2,
+        'time_1': time[left],
+        'time_2': time[right],
+        'interval_1(h)': data['interval'][left],
+        'interval_2(h)': data['interval'][right],
+    }, columns=PAIR_COLUMNS)
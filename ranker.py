@@ -0,0 +1,58 @@
+import bisect
+import itertools
+import math
+
+import pandas as pd
+
+"""
+Рейтинг возможностей без полной пересортировки.
+
+Строки таблицы хранятся в списке, отсортированном по убыванию оценки (например, result(%)).
+При изменении тикеров Scanner пересчитывает строки только изменившихся символов, а OpportunityRanker
+удаляет старые строки этих символов и вставляет новые бинарным поиском. Лучшие K строк - срез
+начала списка за O(K), без сортировки всей таблицы.
+"""
+
+
+class OpportunityRanker:
+    def __init__(self, score, group='symbol', k=None) -> None:
+        self.score = score # Колонка оценки, по убыванию
+        self.group = group # Колонка символа: строки заменяются целиком по символу
+        self.k = k # Сколько лучших строк отдаёт top() по умолчанию (None - все)
+        self.columns = None
+
+        self.order = [] # [(-оценка, номер строки)] по возрастанию, то есть по убыванию оценки
+        self.rows = {} # {номер строки: значения строки}
+        self.groups = {} # {символ: [(-оценка, номер строки)]}
+        self.counter = itertools.count()
+
+    def __len__(self):
+        return len(self.order)
+
+    def remove(self, symbol):
+        for entry in self.groups.pop(symbol, ()):
+            index = bisect.bisect_left(self.order, entry)
+            del self.order[index]
+            del self.rows[entry[1]]
+
+    def replace(self, symbols, table):
+        """Заменяет строки символов symbols строками table (table содержит только эти символы)"""
+        if self.columns is None:
+            self.columns = list(table.columns)
+        for symbol in symbols:
+            self.remove(symbol)
+
+        position = self.columns.index(self.score)
+        group = self.columns.index(self.group)
+        for values in zip(*(table[column].tolist() for column in self.columns)):
+            score = values[position]
+            entry = (-score if not math.isnan(score) else math.inf, next(self.counter)) # NaN - в конец
+            bisect.insort(self.order, entry)
+            self.rows[entry[1]] = values
+            self.groups.setdefault(values[group], []).append(entry)
+
+    def top(self, k=None):
+        """DataFrame с лучшими k строками (по умолчанию self.k)"""
+        k = self.k if k is None else k
+        entries = self.order if k is None else self.order[:k]
+        return pd.DataFrame([self.rows[number] for _, number in entries], columns=self.columns)
@@ -0,0 +1,118 @@
+import asyncio
+import random
+import time
+import httpx
+
+from metrics import metrics
+
+"""
+Ограничение частоты запросов к биржам.
+
+Для каждого хоста действует token bucket с опубликованным биржей лимитом (вес запросов в секунду)
+и семафор на число одновременных запросов. Ответ 429 приостанавливает весь хост на Retry-After
+(или экспоненциальную задержку), временные ошибки (обрыв соединения, 5xx) повторяются.
+"""
+
+# {хост: (вес в секунду, запас (burst), одновременных запросов)}
+HOST_LIMITS = {
+    "api.bybit.com": (100, 100, 20), # 600 запросов / 5 с
+    "contract.mexc.com": (8, 4, 10), # 20 запросов / 2 с: burst + пополнение за 2 с не превышают 20
+    "api.mexc.com": (50, 100, 20), # вес 500 / 10 с
+    "open-api.bingx.com": (10, 20, 10), # 100 запросов / 10 с
+    "api-futures.kucoin.com": (60, 100, 20), # вес 2000 / 30 с
+    "api.kucoin.com": (60, 100, 20), # вес 2000 / 30 с
+}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None) -> None:
+        self.rate = rate # Пополнение, вес в секунду
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0 # После 429 хост не получает запросов до этого момента
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, weight=1):
+        async with self.lock: # Ожидающие получают токены по очереди
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= weight:
+                    self.tokens -= weight
+                    return
+                await asyncio.sleep((weight - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+class HostLimit:
+    def __init__(self, rate, capacity, concurrency) -> None:
+        self.bucket = TokenBucket(rate, capacity)
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+
+class RequestScheduler:
+    def __init__(self, limits=None, retries=3, backoff=0.5, max_backoff=30.0) -> None:
+        self.limits = HOST_LIMITS if limits is None else limits # {хост: (вес в секунду, burst, одновременных запросов)}
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hosts = {} # {хост: HostLimit}
+
+        self.retried = 0 # Повторов за всё время
+        self.throttled = 0 # Ответов 429 за всё время
+
+    def host(self, host):
+        if host not in self.hosts:
+            settings = self.limits.get(host)
+            self.hosts[host] = HostLimit(*settings) if settings else None
+        return self.hosts[host]
+
+    def delay(self, attempt, response=None):
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.max_backoff)
+                except ValueError:
+                    pass
+        return min(self.backoff * 2 ** attempt, self.max_backoff) * random.uniform(0.8, 1.2)
+
+    async def request(self, host, send, weight=1):
+        """send - функция без аргументов, выполняющая запрос. Возвращает последний ответ или пробрасывает последнюю ошибку"""
+        limit = self.host(host)
+        for attempt in range(self.retries + 1):
+            response = None
+            try:
+                if limit is None:
+                    response = await send()
+                else:
+                    async with limit.semaphore:
+                        await limit.bucket.acquire(weight)
+                        response = await send()
+            except httpx.TransportError as e:
+                if attempt == self.retries:
+                    raise
+                metrics.count('http_retries_total', host=host, reason=type(e).__name__)
+
+            if response is not None and (response.status_code not in RETRY_STATUSES or attempt == self.retries):
+                return response
+
+            delay = self.delay(attempt, response)
+            if response is not None:
+                metrics.count('http_retries_total', host=host, reason=str(response.status_code))
+            if response is not None and response.status_code == 429:
+                self.throttled += 1
+                if limit is not None:
+                    limit.bucket.pause(delay)
+            self.retried += 1
+            await asyncio.sleep(delay)
@@ -0,0 +1,156 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from functools import partial
+
+import numpy as np
+
+from market_store import symbol_table
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+"""
+Запись истории ставок, цен и таблиц возможностей.
+
+Каждый цикл к буферу в памяти добавляются колонки MarketStore всех бирж (копии массивов, без построчных
+преобразований) и опубликованная таблица. Буфер сбрасывается на диск пачкой в отдельном потоке, когда набралось
+flush_rows строк или прошло flush_interval секунд. Файлы разбиты по дням (UTC):
+    <directory>/<набор>/date=YYYY-MM-DD/part-<время>.arrow (или .parquet)
+Arrow IPC файлы читаются через memory map без копирования, Parquet - компактнее на диске.
+next_funding_time записывается как в rate_times (UTC, мс).
+"""
+
+
+class Recorder:
+    def __init__(self, directory='history', file_format='arrow', flush_rows=200_000, flush_interval=60.0) -> None:
+        if pa is None:
+            raise ImportError("Для записи истории нужен пакет pyarrow: pip install pyarrow")
+        self.directory = directory
+        self.file_format = file_format # arrow или parquet
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+
+        self.buffers = {} # {набор: [функция без аргументов -> pa.Table]} ещё не записанные пачки
+        self.rows = 0
+        self.flushed_at = time.monotonic()
+        self.pending = None # Future текущего сброса в потоке
+        self.written = 0 # Записано строк за всё время
+
+    def record_markets(self, exchanges, timestamp=None):
+        """Снимок колонок ask, bid, ставки и времени выплаты всех бирж. timestamp - мс UTC (по умолчанию сейчас)"""
+        timestamp = int(time.time() * 1000) if timestamp is None else timestamp
+        names = symbol_table.array()
+        for exchange in exchanges:
+            for market, store in (('futures', exchange.futures_market), ('spot', exchange.spot_market)):
+                size = store.size
+                ids = np.flatnonzero(~np.isnan(store.ask[:size]) | ~np.isnan(store.rate[:size]))
+                if len(ids) == 0:
+                    continue
+                # В цикле событий только копии колонок, pa.Table строится при записи в потоке
+                columns = {
+                    'ask': store.ask[ids], 'bid': store.bid[ids],
+                    'funding_rate': store.rate[ids], 'next_funding_time': store.time[ids],
+                }
+                self._append('markets', partial(_market_table, timestamp, exchange.get_name(), market, names, ids, columns), len(ids))
+
+    def record_table(self, name, table, timestamp=None):
+        """Таблица возможностей (pandas DataFrame, не изменяется после передачи) с колонкой time"""
+        if len(table) == 0:
+            return
+        timestamp = int(time.time() * 1000) if timestamp is None else timestamp
+        self._append(name, partial(_frame_table, timestamp, table), len(table))
+
+    def _append(self, name, part, rows):
+        self.buffers.setdefault(name, []).append(part)
+        self.rows += rows
+        if self.rows >= self.flush_rows or time.monotonic() - self.flushed_at >= self.flush_interval:
+            self.flush_background()
+
+    def flush_background(self):
+        """Сбрасывает буфер в потоке, не блокируя цикл событий. Без запущенного цикла - сразу"""
+        if self.pending is not None and not self.pending.done():
+            return
+        buffers, self.buffers, self.rows = self.buffers, {}, 0
+        self.flushed_at = time.monotonic()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(buffers)
+            return
+        self.pending = loop.run_in_executor(None, self._write, buffers)
+
+    def flush(self):
+        """Синхронно записывает всё, что есть в буфере"""
+        buffers, self.buffers, self.rows = self.buffers, {}, 0
+        self.flushed_at = time.monotonic()
+        self._write(buffers)
+
+    async def close(self):
+        if self.pending is not None:
+            await self.pending
+        self.flush()
+
+    def _write(self, buffers):
+        for name, tables in buffers.items():
+            table = pa.concat_tables([part() for part in tables], promote_options='default')
+            # Строковые колонки (биржа, рынок, символ) повторяются в каждой строке - храним словарём
+            for index, field in enumerate(table.schema):
+                if pa.types.is_string(field.type):
+                    table = table.set_column(index, field.name, table.column(index).combine_chunks().dictionary_encode())
+            days = (table['time'].to_numpy() // 86_400_000).astype(np.int64)
+            for day in np.unique(days):
+                part = table.filter(pa.array(days == day))
+                date = datetime.fromtimestamp(int(day) * 86400, timezone.utc).strftime('%Y-%m-%d')
+                directory = os.path.join(self.directory, name, f"date={date}")
+                os.makedirs(directory, exist_ok=True)
+                path = os.path.join(directory, f"part-{time.time_ns()}.{self.file_format}")
+                if self.file_format == 'parquet':
+                    pq.write_table(part, path, compression='zstd')
+                else:
+                    with pa.OSFile(path, 'wb') as sink, ipc.new_file(sink, part.schema) as writer:
+                        writer.write_table(part)
+                self.written += len(part)
+
+
+def _market_table(timestamp, exchange, market, names, ids, columns):
+    count = len(ids)
+    return pa.table({
+        'time': np.full(count, timestamp, dtype=np.int64),
+        'exchange': pa.array([exchange] * count),
+        'market': pa.array([market] * count),
+        'symbol': pa.array(names[ids].tolist(), pa.string()),
+        **columns,
+    })
+
+
+def _frame_table(timestamp, table):
+    arrow = pa.Table.from_pandas(table, preserve_index=False)
+    return arrow.add_column(0, 'time', pa.array(np.full(len(table), timestamp, dtype=np.int64)))
+
+
+def read(directory, name='markets', start=None, end=None):
+    """Читает набор за дни [start, end] ('YYYY-MM-DD', None - без границы) в один pyarrow.Table.
+    Arrow файлы отображаются в память (memory map), поэтому чтение не копирует данные"""
+    if pa is None:
+        raise ImportError("Для чтения истории нужен пакет pyarrow: pip install pyarrow")
+    root = os.path.join(directory, name)
+    tables = []
+    for partition in sorted(os.listdir(root)) if os.path.isdir(root) else []:
+        date = partition.split('=', 1)[-1]
+        if (start is not None and date < start) or (end is not None and date > end):
+            continue
+        for file_name in sorted(os.listdir(os.path.join(root, partition))):
+            path = os.path.join(root, partition, file_name)
+            if file_name.endswith('.parquet'):
+                tables.append(pq.read_table(path, memory_map=True))
+            elif file_name.endswith('.arrow'):
+                tables.append(ipc.open_file(pa.memory_map(path)).read_all())
+    if not tables:
+        return None
+    return pa.concat_tables(tables, promote_options='default')
@@ -1,335 +1,238 @@
-from datetime import datetime, timedelta
-import httpx
-import requests
+from http_client import client_manager
+from exchanges import Bybit, Kucoin, Mexc, Bingx
+from metadata_cache import metadata_cache
+from scanner import Scanner
+from shards import ShardedScanner
+from loop_lag import LoopLagMonitor
+from metrics import metrics
+from capture import Capture
+from alerts import Alerts
+from settlement import SettlementCalendar
+from clock import DISPLAY_OFFSET, server_clock
+from streaming import create_streams
+from pairing import pair_futures, price_difference
+from depth import DepthBooks
+from recorder import Recorder
+from scoring import annualized_score, opportunity_score
+import argparse
 import asyncio
-import time
+import json
+from functools import partial
 import pandas as pd
-import numpy as np
 
-class Bybit:
-    def __init__(self) -> None:
-        self.symbols = {}
-        self.primary_data = {}
-        self.symbols_prices = {}
-        self.rate_times = {}
-
-        self.TAKER_FEE = 0.11 # % 0.0011
-        self.MAKER_FEE = 0.036 # % 0.00036
-
-    async def _get_primary_data(self):
-        async with httpx.AsyncClient() as client:
-            data = await client.get("https://api.bybit.com/v5/market/instruments-info?category=linear")
-            data = data.json()['result']['list']
-            for symbol in data:
-                try:
-                    self.primary_data[symbol['symbol']] = symbol['baseCoin'] + "/" +symbol['quoteCoin']
-                except ValueError:
-                    continue
-        
-    async def get_symbols_from_exchange(self):
-        if len(self.primary_data) == 0:
-            await self._get_primary_data()
-
-        async with httpx.AsyncClient() as client:
-            data = await client.get("https://api.bybit.com/v5/market/tickers?category=linear")
-            data = data.json()['result']['list']
-            for symbol in data:
-                try:
-                    key = self.primary_data[symbol['symbol']]
-                    self.symbols[key] = float(symbol['fundingRate']) * 100
-
-                    self.symbols_prices[key] = {'ask': float(symbol['ask1Price']), 'bid': float(symbol['bid1Price'])}
-
-                    self.rate_times[key] = int(symbol['nextFundingTime']) + 3 * 60 * 60 * 1000
-                except Exception:
-                    continue
-
-    def get_name(self):
-        return "Bybit"
-
-class Mexc:
-    def __init__(self) -> None:
-        self.symbols = {}
-        self.primary_data = {}
-        self.symbols_prices = {}
-        self.rate_times = {}
-
-        self.TAKER_FEE = 0.02 # % 0.0011
-        self.MAKER_FEE = 0 # % 0.00036
-
-    async def _get_primary_data(self):
-        async with httpx.AsyncClient() as client:
-            data = await client.get("https://contract.mexc.com/api/v1/contract/detail")
-            data = data.json()
-            for symbol in data['data']:
-                try:
-              
-                    self.primary_data[symbol['symbol']] = symbol['baseCoin'] + "/" +symbol['quoteCoin']
-                except ValueError:
-                    continue
-    
-    async def fetch_funding_rate(self, client, symbol):
-        try:
-            symbol_mexc = symbol.split('/')[0] + "_" + symbol.split('/')[1]
-            response = await client.get(f"https://contract.mexc.com/api/v1/contract/funding_rate/{symbol_mexc}")
-            data = response.json()
-            self.rate_times[symbol] = float(data['data']['nextSettleTime']) + 3 * 60 * 60 * 1000
-        except KeyError:
-            pass
-
-    async def fetch_all_funding_rates(self, symbols):
-        async with httpx.AsyncClient() as client:
-            tasks = [self.fetch_funding_rate(client, symbol) for symbol in symbols]
-            
-            await asyncio.gather(*tasks)
-        
-    async def get_symbols_from_exchange(self):
-        if len(self.primary_data) == 0:
-            await self._get_primary_data()
-
-        async with httpx.AsyncClient() as client:
-            data = await client.get("https://contract.mexc.com/api/v1/contract/ticker")
-            data = data.json()
-
-            symbols_local = []
-
-            for symbol in data['data']:
-                try:
-                    key = self.primary_data[symbol['symbol']]
-                    self.symbols[key] = float(symbol['fundingRate']) * 100
-
-                    self.symbols_prices[key] = {'ask': float(symbol['ask1']), 'bid': float(symbol['bid1'])}
-                except Exception:
-                    continue
-
-            for key, value in self.symbols.items():
-                if abs(value) > 0.05:
-                    symbols_local.append(key)
-        
-            await self.fetch_all_funding_rates(symbols_local)
-
-        target_hours = [3, 11, 19]
-        def nearest_time_to_targets(current_time):
-            current_hour_minute = current_time.hour + current_time.minute / 60.0
-            future_hours = [hour for hour in target_hours if hour > current_hour_minute]
-            if not future_hours:
-                nearest_hour = min(target_hours)
-                target_datetime = current_time.replace(hour=nearest_hour, minute=0, second=0, microsecond=0) + timedelta(days=1)
-            else:
-                nearest_hour = min(future_hours)
-                target_datetime = current_time.replace(hour=nearest_hour, minute=0, second=0, microsecond=0)
-            return int(target_datetime.timestamp() * 1000)
-        
-        current_time = datetime.now()
-        nearest_unix_time_ms = nearest_time_to_targets(current_time)
-
-        for symbol in self.symbols:
-            if symbol not in self.rate_times.keys():
-                self.rate_times[symbol] = nearest_unix_time_ms
-
-    def get_name(self):
-        return "Mexc"
-
-class Bingx:
-    def __init__(self) -> None:
-        self.symbols = {}
-        self.primary_data = {}
-        self.symbols_prices = {}
-        self.rate_times = {}
-
-        self.TAKER_FEE = 0.05 # % 0.0005
-        self.MAKER_FEE = 0.02 # % 0.0002
-
-    async def _get_primary_data(self):
-        async with httpx.AsyncClient() as client:
-            data = await client.get("https://open-api.bingx.com/openApi/swap/v2/quote/contracts")
-            data = data.json()
-            for symbol in data['data']:
-                try:
-                    self.primary_data[symbol['symbol']] = symbol['symbol'].split('-')[0] + "/" + symbol['symbol'].split('-')[1]
-                except ValueError:
-                    continue
-    
-    async def _load_additional_data(self):
-        async with httpx.AsyncClient() as client:
-            data = await client.get("https://open-api.bingx.com/openApi/swap/v2/quote/ticker")
-            data = data.json()
-            for symbol in data['data']:
-                try:
-                    key = self.primary_data[symbol['symbol']]
-                    self.symbols_prices[key] = {'ask': float(symbol['askPrice']), 'bid': float(symbol['bidPrice'])}
-                except Exception:
-                    continue
-
-    async def get_symbols_from_exchange(self):
-        if len(self.primary_data) == 0:
-            await self._get_primary_data()
-
-        await self._load_additional_data()
-
-        async with httpx.AsyncClient() as client:
-            data = await client.get("https://open-api.bingx.com/openApi/swap/v2/quote/premiumIndex")
-            data = data.json()
-            for symbol in data['data']:
-                try:
-                    key = self.primary_data[symbol['symbol']]
-                    if key in self.symbols_prices:
-                        self.symbols[key] = float(symbol['lastFundingRate']) * 100
-                    self.rate_times[key] = int(symbol['nextFundingTime']) + 3 * 60 * 60 * 1000
-                except Exception:
-                    continue
-
-    def get_name(self):
-        return "Bingx"
-
-class Kucoin:
-    def __init__(self) -> None:
-        self.symbols = {}
-        self.primary_data = {}
-        self.symbols_prices = {}
-        self.rate_times = {}
-
-        self.TAKER_FEE = 0.06 # % 0.0006
-        self.MAKER_FEE = 0.02 # % 0.0002
-        
-    async def _get_primary_data(self):
-        async with httpx.AsyncClient() as client:
-            data = await client.get("https://api-futures.kucoin.com/api/v1/contracts/active")
-            data = data.json()
-            for symbol in data['data']:
-                try:
-                    self.primary_data[symbol['symbol']] = symbol['baseCurrency'] + "/" + symbol['quoteCurrency']
-                except TypeError:
-                    continue
-    
-    async def _get_symbols_prices(self):
-        async with httpx.AsyncClient() as client:
-                data = await client.get("https://api-futures.kucoin.com/api/v1/allTickers")
-                data = data.json()
-                for symbol in data['data']:
-                    try:
-                        key = self.primary_data[symbol['symbol']]
-                        self.symbols_prices[key] = {'ask': float(symbol['bestAskPrice']), 'bid': float(symbol['bestBidPrice'])}
-                    except Exception:
-                        continue
-
-    async def get_symbols_from_exchange(self):
-        if len(self.primary_data) == 0:
-            await self._get_primary_data()
-
-        await self._get_symbols_prices()
-
-        async with httpx.AsyncClient() as client:
-            data = await client.get("https://api-futures.kucoin.com/api/v1/contracts/active")
-            data = data.json()
-            for symbol in data['data']:
-                try:
-                    key = self.primary_data[symbol['symbol']]
-                    self.symbols[key] = float(symbol['fundingFeeRate']) * 100
-                    current_time = float(symbol['nextFundingRateTime']) + time.time() * 1000 + 3 * 60 * 60 * 1000
+def build_table(objects, symbols=None, horizon=None):
+    """Строит таблицу возможностей. symbols - пересчитать только указанные символы (None - все).
+    horizon - срок удержания позиции в часах: добавляется колонка apr(%), по ней сортируется таблица"""
+    # Ставки и комиссии в процентах. С horizon порог 0.1% - на 8 часов: ежечасная ставка 0.02% проходит
+    dataFrame = pair_futures(objects, min_rate=0.1, symbols=symbols, scale=100, interval=8 if horizon is not None else None)
+    dataFrame = score_table(dataFrame, horizon)
+
+    # Выплата на основной бирже не позже, чем на бирже хеджирования (сравнение с NaN даёт False - строка остаётся).
+    # С horizon позиция держится весь срок и выплаты обеих ног уже учтены в apr(%)
+    if horizon is None:
+        later = (dataFrame['time_1'] > dataFrame['time_2']).to_numpy()
+        metrics.count('dropped_pairs_total', int(later.sum()), table='futures_futures', reason='settlement_order')
+        dataFrame = dataFrame[~later]
+    return dataFrame.sort_values(by=score_column(horizon), ascending=False)
+
+def score_column(horizon=None):
+    return "result(%)" if horizon is None else "apr(%)"
+
+def score_table(dataFrame, horizon=None):
+    dataFrame['result(%)'] = opportunity_score(
+        dataFrame['rate_1(%)'].to_numpy(),
+        dataFrame['price_difference(%)'].to_numpy(),
+        dataFrame['fee(%)'].to_numpy(),
+        rate_2=dataFrame['rate_2(%)'].to_numpy(),
+        time_1=dataFrame['time_1'].to_numpy(),
+        time_2=dataFrame['time_2'].to_numpy(),
+    )
+    if horizon is not None:
+        dataFrame['apr(%)'] = annualized_score(
+            dataFrame['rate_1(%)'].to_numpy(),
+            dataFrame['price_difference(%)'].to_numpy(),
+            dataFrame['fee(%)'].to_numpy(),
+            dataFrame['interval_1(h)'].to_numpy(),
+            dataFrame['time_1'].to_numpy(),
+            rate_2=dataFrame['rate_2(%)'].to_numpy(),
+            interval_2=dataFrame['interval_2(h)'].to_numpy(),
+            time_2=dataFrame['time_2'].to_numpy(),
+            horizon=horizon,
+        )
+    return dataFrame
+
+async def apply_depth(dataFrame, objects, books, candidates=20, horizon=None):
+    """Пересчитывает цены лучших candidates строк по стакану на books.notional. Строки без глубины получают NaN.
+    Остальные строки остаются с ценами лучшего уровня и depth=False"""
+    rest = dataFrame.iloc[candidates:].assign(depth=False)
+    dataFrame = dataFrame.head(candidates).copy()
+    exchanges = {exchange.get_name(): exchange for exchange in objects}
+    legs = list(zip(dataFrame['main_exchange'], dataFrame['symbol'])) + list(zip(dataFrame['hadge_exchange'], dataFrame['symbol']))
+    await books.fetch([(exchanges[name], 'futures', symbol) for name, symbol in legs])
+
+    short = (dataFrame['route_1'] == 'SHORT').to_numpy()
+    dataFrame['price_1'] = [books.price(exchanges[name], 'futures', symbol, 'sell' if is_short else 'buy')
+                            for name, symbol, is_short in zip(dataFrame['main_exchange'], dataFrame['symbol'], short)]
+    dataFrame['price_2'] = [books.price(exchanges[name], 'futures', symbol, 'buy' if is_short else 'sell')
+                            for name, symbol, is_short in zip(dataFrame['hadge_exchange'], dataFrame['symbol'], short)]
+    dataFrame['price_difference(%)'] = price_difference(short, dataFrame['price_1'].to_numpy(), dataFrame['price_2'].to_numpy())
+    dataFrame = score_table(dataFrame, horizon).assign(depth=True)
+    return pd.concat([dataFrame, rest]).sort_values(by=score_column(horizon), ascending=False)
+
+def format_table(dataFrame):
+    dataFrame2 = dataFrame.copy()
+    dataFrame2['time_1'] = pd.to_datetime(dataFrame2['time_1'] + DISPLAY_OFFSET, unit='ms') # UTC -> Москва
+    dataFrame2['time_1'] = dataFrame2['time_1'].dt.strftime('%m-%d %H:%M:%S')
+    dataFrame2['time_2'] = pd.to_datetime(dataFrame2['time_2'] + DISPLAY_OFFSET, unit='ms') # UTC -> Москва
+    dataFrame2['time_2'] = dataFrame2['time_2'].dt.strftime('%m-%d %H:%M:%S')
+    return dataFrame2
 
-                    rounded_time = int(current_time // 10000) * 10000
-                    self.rate_times[key] = rounded_time
-                except Exception:
-                    continue
-    
-    def get_name(self):
-        return "Kucoin"
-    
-async def main():
-    bybit = Bybit()
-    kucoin = Kucoin()
-    mexc = Mexc()
-    bingx = Bingx()
+async def main(timings=False, depth=None, candidates=20, record=None, horizon=None):
+    bybit = Bybit(spot=False, metadata_cache=metadata_cache)
+    kucoin = Kucoin(spot=False, metadata_cache=metadata_cache)
+    mexc = Mexc(spot=False, metadata_cache=metadata_cache)
+    bingx = Bingx(spot=False, metadata_cache=metadata_cache)
 
     objects = [bybit, kucoin, mexc, bingx]
 
     load_objects = []
     for i in objects:
-        load_objects.append(i.get_symbols_from_exchange())
+        load_objects.append(i.main__get_symbols())
     
-    await asyncio.gather(*load_objects)
-
-    main_dict = []
-
-    for exchange in objects:
-        sorted_dict = dict(sorted(exchange.symbols.items(), key=lambda item: abs(item[1]), reverse=True))
-        filtered_dict = {key: value for key, value in sorted_dict.items() if abs(value) >= 0.1}
-
-        for key, value in filtered_dict.items():
-            for haghe_exchange in objects:
-                if key in haghe_exchange.symbols:
-                    if exchange != haghe_exchange:
-                        if value < 0:
-                            price_main_symbol = exchange.symbols_prices[key]['ask']
-                            price_hedge_symbol = haghe_exchange.symbols_prices[key]['bid']
-                            
-                            final_difference = 100 - price_main_symbol / price_hedge_symbol * 100
-                            main_route = "LONG"
-                            hedge_route = "SHORT"
-                        else:
-                            price_main_symbol = exchange.symbols_prices[key]['bid']
-                            price_hedge_symbol = haghe_exchange.symbols_prices[key]['ask']
-
-                            final_difference = 100 - price_hedge_symbol / price_main_symbol * 100
-                            main_route = "SHORT"
-                            hedge_route = "LONG"
-                        try:
-                            time_1 = exchange.rate_times[key]
-                        except KeyError:
-                            time_1 = None
-                        try:
-                            time_2 = haghe_exchange.rate_times[key]
-                        except KeyError:
-                            time_2 = None
-
-
-                        fee = exchange.TAKER_FEE * 2 + haghe_exchange.TAKER_FEE * 2
-                        main_dict.append([key, exchange.get_name(), main_route, haghe_exchange.get_name(), hedge_route, value, haghe_exchange.symbols[key], price_main_symbol, price_hedge_symbol, final_difference, fee, time_1, time_2])   
-
-    dataFrame = pd.DataFrame(main_dict, columns=['symbol', 'main_exchange', 'route_1', 'hadge_exchange', 'route_2', 'rate_1(%)', 'rate_2(%)', 'price_1', 'price_2', 'price_difference(%)', 'fee(%)', 'time_1', 'time_2'])  
-    dataFrame.sort_values(by="rate_1(%)", inplace=True, key=abs, ascending=False)
-
-    dataFrame = dataFrame.loc[(dataFrame['time_1'] <= dataFrame['time_2']) | (dataFrame['time_1'].isna()) | (dataFrame['time_2'].isna())]
-    dataFrame['result(%)'] = np.where(
-        (dataFrame['time_1'] == dataFrame['time_2']) | 
-        (pd.isna(dataFrame['time_1']) | pd.isna(dataFrame['time_2'])), 
-        np.where(
-            (dataFrame['rate_1(%)'] > 0) & (dataFrame['rate_2(%)'] > 0),
-            dataFrame['rate_1(%)'] - dataFrame['rate_2(%)'],
-            np.where(
-                (dataFrame['rate_1(%)'] < 0) & (dataFrame['rate_2(%)'] < 0),
-                abs(dataFrame['rate_1(%)']) - abs(dataFrame['rate_2(%)']),
-                np.where(
-                    (dataFrame['rate_1(%)'] > 0) & (dataFrame['rate_2(%)'] < 0),
-                    abs(dataFrame['rate_1(%)']) + abs(dataFrame['rate_2(%)']),
-                    np.where(
-                        (dataFrame['rate_1(%)'] < 0) & (dataFrame['rate_2(%)'] > 0),
-                        abs(dataFrame['rate_1(%)']) + abs(dataFrame['rate_2(%)']),
-                        abs(dataFrame['rate_1(%)'])
-                    )
-                )
-            )
-        ),
-        abs(dataFrame['rate_1(%)']) 
+    try:
+        await asyncio.gather(*load_objects)
+
+        if timings:
+            for exchange in objects:
+                print(exchange.last_graph.report())
+            print(f"clock offsets: {server_clock.report()}")
+
+        dataFrame = build_table(objects, horizon=horizon)
+        if depth is not None:
+            dataFrame = await apply_depth(dataFrame, objects, DepthBooks(depth), candidates, horizon)
+        print(format_table(dataFrame))
+        if record is not None:
+            recorder = Recorder(record)
+            recorder.record_markets(objects)
+            recorder.record_table('futures_futures', dataFrame)
+            await recorder.close()
+
+        # Первичные данные, взятые из кэша, обновляются в фоне - дожидаемся их перед закрытием соединений
+        await asyncio.gather(*(exchange.revalidation for exchange in objects if exchange.revalidation), return_exceptions=True)
+    finally:
+        await client_manager.close()
+
+
+async def refresh(exchange):
+    await exchange.main__get_symbols()
+
+async def idle(exchange):
+    pass
+
+async def run_daemon(interval, metadata_interval, stream=False, top=50, depth=None, candidates=20, record=None, workers=0, offload=False, metrics_port=None, alerts=None, calendar=None, horizon=None):
+    """Непрерывный режим: таблица пересчитывается при каждом изменении тикеров.
+    stream - тикеры приходят по WebSocket, а опрос только проверяет изменения.
+    workers - опрашивать биржи в отдельных процессах (shards.py), главный процесс только считает таблицу.
+    offload - строить таблицу в потоке по снимку рынков, не занимая цикл событий.
+    metrics_port - порт HTTP сервера метрик (/metrics, /stats).
+    alerts - alerts.Alerts: вместо таблицы печатаются только события пересечения порогов.
+    calendar - settlement.SettlementCalendar: часто опрашиваются только биржи с близкими выплатами.
+    horizon - срок удержания позиции в часах: таблица ранжируется по apr(%)"""
+    objects = [Bybit(spot=False, metadata_cache=metadata_cache), Kucoin(spot=False, metadata_cache=metadata_cache), Mexc(spot=False, metadata_cache=metadata_cache), Bingx(spot=False, metadata_cache=metadata_cache)]
+    books = DepthBooks(depth) if depth is not None else None
+    recorder = Recorder(record) if record is not None else None
+    monitor = LoopLagMonitor().start()
+    if metrics_port is not None:
+        await metrics.serve(metrics_port)
+
+    async def publish(dataFrame):
+        if books is not None:
+            dataFrame = await apply_depth(dataFrame, objects, books, candidates, horizon)
+        if alerts is None:
+            print(format_table(dataFrame))
+        if recorder is not None:
+            recorder.record_markets(objects)
+            recorder.record_table('futures_futures', dataFrame)
+        if alerts is None:
+            print(monitor.report())
+            if calendar is not None:
+                print(calendar.report(objects))
+
+    options = {'workers': workers, 'stream_markets': ('futures',) if stream else None} if workers else {}
+    scanner = (ShardedScanner if workers else Scanner)(
+        objects,
+        fetch=idle if stream else refresh,
+        build_table=partial(build_table, horizon=horizon),
+        symbol_column='symbol',
+        sort_by=score_column(horizon),
+        publish=publish,
+        default_interval=interval,
+        metadata_interval=metadata_interval,
+        top_k=top,
+        offload=offload,
+        alerts=alerts,
+        calendar=calendar,
+        watch=('funding_rates', 'symbols_prices', 'rate_times'),
+        **options,
     )
-
-    dataFrame['result(%)'] = dataFrame['result(%)'] + dataFrame['price_difference(%)']
-    dataFrame['result(%)'] = dataFrame['result(%)'] - dataFrame['fee(%)']
-    dataFrame.sort_values(by="result(%)", inplace=True, ascending=False)
-
-    dataFrame2 = dataFrame.copy()
-    dataFrame2['time_1'] = pd.to_datetime(dataFrame2['time_1'], unit='ms')
-    dataFrame2['time_1'] = dataFrame2['time_1'].dt.strftime('%m-%d %H:%M:%S')
-    dataFrame2['time_2'] = pd.to_datetime(dataFrame2['time_2'], unit='ms')
-    dataFrame2['time_2'] = dataFrame2['time_2'].dt.strftime('%m-%d %H:%M:%S')
-    print(dataFrame2)
-
-    rows_with_max_value = dataFrame[dataFrame["result(%)"] > 0].copy()
-    rows_with_max_value['time_1'] = pd.to_datetime(rows_with_max_value['time_1'], unit='ms')
-    rows_with_max_value['time_2'] = pd.to_datetime(rows_with_max_value['time_2'], unit='ms')
-
-asyncio.run(main())
+    streams = [item for item in create_streams(objects) if item.market == 'futures'] if stream and not workers else []
+    try:
+        await asyncio.gather(scanner.run(), *(item.run() for item in streams))
+    finally:
+        await monitor.stop()
+        await metrics.close()
+        if recorder is not None:
+            await recorder.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Арбитраж ставок финансирования: фьючерс + фьючерс")
+    parser.add_argument("--daemon", action="store_true", help="Непрерывное сканирование вместо однократного запуска")
+    parser.add_argument("--interval", type=float, default=2.0, help="Интервал опроса тикеров, с")
+    parser.add_argument("--metadata-interval", type=float, default=60 * 60, help="Интервал обновления первичных данных, с")
+    parser.add_argument("--stream", action="store_true", help="Получать тикеры и ставки по WebSocket (только с --daemon)")
+    parser.add_argument("--top", type=int, default=50, help="Сколько лучших возможностей показывать в непрерывном режиме")
+    parser.add_argument("--depth", type=float, help="Объём позиции на каждой ноге в USDT: цены считаются по стакану")
+    parser.add_argument("--depth-candidates", type=int, default=20, help="Для скольких лучших строк запрашивать стаканы")
+    parser.add_argument("--workers", type=int, default=0, help="Опрашивать биржи в N отдельных процессах (только с --daemon). Нужно не меньше N + 1 ядер: на меньшем числе ядер таблиц в секунду меньше")
+    parser.add_argument("--offload", action="store_true", help="Строить таблицу в отдельном потоке (только с --daemon)")
+    parser.add_argument("--record", metavar="DIR", help="Записывать цены, ставки и таблицу в DIR (нужен pyarrow)")
+    parser.add_argument("--timings", action="store_true", help="Показать критический путь запросов каждой биржи")
+    parser.add_argument("--metrics", type=int, metavar="PORT", help="Собирать метрики и отдавать их по HTTP: /metrics и /stats (только с --daemon)")
+    parser.add_argument("--stats", action="store_true", help="Собирать метрики и вывести их в JSON при завершении")
+    parser.add_argument("--capture", metavar="DIR", help="Записать ответы бирж в DIR для mock_exchange.py")
+    parser.add_argument("--replay", metavar="URL", help="Отправлять запросы в mock_exchange.py вместо бирж")
+    parser.add_argument("--settlement", type=float, metavar="MINUTES", help="Опрашивать с --interval только биржи, у символов которых выплата в ближайшие MINUTES минут (только с --daemon)")
+    parser.add_argument("--slow-interval", type=float, default=30.0, help="Наибольший интервал опроса бирж без близких выплат с --settlement, с")
+    parser.add_argument("--horizon", type=float, metavar="HOURS", help="Ранжировать по годовой доходности apr(%%) позиции, удерживаемой HOURS часов, с учётом интервалов выплат бирж")
+    parser.add_argument("--alert", type=float, metavar="X", help="Печатать только события: оценка строки стала выше X, изменилась, опустилась (только с --daemon)")
+    parser.add_argument("--alert-exit", type=float, metavar="Y", help="Порог выхода (по умолчанию X)")
+    parser.add_argument("--alert-symbols", nargs="+", metavar="SYMBOL", help="Только эти символы, например BTC/USDT")
+    parser.add_argument("--alert-pair", nargs=2, action="append", metavar=("EXCHANGE_1", "EXCHANGE_2"), help="Только эта пара бирж (можно несколько раз)")
+    parser.add_argument("--alert-debounce", type=float, default=0.0, metavar="SECONDS", help="Сколько секунд пересечение должно держаться")
+    args = parser.parse_args()
+    if args.capture and (args.replay or args.workers):
+        parser.error("--capture не используется вместе с --replay и --workers")
+    metrics.enabled = args.metrics is not None or args.stats
+    client_manager.redirect = args.replay
+    client_manager.capture = Capture(args.capture) if args.capture else None
+    calendar = SettlementCalendar(args.settlement * 60, args.interval, args.slow_interval) if args.settlement is not None else None
+    alerts = None
+    if args.alert is not None:
+        alerts = Alerts(score_column(args.horizon))
+        alerts.subscribe(print, args.alert, exit=args.alert_exit, symbols=args.alert_symbols, debounce=args.alert_debounce,
+                         pairs=[tuple(pair) for pair in args.alert_pair] if args.alert_pair else None)
+
+    if args.daemon:
+        try:
+            asyncio.run(run_daemon(args.interval, args.metadata_interval, args.stream, args.top, args.depth, args.depth_candidates, args.record, args.workers, args.offload, args.metrics, alerts, calendar, args.horizon))
+        except KeyboardInterrupt:
+            pass
+    else:
+        asyncio.run(main(args.timings, args.depth, args.depth_candidates, args.record, args.horizon))
+    if client_manager.capture is not None:
+        print(f"{client_manager.capture.save()} responses captured to {args.capture}")
+    if args.stats:
+        print(json.dumps(metrics.stats(), indent=2))
 
 """
 symbol - текущий символ, для которого высчитывается Funding Rate
@@ -1,10 +1,24 @@
-from datetime import datetime, timedelta
-import httpx
+from http_client import client_manager
+from exchanges import Bybit, Kucoin, Mexc, Bingx
+from metadata_cache import metadata_cache
+from symbol_registry import symbol_registry
+from scanner import Scanner
+from shards import ShardedScanner
+from loop_lag import LoopLagMonitor
+from metrics import metrics
+from capture import Capture
+from alerts import Alerts
+from settlement import SettlementCalendar
+from clock import HOUR, server_clock
+from streaming import create_streams
+from scoring import annualized_score, opportunity_score
+from depth import DepthBooks
+from recorder import Recorder
+import argparse
 import asyncio
-import time
+import json
+from functools import partial
 import pandas as pd
-import numpy as np
-from collections import defaultdict
 
 """
 ФЬЮЧЕРС + СПОТ
@@ -17,499 +31,218 @@ ___________________________
 
 """
 
-class Bybit:
-    def __init__(self) -> None:
-        self.primary_data = {} # {биржевый символ:стандартный символ}
-        self.primary_data_spot = {} # {биржевый символ:стандартный символ} spot
-        self.reverse_data = {} # {стандартный символ:биржевый символ}
-        self.reverse_data_spot = {} # {стандартный символ:биржевый символ} spot
-        self.funding_rates = {} # {стандартный символ:текущая ставка финансиварония} Ранее self.symbols
-        self.symbols_prices = {} # {стандартный символ:{ask1, bid1}}
-        self.symbols_prices_spot = {} # {стандартный символ:{ask1, bid1}} spot
-        self.rate_times = {} # {стандартный символ:время выплаты финансирования} Время выплаты в Москвской формате (+3 часа)
-
-        self.TAKER_FEE = 0.0011
-        self.MAKER_FEE = 0.00036
-
-    """Загрузка первичных, необходимых данных для работы с символами биржи"""
-    async def _get_primary_data(self):
-        """Можно получить даннеы для каждого символа: плечо, lotsize"""
-        async with httpx.AsyncClient() as client:
-            errors = 0
-            response = await client.get("https://api.bybit.com/v5/market/instruments-info?category=linear") # Подгружаем символы для фьючерсов
-            for symbol in response.json()['result']['list']:
-                try:
-                    exchange_symbol = symbol['symbol']  # Символ биржи (например, 'BTCUSDT')
-                    standard_symbol = f"{symbol['baseCoin']}/{symbol['quoteCoin']}"  # В стандартном виде 'BTC/USDT'
-
-                    self.primary_data[exchange_symbol] = standard_symbol
-                    self.reverse_data[standard_symbol] = exchange_symbol
-                except ValueError:
-                    errors += 1
-                    continue
-
-        async with httpx.AsyncClient() as client:
-            errors = 0
-            response = await client.get("https://api.bybit.com/v5/market/instruments-info?category=spot") # Подгружаем символы для спота
-            for symbol in response.json()['result']['list']:
-                try:
-                    exchange_symbol = symbol['symbol']  # Символ биржи (например, 'BTCUSDT')
-                    standard_symbol = f"{symbol['baseCoin']}/{symbol['quoteCoin']}"  # В стандартном виде 'BTC/USDT'
-
-                    self.primary_data_spot[exchange_symbol] = standard_symbol
-                    self.reverse_data_spot[standard_symbol] = exchange_symbol
-                except ValueError:
-                    errors += 1
-                    continue
-
-
-    """Основная функция, которая загружает все первичные + основные данные по символам для биржи"""
-    async def main__get_symbols(self):
-        if len(self.primary_data) == 0:
-            await self._get_primary_data() # Символы с биржи загружены
-
-        async with httpx.AsyncClient() as client:
-            response = await client.get("https://api.bybit.com/v5/market/tickers?category=linear")
-            for symbol in response.json()['result']['list']:
-                try:
-                    key = self.primary_data[symbol['symbol']]
-                    self.funding_rates[key] = float(symbol['fundingRate'])
-                    self.symbols_prices[key] = {'ask': float(symbol['ask1Price']), 'bid': float(symbol['bid1Price'])}
-                    self.rate_times[key] = int(symbol['nextFundingTime']) + 3 * 60 * 60 * 1000
-                except Exception:
-                    continue
-
-        async with httpx.AsyncClient() as client:
-            response = await client.get("https://api.bybit.com/v5/market/tickers?category=spot")
-            for symbol in response.json()['result']['list']:
-                try:
-                    key = self.primary_data_spot[symbol['symbol']]
-                    self.symbols_prices_spot[key] = {'ask': float(symbol['ask1Price']), 'bid': float(symbol['bid1Price'])}
-                except Exception:
-                    continue
-
-    def get_name(self):
-        return "Bybit"
-    
-    def to_standard(self, exchange_symbol: str) -> str:
-        """Переводит биржевой символ в стандартный"""
-        return self.primary_data.get(exchange_symbol, exchange_symbol)
-
-    def to_exchange(self, standard_symbol: str) -> str:
-        """Переводит стандартный символ в формат биржи"""
-        return self.reverse_data.get(standard_symbol, standard_symbol)
-
-    """Удаляет символы из self.funding_rates, у который ставка финансрования меньше 0.01%"""
-    def reset_not_valid_pair(self):
-        new_data = {}
-        for symbol, funding_rate in self.funding_rates.items():
-            if funding_rate > 0.0001:
-                new_data[symbol] = funding_rate
-        self.funding_rates = new_data
-
-
-class Mexc:
-    def __init__(self) -> None:
-        self.primary_data = {} # {биржевый символ:стандартный символ}
-        self.primary_data_spot = {} # {биржевый символ:стандартный символ} spot
-        self.reverse_data = {} # {стандартный символ:биржевый символ}
-        self.reverse_data_spot = {} # {стандартный символ:биржевый символ} spot
-        self.funding_rates = {} # {стандартный символ:текущая ставка финансиварония} Ранее self.symbols
-        self.symbols_prices = {} # {стандартный символ:{ask1, bid1}}
-        self.symbols_prices_spot = {} # {стандартный символ:{ask1, bid1}} spot
-        self.rate_times = {} # {стандартный символ:время выплаты финансирования} Время выплаты в Москвской формате (+3 часа)
-
-        self.TAKER_FEE = 0.0002
-        self.MAKER_FEE = 0
-
-    """Загрузка первичных, необходимых данных для работы с символами биржи"""
-    async def _get_primary_data(self):
-        async with httpx.AsyncClient() as client:
-            errors = 0
-            response = await client.get("https://contract.mexc.com/api/v1/contract/detail")
-            for symbol in response.json()['data']:
-                try:
-                    exchange_symbol = symbol['symbol']  # Символ биржи (например, 'BTCUSDT')
-                    standard_symbol = f"{symbol['baseCoin']}/{symbol['quoteCoin']}"  # В стандартном виде 'BTC/USDT'
-
-                    self.primary_data[exchange_symbol] = standard_symbol
-                    self.reverse_data[standard_symbol] = exchange_symbol
-                except ValueError:
-                    errors += 1
-                    continue
-
-        async with httpx.AsyncClient() as client:
-            errors = 0
-            response = await client.get("https://api.mexc.com/api/v3/exchangeInfo")
-
-            for symbol in response.json()['symbols']:
-                try:
-                    exchange_symbol = symbol['symbol']  # Символ биржи (например, 'BTCUSDT')
-                    standard_symbol = f"{symbol['baseAsset']}/{symbol['quoteAsset']}"  # В стандартном виде 'BTC/USDT'
-                    if symbol['isSpotTradingAllowed']:
-                        self.primary_data_spot[exchange_symbol] = standard_symbol
-                        self.reverse_data_spot[standard_symbol] = exchange_symbol
-                except ValueError:
-                    errors += 1
-                    continue
-
-    """Запрос ставки финансирования на отдельный символ"""
-    async def fetch_funding_rate(self, client, symbol):
-        try:
-            symbol_mexc = symbol.split('/')[0] + "_" + symbol.split('/')[1]
-            try:
-                response = await client.get(f"https://contract.mexc.com/api/v1/contract/funding_rate/{symbol_mexc}")
-            except Exception as e:
-                print(e)
-                return
-            data = response.json()
-            self.rate_times[symbol] = float(data['data']['nextSettleTime']) + 3 * 60 * 60 * 1000
-        except KeyError:
-            pass
-
-    """Генерация запросов для подходящих символов"""
-    async def fetch_all_funding_rates(self, symbols):
-        async with httpx.AsyncClient() as client:
-            tasks = [self.fetch_funding_rate(client, symbol) for symbol in symbols]
-            await asyncio.gather(*tasks)
-
-    """Основная функция, которая загружает все первичные + основные данные по символам для биржи"""
-    async def main__get_symbols(self):
-        if len(self.primary_data) == 0:
-            await self._get_primary_data() # Символы с биржи загружены
-
-        async with httpx.AsyncClient() as client:
-            response = await client.get("https://contract.mexc.com/api/v1/contract/ticker")
-            symbols_local = []
-            for symbol in response.json()['data']:
-                try:
-                    key = self.primary_data[symbol['symbol']]
-                    self.funding_rates[key] = float(symbol['fundingRate'])
-                    self.symbols_prices[key] = {'ask': float(symbol['ask1']), 'bid': float(symbol['bid1'])}
-                except Exception:
-                    continue
-
-            for key, value in self.funding_rates.items():
-                if abs(value) > 0.0005:
-                    symbols_local.append(key)
-        
-            await self.fetch_all_funding_rates(symbols_local)
-
-        target_hours = [3, 11, 19]
-        def nearest_time_to_targets(current_time):
-            current_hour_minute = current_time.hour + current_time.minute / 60.0
-            future_hours = [hour for hour in target_hours if hour > current_hour_minute]
-            if not future_hours:
-                nearest_hour = min(target_hours)
-                target_datetime = current_time.replace(hour=nearest_hour, minute=0, second=0, microsecond=0) + timedelta(days=1)
-            else:
-                nearest_hour = min(future_hours)
-                target_datetime = current_time.replace(hour=nearest_hour, minute=0, second=0, microsecond=0)
-            return int(target_datetime.timestamp() * 1000)
-        
-        current_time = datetime.now()
-        nearest_unix_time_ms = nearest_time_to_targets(current_time)
-
-        for symbol in self.funding_rates:
-            if symbol not in self.rate_times.keys():
-                self.rate_times[symbol] = nearest_unix_time_ms
-
-        async with httpx.AsyncClient() as client:
-            response = await client.get("https://api.mexc.com/api/v3/ticker/bookTicker")
-            for symbol in response.json():
-                try:
-                    key = self.primary_data_spot[symbol['symbol']]
-                    self.symbols_prices_spot[key] = {'ask': float(symbol['askPrice']), 'bid': float(symbol['bidPrice'])}
-                except Exception:
-                    continue
-
-    def get_name(self):
-        return "Mexc"
-    
-    def to_standard(self, exchange_symbol: str) -> str:
-        """Переводит биржевой символ в стандартный"""
-        return self.primary_data.get(exchange_symbol, exchange_symbol)
-
-    def to_exchange(self, standard_symbol: str) -> str:
-        """Переводит стандартный символ в формат биржи"""
-        return self.reverse_data.get(standard_symbol, standard_symbol)
-
-    """Удаляет символы из self.funding_rates, у который ставка финансрования меньше 0.01%"""
-    def reset_not_valid_pair(self):
-        new_data = {}
-        for symbol, funding_rate in self.funding_rates.items():
-            if funding_rate > 0.0001:
-                new_data[symbol] = funding_rate
-        self.funding_rates = new_data
-
-
-class Bingx:
-    def __init__(self) -> None:
-        self.primary_data = {} # {биржевый символ:стандартный символ}
-        self.primary_data_spot = {} # {биржевый символ:стандартный символ} spot
-        self.reverse_data = {} # {стандартный символ:биржевый символ}
-        self.reverse_data_spot = {} # {стандартный символ:биржевый символ} spot
-        self.funding_rates = {} # {стандартный символ:текущая ставка финансиварония} Ранее self.symbols
-        self.symbols_prices = {} # {стандартный символ:{ask1, bid1}}
-        self.symbols_prices_spot = {} # {стандартный символ:{ask1, bid1}} spot
-        self.rate_times = {} # {стандартный символ:время выплаты финансирования} Время выплаты в Москвской формате (+3 часа)
-
-        self.TAKER_FEE = 0.0005
-        self.MAKER_FEE = 0.0002
-
-    """Загрузка первичных, необходимых данных для работы с символами биржи"""
-    async def _get_primary_data(self):
-        """Можно получить даннеы для каждого символа: плечо, lotsize"""
-        async with httpx.AsyncClient() as client:
-            errors = 0
-            response = await client.get("https://open-api.bingx.com/openApi/swap/v2/quote/contracts")
-            for symbol in response.json()['data']:
-                try:
-                    exchange_symbol = symbol['symbol']  # Символ биржи (например, 'BTCUSDT')
-                    standard_symbol = f"{symbol['symbol'].split('-')[0]}/{symbol['symbol'].split('-')[1]}"  # В стандартном виде 'BTC/USDT'
-
-                    self.primary_data[exchange_symbol] = standard_symbol
-                    self.reverse_data[standard_symbol] = exchange_symbol
-                except ValueError:
-                    errors += 1
-                    continue
-
-        async with httpx.AsyncClient() as client:
-            errors = 0
-            response = await client.get("https://open-api.bingx.com/openApi/spot/v1/common/symbols") # Подгружаем символы для спота
-            for symbol in response.json()['data']['symbols']:
-                try:
-                    exchange_symbol = symbol['symbol']  # Символ биржи (например, 'BTCUSDT')
-                    standard_symbol = f"{symbol['symbol'].split('-')[0]}/{symbol['symbol'].split('-')[1]}"  # В стандартном виде 'BTC/USDT'
-
-                    self.primary_data_spot[exchange_symbol] = standard_symbol
-                    self.reverse_data_spot[standard_symbol] = exchange_symbol
-                except ValueError:
-                    errors += 1
-                    continue
-
-    async def _load_additional_data(self):
-        async with httpx.AsyncClient() as client:
-            response = await client.get("https://open-api.bingx.com/openApi/swap/v2/quote/ticker")
-            for symbol in response.json()['data']:
-                try:
-                    key = self.primary_data[symbol['symbol']]
-                    self.symbols_prices[key] = {'ask': float(symbol['askPrice']), 'bid': float(symbol['bidPrice'])}
-                except Exception:
-                    continue
-
-    """Основная функция, которая загружает все первичные + основные данные по символам для биржи"""
-    async def main__get_symbols(self):
-        if len(self.primary_data) == 0:
-            await self._get_primary_data() # Символы с биржи загружены
-
-        await self._load_additional_data()
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get("https://open-api.bingx.com/openApi/swap/v2/quote/premiumIndex")
-            for symbol in response.json()['data']:
-                try:
-                    key = self.primary_data[symbol['symbol']]
-                    if key in self.symbols_prices:
-                        self.funding_rates[key] = float(symbol['lastFundingRate'])
-                        self.rate_times[key] = int(symbol['nextFundingTime']) + 3 * 60 * 60 * 1000
-                except Exception:
-                    continue
-
-        async with httpx.AsyncClient() as client:
-            response = await client.get("https://open-api.bingx.com/openApi/spot/v1/ticker/24hr"+"?timestamp="+str(int(time.time() * 1000)))
-            for symbol in response.json()['data']:
-                try:
-                    key = self.primary_data_spot[symbol['symbol']]
-                    self.symbols_prices_spot[key] = {'ask': float(symbol['askPrice']), 'bid': float(symbol['bidPrice'])}
-                except Exception:
-                    continue
-
-    def get_name(self):
-        return "Bingx"
-    
-    def to_standard(self, exchange_symbol: str) -> str:
-        """Переводит биржевой символ в стандартный"""
-        return self.primary_data.get(exchange_symbol, exchange_symbol)
-
-    def to_exchange(self, standard_symbol: str) -> str:
-        """Переводит стандартный символ в формат биржи"""
-        return self.reverse_data.get(standard_symbol, standard_symbol)
-
-    """Удаляет символы из self.funding_rates, у который ставка финансрования меньше 0.01%"""
-    def reset_not_valid_pair(self):
-        new_data = {}
-        for symbol, funding_rate in self.funding_rates.items():
-            if funding_rate > 0.0001:
-                new_data[symbol] = funding_rate
-        self.funding_rates = new_data
-
-class Kucoin:
-    def __init__(self) -> None:
-        self.primary_data = {} # {биржевый символ:стандартный символ}
-        self.primary_data_spot = {} # {биржевый символ:стандартный символ} spot
-        self.reverse_data = {} # {стандартный символ:биржевый символ}
-        self.reverse_data_spot = {} # {стандартный символ:биржевый символ} spot
-        self.funding_rates = {} # {стандартный символ:текущая ставка финансиварония} Ранее self.symbols
-        self.symbols_prices = {} # {стандартный символ:{ask1, bid1}}
-        self.symbols_prices_spot = {} # {стандартный символ:{ask1, bid1}} spot
-        self.rate_times = {} # {стандартный символ:время выплаты финансирования} Время выплаты в Москвской формате (+3 часа)
-
-        self.TAKER_FEE = 0.0006
-        self.MAKER_FEE = 0.0002
-
-    """Загрузка первичных, необходимых данных для работы с символами биржи"""
-    async def _get_primary_data(self):
-        """Можно получить даннеы для каждого символа: плечо, lotsize"""
-        async with httpx.AsyncClient() as client:
-            errors = 0
-            response = await client.get("https://api-futures.kucoin.com/api/v1/contracts/active")
-            for symbol in response.json()['data']:
-                try:
-                    exchange_symbol = symbol['symbol']  # Символ биржи (например, 'BTCUSDT')
-                    standard_symbol = f"{symbol['baseCurrency']}/{symbol['quoteCurrency']}"  # В стандартном виде 'BTC/USDT'
-
-                    self.primary_data[exchange_symbol] = standard_symbol
-                    self.reverse_data[standard_symbol] = exchange_symbol
-                except TypeError:
-                    errors += 1
-                    continue
-
-        async with httpx.AsyncClient() as client:
-            errors = 0
-            response = await client.get("https://api.kucoin.com/api/v2/symbols") # Подгружаем символы для спота
-            for symbol in response.json()['data']:
-                try:
-                    exchange_symbol = symbol['symbol']  # Символ биржи (например, 'BTCUSDT')
-                    standard_symbol = f"{symbol['baseCurrency']}/{symbol['quoteCurrency']}"  # В стандартном виде 'BTC/USDT'
-                    if symbol['enableTrading']:
-                        self.primary_data_spot[exchange_symbol] = standard_symbol
-                        self.reverse_data_spot[standard_symbol] = exchange_symbol
-                except ValueError:
-                    errors += 1
-                    continue
-
-    async def _get_symbols_prices(self):
-        async with httpx.AsyncClient() as client:
-            response = await client.get("https://api-futures.kucoin.com/api/v1/allTickers")
-            for symbol in response.json()['data']:
-                try:
-                    key = self.primary_data[symbol['symbol']]
-                    self.symbols_prices[key] = {'ask': float(symbol['bestAskPrice']), 'bid': float(symbol['bestBidPrice'])}
-                except Exception:
-                    continue
-
-    """Основная функция, которая загружает все первичные + основные данные по символам для биржи"""
-    async def main__get_symbols(self):
-        if len(self.primary_data) == 0:
-            await self._get_primary_data() # Символы с биржи загружены
-
-        await self._get_symbols_prices()
-
-        async with httpx.AsyncClient() as client:
-            errors = 0
-            response = await client.get("https://api-futures.kucoin.com/api/v1/contracts/active")
-            for symbol in response.json()['data']:
-                try:
-                    key = self.primary_data[symbol['symbol']]
-                    self.funding_rates[key] = float(symbol['fundingFeeRate'])
-                    current_time = float(symbol['nextFundingRateTime']) + time.time() * 1000 + 3 * 60 * 60 * 1000
-                    rounded_time = int(current_time // 10000) * 10000
-                    self.rate_times[key] = rounded_time
-                except Exception:
-                    errors += 1
-                    continue
-
-        async with httpx.AsyncClient() as client:
-            errors = 0
-            response = await client.get("https://api.kucoin.com/api/v1/market/allTickers")
-            for symbol in response.json()['data']['ticker']:
-                try:
-                    key = self.primary_data_spot[symbol['symbol']]
-                    self.symbols_prices_spot[key] = {'ask': float(symbol['buy']), 'bid': float(symbol['sell'])}
-                except Exception:
-                    errors += 1
-                    continue
-
-    def get_name(self):
-        return "Kucoin"
-    
-    def to_standard(self, exchange_symbol: str) -> str:
-        """Переводит биржевой символ в стандартный"""
-        return self.primary_data.get(exchange_symbol, exchange_symbol)
-
-    def to_exchange(self, standard_symbol: str) -> str:
-        """Переводит стандартный символ в формат биржи"""
-        return self.reverse_data.get(standard_symbol, standard_symbol)
-
-    """Удаляет символы из self.funding_rates, у который ставка финансрования меньше 0.01%"""
-    def reset_not_valid_pair(self):
-        new_data = {}
-        for symbol, funding_rate in self.funding_rates.items():
-            if funding_rate > 0.0001:
-                new_data[symbol] = funding_rate
-        self.funding_rates = new_data
-
-async def main():
-    objects = [Bybit(), Kucoin(), Mexc(), Bingx()]
+async def main(timings=False, depth=None, candidates=20, record=None, horizon=None):
+    objects = [Bybit(metadata_cache=metadata_cache), Kucoin(metadata_cache=metadata_cache), Mexc(metadata_cache=metadata_cache), Bingx(metadata_cache=metadata_cache)]
     load_objects = []
     for i in objects:
         load_objects.append(i.main__get_symbols())
-    await asyncio.gather(*load_objects)
-
-    for exchange in objects:
-        exchange.reset_not_valid_pair()
-
-    symbol_to_exchanges_futures = defaultdict(list)
-    symbol_to_exchanges_spot = defaultdict(list)
-
-    stop = {
-        "Bybit": ['MexcQI/USDT', 'BybitFB/USDT'],
-        "Mexc": ['MexcQI/USDT', 'BybitFB/USDT']
-    }
-
-    errors = 0
-    for exchange_futures in objects:
-        for symbol_futures, bid_ask_futures in exchange_futures.symbols_prices.items():
-            try:
-                symbol_to_exchanges_futures[symbol_futures].append((exchange_futures.get_name(), symbol_futures, bid_ask_futures, exchange_futures.funding_rates[symbol_futures]))
-            except KeyError:
-                errors += 1
-
-    for exchange_spot in objects:
-        for symbol_spot, bid_ask_spot in exchange_spot.symbols_prices_spot.items():
-            symbol_to_exchanges_spot[symbol_spot].append((exchange_spot.get_name(), symbol_spot, bid_ask_spot))
+    try:
+        await asyncio.gather(*load_objects)
+
+        if timings:
+            for exchange in objects:
+                print(exchange.last_graph.report())
+            print(f"clock offsets: {server_clock.report()}")
+
+        for exchange in objects:
+            exchange.reset_not_valid_pair()
+
+        dataFrame = build_table(objects, horizon=horizon)
+        if depth is not None:
+            dataFrame = await apply_depth(dataFrame, objects, DepthBooks(depth), candidates, horizon)
+        print(dataFrame)
+        if record is not None:
+            recorder = Recorder(record)
+            recorder.record_markets(objects)
+            recorder.record_table('futures_spot', dataFrame)
+            await recorder.close()
+
+        # Первичные данные, взятые из кэша, обновляются в фоне - дожидаемся их перед закрытием соединений
+        await asyncio.gather(*(exchange.revalidation for exchange in objects if exchange.revalidation), return_exceptions=True)
+    finally:
+        await client_manager.close()
+
+def build_table(objects, symbols=None, horizon=None):
+    """Строит таблицу возможностей. symbols - пересчитать только указанные символы (None - все).
+    horizon - срок удержания позиции в часах: добавляется колонка apr(%), по ней сортируется таблица"""
+    # Только символы, у которых есть и фьючерс, и спот хотя бы на одной бирже
+    candidates = symbol_registry.names('futures_spot')
+    if symbols is not None:
+        candidates = [symbol for symbol in candidates if symbol in symbols]
 
     data = []
-    for symbol in symbol_to_exchanges_futures:
-        if symbol in symbol_to_exchanges_spot:
-            for exchange_futures_name, symbol_futures, bid_ask_futures, funding_rate in symbol_to_exchanges_futures[symbol]:
-                for exchange_spot_name, symbol_spot, bid_ask_spot in symbol_to_exchanges_spot[symbol]:
-                    try:
-                        if exchange_spot_name+symbol_spot in stop[exchange_futures_name]:
-                            continue
-                    except KeyError:
-                        pass
-                    data.append([
-                        exchange_futures_name,
-                        symbol_futures,
-                        bid_ask_futures['bid'],
-                        funding_rate * 100,
-                        exchange_spot_name,
-                        symbol_spot,
-                        bid_ask_spot['ask']
-                    ])
-                
-    dataFrame = pd.DataFrame(data, columns=['exchange_f', 'symbol_f', 'price_f', 'funding_rate %', 'exchange_s', 'symbol_s', 'price_s'])  
+    denied = 0
+    for symbol in candidates:
+        futures = [(exchange, exchange.symbols_prices[symbol], exchange.funding_rates[symbol])
+                   for exchange in objects if symbol in exchange.funding_rates and symbol in exchange.symbols_prices]
+        if not futures:
+            continue
+        spot = [(exchange, exchange.symbols_prices_spot[symbol]) for exchange in objects if symbol in exchange.symbols_prices_spot]
+        for exchange_futures, bid_ask_futures, funding_rate in futures:
+            for exchange_spot, bid_ask_spot in spot:
+                if symbol_registry.denied_spot_pair(exchange_futures.get_name(), exchange_spot.get_name(), symbol):
+                    denied += 1
+                    continue
+                data.append([
+                    exchange_futures.get_name(),
+                    symbol,
+                    bid_ask_futures['bid'],
+                    funding_rate * 100,
+                    exchange_spot.get_name(),
+                    symbol,
+                    bid_ask_spot['ask'],
+                    (exchange_futures.TAKER_FEE + exchange_spot.TAKER_FEE) * 2 * 100, # Вход и выход обеих ног
+                    exchange_futures.rate_times.get(symbol, float('nan')),
+                    exchange_futures.funding_intervals.get(symbol, float('nan')) / HOUR,
+                ])
+
+    dataFrame = pd.DataFrame(data, columns=['exchange_f', 'symbol_f', 'price_f', 'funding_rate %', 'exchange_s', 'symbol_s', 'price_s',
+                                            'fee(%)', 'time_f', 'interval_f(h)'])
+    dataFrame = score_table(dataFrame, horizon)
+
+    difference = dataFrame['percentage_difference %']
+    keep = (difference.abs() <= 60) & (difference >= 0.5)
+    metrics.count('dropped_pairs_total', denied, table='futures_spot', reason='denied_pair')
+    metrics.count('dropped_pairs_total', int(len(keep) - keep.sum()), table='futures_spot', reason='price_difference')
+    dataFrame = dataFrame[keep]
+    return dataFrame.sort_values(by=score_column(horizon), ascending=False)
+
+def score_column(horizon=None):
+    return "funding_rate %" if horizon is None else "apr(%)"
+
+def score_table(dataFrame, horizon=None):
     dataFrame['percentage_difference %'] = 100 - (dataFrame['price_s'] / dataFrame['price_f']) * 100
-    dataFrame.sort_values(by="funding_rate %", inplace=True, ascending=False)
-    
-    dataFrame = dataFrame[dataFrame['percentage_difference %'].abs() <= 60]
-    dataFrame = dataFrame[dataFrame['percentage_difference %'] >= 0.5]
-
-    dataFrame['%'] = dataFrame['funding_rate %'] + dataFrame['percentage_difference %']
-
-    print(dataFrame)
-
-
-asyncio.run(main())
\ No newline at end of file
+    dataFrame['%'] = opportunity_score(dataFrame['funding_rate %'].to_numpy(), dataFrame['percentage_difference %'].to_numpy())
+    if horizon is not None:
+        dataFrame['apr(%)'] = annualized_score(dataFrame['funding_rate %'].to_numpy(), dataFrame['percentage_difference %'].to_numpy(),
+                                               dataFrame['fee(%)'].to_numpy(), dataFrame['interval_f(h)'].to_numpy(),
+                                               dataFrame['time_f'].to_numpy(), horizon=horizon)
+    return dataFrame
+
+async def apply_depth(dataFrame, objects, books, candidates=20, horizon=None):
+    """Пересчитывает цены лучших candidates строк по стакану на books.notional: фьючерс продаётся по bids, спот покупается по asks.
+    Остальные строки остаются с ценами лучшего уровня и depth=False"""
+    rest = dataFrame.iloc[candidates:].assign(depth=False)
+    dataFrame = dataFrame.head(candidates).copy()
+    exchanges = {exchange.get_name(): exchange for exchange in objects}
+    futures = list(zip(dataFrame['exchange_f'], dataFrame['symbol_f']))
+    spot = list(zip(dataFrame['exchange_s'], dataFrame['symbol_s']))
+    await books.fetch([(exchanges[name], 'futures', symbol) for name, symbol in futures] +
+                      [(exchanges[name], 'spot', symbol) for name, symbol in spot])
+
+    dataFrame['price_f'] = [books.price(exchanges[name], 'futures', symbol, 'sell') for name, symbol in futures]
+    dataFrame['price_s'] = [books.price(exchanges[name], 'spot', symbol, 'buy') for name, symbol in spot]
+    dataFrame = score_table(dataFrame, horizon).assign(depth=True)
+    return pd.concat([dataFrame, rest]).sort_values(by=score_column(horizon), ascending=False)
+
+async def refresh(exchange):
+    await exchange.main__get_symbols()
+    exchange.reset_not_valid_pair()
+
+async def reset(exchange):
+    exchange.reset_not_valid_pair()
+
+async def run_daemon(interval, metadata_interval, stream=False, top=50, depth=None, candidates=20, record=None, workers=0, offload=False, metrics_port=None, alerts=None, calendar=None, horizon=None):
+    """Непрерывный режим: таблица пересчитывается при каждом изменении тикеров.
+    stream - тикеры приходят по WebSocket, а опрос только проверяет изменения.
+    workers - опрашивать биржи в отдельных процессах (shards.py), главный процесс только считает таблицу.
+    offload - строить таблицу в потоке по снимку рынков, не занимая цикл событий.
+    metrics_port - порт HTTP сервера метрик (/metrics, /stats).
+    alerts - alerts.Alerts: вместо таблицы печатаются только события пересечения порогов.
+    calendar - settlement.SettlementCalendar: часто опрашиваются только биржи с близкими выплатами.
+    horizon - срок удержания позиции в часах: таблица ранжируется по apr(%)"""
+    objects = [Bybit(metadata_cache=metadata_cache), Kucoin(metadata_cache=metadata_cache), Mexc(metadata_cache=metadata_cache), Bingx(metadata_cache=metadata_cache)]
+    books = DepthBooks(depth) if depth is not None else None
+    recorder = Recorder(record) if record is not None else None
+    monitor = LoopLagMonitor().start()
+    if metrics_port is not None:
+        await metrics.serve(metrics_port)
+
+    async def publish(dataFrame):
+        if books is not None:
+            dataFrame = await apply_depth(dataFrame, objects, books, candidates, horizon)
+        if alerts is None:
+            print(dataFrame)
+        if recorder is not None:
+            recorder.record_markets(objects)
+            recorder.record_table('futures_spot', dataFrame)
+        if alerts is None:
+            print(monitor.report())
+            if calendar is not None:
+                print(calendar.report(objects))
+
+    options = {'workers': workers, 'stream_markets': ('futures', 'spot') if stream else None} if workers else {}
+    scanner = (ShardedScanner if workers else Scanner)(
+        objects,
+        fetch=reset if stream else refresh,
+        build_table=partial(build_table, horizon=horizon),
+        symbol_column='symbol_f',
+        sort_by=score_column(horizon),
+        publish=publish,
+        default_interval=interval,
+        metadata_interval=metadata_interval,
+        top_k=top,
+        offload=offload,
+        alerts=alerts,
+        calendar=calendar,
+        watch=('funding_rates', 'symbols_prices', 'symbols_prices_spot'),
+        **options,
+    )
+    streams = create_streams(objects) if stream and not workers else []
+    try:
+        await asyncio.gather(scanner.run(), *(item.run() for item in streams))
+    finally:
+        await monitor.stop()
+        await metrics.close()
+        if recorder is not None:
+            await recorder.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Арбитраж ставок финансирования: фьючерс + спот")
+    parser.add_argument("--daemon", action="store_true", help="Непрерывное сканирование вместо однократного запуска")
+    parser.add_argument("--interval", type=float, default=2.0, help="Интервал опроса тикеров, с")
+    parser.add_argument("--metadata-interval", type=float, default=60 * 60, help="Интервал обновления первичных данных, с")
+    parser.add_argument("--stream", action="store_true", help="Получать тикеры и ставки по WebSocket (только с --daemon)")
+    parser.add_argument("--top", type=int, default=50, help="Сколько лучших возможностей показывать в непрерывном режиме")
+    parser.add_argument("--depth", type=float, help="Объём позиции на каждой ноге в USDT: цены считаются по стакану")
+    parser.add_argument("--depth-candidates", type=int, default=20, help="Для скольких лучших строк запрашивать стаканы")
+    parser.add_argument("--workers", type=int, default=0, help="Опрашивать биржи в N отдельных процессах (только с --daemon). Нужно не меньше N + 1 ядер: на меньшем числе ядер таблиц в секунду меньше")
+    parser.add_argument("--offload", action="store_true", help="Строить таблицу в отдельном потоке (только с --daemon)")
+    parser.add_argument("--record", metavar="DIR", help="Записывать цены, ставки и таблицу в DIR (нужен pyarrow)")
+    parser.add_argument("--timings", action="store_true", help="Показать критический путь запросов каждой биржи")
+    parser.add_argument("--metrics", type=int, metavar="PORT", help="Собирать метрики и отдавать их по HTTP: /metrics и /stats (только с --daemon)")
+    parser.add_argument("--stats", action="store_true", help="Собирать метрики и вывести их в JSON при завершении")
+    parser.add_argument("--capture", metavar="DIR", help="Записать ответы бирж в DIR для mock_exchange.py")
+    parser.add_argument("--replay", metavar="URL", help="Отправлять запросы в mock_exchange.py вместо бирж")
+    parser.add_argument("--settlement", type=float, metavar="MINUTES", help="Опрашивать с --interval только биржи, у символов которых выплата в ближайшие MINUTES минут (только с --daemon)")
+    parser.add_argument("--slow-interval", type=float, default=30.0, help="Наибольший интервал опроса бирж без близких выплат с --settlement, с")
+    parser.add_argument("--horizon", type=float, metavar="HOURS", help="Ранжировать по годовой доходности apr(%%) позиции, удерживаемой HOURS часов, с учётом интервала выплат биржи и комиссий")
+    parser.add_argument("--alert", type=float, metavar="X", help="Печатать только события: оценка строки стала выше X, изменилась, опустилась (только с --daemon)")
+    parser.add_argument("--alert-exit", type=float, metavar="Y", help="Порог выхода (по умолчанию X)")
+    parser.add_argument("--alert-symbols", nargs="+", metavar="SYMBOL", help="Только эти символы, например BTC/USDT")
+    parser.add_argument("--alert-pair", nargs=2, action="append", metavar=("EXCHANGE_1", "EXCHANGE_2"), help="Только эта пара бирж (можно несколько раз)")
+    parser.add_argument("--alert-debounce", type=float, default=0.0, metavar="SECONDS", help="Сколько секунд пересечение должно держаться")
+    args = parser.parse_args()
+    if args.capture and (args.replay or args.workers):
+        parser.error("--capture не используется вместе с --replay и --workers")
+    metrics.enabled = args.metrics is not None or args.stats
+    client_manager.redirect = args.replay
+    client_manager.capture = Capture(args.capture) if args.capture else None
+    calendar = SettlementCalendar(args.settlement * 60, args.interval, args.slow_interval) if args.settlement is not None else None
+    alerts = None
+    if args.alert is not None:
+        alerts = Alerts('%' if args.horizon is None else 'apr(%)', symbol_column='symbol_f', pair_columns=('exchange_f', 'exchange_s'))
+        alerts.subscribe(print, args.alert, exit=args.alert_exit, symbols=args.alert_symbols, debounce=args.alert_debounce,
+                         pairs=[tuple(pair) for pair in args.alert_pair] if args.alert_pair else None)
+
+    if args.daemon:
+        try:
+            asyncio.run(run_daemon(args.interval, args.metadata_interval, args.stream, args.top, args.depth, args.depth_candidates, args.record, args.workers, args.offload, args.metrics, alerts, calendar, args.horizon))
+        except KeyboardInterrupt:
+            pass
+    else:
+        asyncio.run(main(args.timings, args.depth, args.depth_candidates, args.record, args.horizon))
+    if client_manager.capture is not None:
+        print(f"{client_manager.capture.save()} responses captured to {args.capture}")
+    if args.stats:
+        print(json.dumps(metrics.stats(), indent=2))
@@ -0,0 +1,235 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http_client import client_manager
+from market_store import MarketStore
+from metrics import metrics
+from ranker import OpportunityRanker
+from alerts import deliver
+
+"""
+Непрерывный режим сканирования.
+
+Первичные данные бирж (_get_primary_data) загружаются один раз и обновляются по медленному расписанию,
+тикеры опрашиваются с собственным интервалом для каждой биржи. После каждого опроса определяются символы,
+у которых изменились входные данные, и пересчитываются только строки таблицы по этим символам.
+Строки этих символов заменяются в OpportunityRanker, и лучшие top_k строк публикуются в callback или asyncio.Queue.
+Те же строки получает alerts (alerts.Alerts): подписчики узнают только о пересечениях порогов.
+С calendar (settlement.SettlementCalendar) интервал опроса биржи зависит от близости выплат финансирования.
+
+С offload=True таблица строится в отдельном потоке по копии рынков (FrozenExchange), а цикл событий тем временем
+принимает тикеры. Копий две: следующий снимок пишется в свободную, пока поток считает по другой, поэтому
+опрос и снимок следующего цикла идут одновременно с расчётом текущего.
+"""
+
+
+class FrozenExchange:
+    """Копия рынков биржи для расчёта таблицы в потоке. Остальные атрибуты (имя, комиссии) берутся у самой биржи"""
+    def __init__(self, exchange) -> None:
+        self.exchange = exchange
+        self.futures_market = MarketStore(exchange.futures_market.symbols)
+        self.spot_market = MarketStore(exchange.spot_market.symbols)
+        self.funding_rates = self.futures_market.rates
+        self.symbols_prices = self.futures_market.quotes
+        self.symbols_prices_spot = self.spot_market.quotes
+        self.rate_times = self.futures_market.times
+        self.funding_intervals = self.futures_market.intervals
+
+    def freeze(self):
+        self.futures_market.copy_from(self.exchange.futures_market)
+        self.spot_market.copy_from(self.exchange.spot_market)
+        return self
+
+    def __getattr__(self, name):
+        return getattr(self.exchange, name)
+
+
+class Scanner:
+    def __init__(self, exchanges, fetch, build_table, symbol_column, sort_by, publish,
+                 ticker_intervals=None, default_interval=2.0, metadata_interval=60 * 60,
+                 watch=('symbols_prices', 'rate_times'), top_k=None, offload=False, alerts=None, calendar=None) -> None:
+        self.exchanges = exchanges
+        self.fetch = fetch # async fetch(exchange) - обновление тикеров одной биржи
+        self.build_table = build_table # build_table(exchanges, symbols) -> DataFrame только по указанным символам
+        self.symbol_column = symbol_column
+        self.sort_by = sort_by
+        self.publish = publish # callback(table) (может быть корутиной) или asyncio.Queue
+
+        self.ticker_intervals = ticker_intervals or {} # {имя биржи:интервал опроса тикеров, с}
+        self.default_interval = default_interval
+        self.metadata_interval = metadata_interval
+        self.watch = watch # Атрибуты бирж, изменения которых требуют пересчёта
+
+        self.ranker = OpportunityRanker(sort_by, symbol_column, top_k) # Строки по убыванию sort_by
+        self.table = None # Последняя опубликованная таблица
+        self.dirty = set() # Символы, ожидающие пересчёта
+        self.changed = asyncio.Event()
+        self.tasks = []
+
+        self.offload = offload # Строить таблицу в потоке по снимку рынков
+        self.buffers = None # Два набора FrozenExchange
+        self.scored = 0 # Построенных таблиц
+        self.alerts = alerts # alerts.Alerts - события пересечения порогов по пересчитанным строкам
+        self.calendar = calendar # settlement.SettlementCalendar - опрос и пересчёт по близости выплат
+        self.deferred = 0.0 # time.monotonic() последнего пересчёта всех изменившихся символов
+        self.wakeup = None # Таймер пересчёта отложенных символов
+
+    async def run(self):
+        await asyncio.gather(*(exchange.load_primary_data() for exchange in self.exchanges))
+
+        self.tasks = [asyncio.create_task(self._poll(exchange)) for exchange in self.exchanges]
+        self.tasks.append(asyncio.create_task(self._refresh_metadata()))
+        try:
+            await self._recompute_loop()
+        finally:
+            for task in self.tasks:
+                task.cancel()
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+            await client_manager.close()
+
+    def _state(self, exchange):
+        state = {}
+        for attr in self.watch:
+            value = getattr(exchange, attr, {})
+            # Представления MarketStore сравниваются по копии массивов, а не по словарю на символ
+            state[attr] = value.snapshot() if hasattr(value, 'snapshot') else dict(value)
+        return state
+
+    def _diff(self, exchange, before):
+        changed = set()
+        for attr in self.watch:
+            old, new = before[attr], getattr(exchange, attr, {})
+            if hasattr(new, 'changed'):
+                changed |= new.changed(old)
+                continue
+            changed.update(key for key, value in new.items() if old.get(key) != value)
+            changed.update(old.keys() - new.keys())
+        return changed
+
+    def _interval(self, exchange):
+        if self.calendar is not None:
+            return self.calendar.interval(exchange, self.exchanges)
+        return self.ticker_intervals.get(exchange.get_name(), self.default_interval)
+
+    async def _poll(self, exchange):
+        # Состояние сравнивается с концом прошлого опроса, а не с началом текущего: тикеры WebSocket приходят,
+        # пока опрос спит, а fetch в потоковом режиме ничего не запрашивает
+        before = self._state(exchange)
+        while True:
+            started = time.monotonic()
+            try:
+                await self.fetch(exchange)
+            except Exception as e:
+                metrics.count('poll_errors_total', exchange=exchange.get_name(), error=type(e).__name__)
+                print(f"{exchange.get_name()}: {e!r}")
+            else:
+                changed = self._diff(exchange, before)
+                if changed:
+                    self.dirty |= changed
+                    self.changed.set()
+                before = self._state(exchange)
+            await asyncio.sleep(max(0.0, self._interval(exchange) - (time.monotonic() - started)))
+
+    async def _refresh_metadata(self):
+        while True:
+            await asyncio.sleep(self.metadata_interval)
+            for exchange in self.exchanges:
+                try:
+                    await exchange.refresh_primary_data()
+                except Exception as e:
+                    print(f"{exchange.get_name()}: {e!r}")
+
+    def _score(self, exchanges, symbols):
+        with metrics.span('scoring_seconds', stage='build_table'):
+            table = self.build_table(exchanges, symbols)
+        with metrics.span('scoring_seconds', stage='rank'):
+            self.ranker.replace(symbols, table)
+            top = self.ranker.top()
+        events = []
+        if self.alerts is not None:
+            with metrics.span('scoring_seconds', stage='alerts'):
+                events = self.alerts.replace(symbols, table)
+        metrics.count('scored_symbols_total', len(symbols))
+        self.scored += 1
+        return top, events
+
+    def _take(self):
+        """Символы для пересчёта. С calendar символы без близкой выплаты ждут, пока с прошлого полного пересчёта не пройдёт calendar.slow"""
+        now = time.monotonic()
+        if self.calendar is None or now - self.deferred >= self.calendar.slow:
+            symbols, self.dirty = self.dirty, set()
+            self.deferred = now
+            return symbols
+        symbols = self.dirty & self.calendar.upcoming(self.exchanges)
+        self.dirty -= symbols
+        loop = asyncio.get_running_loop()
+        if self.dirty and (self.wakeup is None or self.wakeup.when() <= loop.time()):
+            # Отложенные символы пересчитаются, даже если новых изменений не будет
+            self.wakeup = loop.call_later(self.deferred + self.calendar.slow - now, self.changed.set)
+        return symbols
+
+    async def _recompute_loop(self):
+        if self.offload:
+            return await self._recompute_offloaded()
+        while True:
+            await self.changed.wait()
+            self.changed.clear()
+            symbols = self._take()
+            if not symbols:
+                continue
+
+            self.table, events = self._score(self.exchanges, symbols)
+            await self._publish(self.table)
+            await deliver(events)
+
+    async def _recompute_offloaded(self):
+        """Расчёт в одном потоке (OpportunityRanker меняется последовательно), не больше двух расчётов в очереди"""
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scoring")
+        self.buffers = [[FrozenExchange(exchange) for exchange in self.exchanges] for _ in range(2)]
+        free = asyncio.Queue() # Номера свободных буферов
+        for number in range(len(self.buffers)):
+            free.put_nowait(number)
+        jobs = asyncio.Queue() # (future расчёта, символы) в порядке запуска
+        publisher = asyncio.create_task(self._publish_jobs(jobs))
+        try:
+            while True:
+                await self.changed.wait()
+                number = await free.get()
+                self.changed.clear()
+                symbols = self._take()
+                if not symbols:
+                    free.put_nowait(number)
+                    continue
+
+                exchanges = [exchange.freeze() for exchange in self.buffers[number]]
+                future = loop.run_in_executor(executor, self._score, exchanges, symbols)
+                future.add_done_callback(lambda _, number=number: free.put_nowait(number))
+                jobs.put_nowait((future, symbols))
+        finally:
+            publisher.cancel()
+            await asyncio.gather(publisher, return_exceptions=True)
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _publish_jobs(self, jobs):
+        while True:
+            future, symbols = await jobs.get()
+            try:
+                self.table, events = await future
+            except Exception as e:
+                print(f"scoring: {e!r}")
+                self.dirty |= symbols # Пересчитать в следующем цикле
+                self.changed.set()
+                continue
+            await self._publish(self.table)
+            await deliver(events)
+
+    async def _publish(self, table):
+        if isinstance(self.publish, asyncio.Queue):
+            if self.publish.full():
+                self.publish.get_nowait() # Потребителю нужна только последняя таблица
+            self.publish.put_nowait(table)
+            return
+        result = self.publish(table)
+        if asyncio.iscoroutine(result):
+            await result
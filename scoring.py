@@ -0,0 +1,79 @@
+import numpy as np
+
+from clock import DEFAULT_INTERVAL, HOUR, server_clock
+
+"""
+Расчёт итогового результата сделки (result(%) в root.py, % в root_futures_spot.py).
+
+Результат = чистый carry по ставкам финансирования + разница цен - комиссии.
+Для фьючерс + фьючерс вложенный np.where из пяти веток сводится к одной формуле:
+если выплаты на обеих биржах в одно время (или время неизвестно), то
+    carry = |rate_1| - sign(rate_1) * rate_2
+(ставки одного знака вычитаются, разного - складываются, нулевая ставка хеджа не влияет),
+иначе учитывается только ставка основной биржи: carry = |rate_1|.
+Все операции выполняются в одном выходном массиве без промежуточных колонок DataFrame.
+
+annualized_score (apr(%), флаг --horizon) сравнивает пары с разными интервалами выплат: позиция держится horizon часов,
+ставка каждой ноги умножается на число её выплат за это время (по времени ближайшей выплаты и интервалу биржи),
+а разница цен и комиссии входа и выхода делятся на тот же срок. Результат переводится в годовые проценты.
+"""
+
+HORIZON = 24 # Срок удержания позиции по умолчанию, ч
+YEAR = 365 * 24 # ч
+
+
+def opportunity_score(rate_1, price_difference, fee=0.0, rate_2=None, time_1=None, time_2=None, out=None):
+    """Итоговый результат в %.
+    rate_2 не задана - фьючерс + спот: carry равен ставке фьючерса со знаком (сделка только SHORT фьючерс).
+    time_1/time_2 - время выплат, ставка хеджа учитывается только при совпадении (NaN - время неизвестно)"""
+    rate_1 = np.asarray(rate_1, dtype=float)
+    if rate_2 is None:
+        out = np.add(rate_1, price_difference, out=out)
+        return np.subtract(out, fee, out=out)
+
+    out = np.sign(rate_1, out=out)
+    np.multiply(out, rate_2, out=out)
+    if time_1 is not None and time_2 is not None:
+        time_1, time_2 = np.asarray(time_1, dtype=float), np.asarray(time_2, dtype=float)
+        differ = np.not_equal(time_1, time_2)
+        differ &= time_1 == time_1 # NaN != NaN: неизвестное время считается совпадающим
+        differ &= time_2 == time_2
+        out[differ] = 0
+
+    np.subtract(np.abs(rate_1), out, out=out)
+    np.add(out, price_difference, out=out)
+    return np.subtract(out, fee, out=out)
+
+
+def settlements(interval, time=None, now=None, horizon=HORIZON):
+    """Сколько выплат ноги придётся на ближайшие horizon часов. interval - ч (NaN - DEFAULT_INTERVAL).
+    time - ближайшая выплата, UTC мс: без него (NaN или уже прошедшее время) выплаты считаются равномерными, horizon / interval"""
+    interval = np.asarray(interval, dtype=float)
+    interval = np.where(np.isnan(interval), DEFAULT_INTERVAL / HOUR, interval)
+    count = horizon / interval
+    if time is None:
+        return count
+    now = server_clock.now() if now is None else now
+    first = (np.asarray(time, dtype=float) - now) / HOUR # ч до ближайшей выплаты
+    with np.errstate(invalid='ignore'):
+        exact = np.where(first <= horizon, np.floor((horizon - first) / interval) + 1, 0)
+        return np.where(first >= 0, exact, count)
+
+
+def annualized_score(rate_1, price_difference, fee, interval_1, time_1=None, rate_2=None, interval_2=None, time_2=None,
+                     now=None, horizon=HORIZON, out=None):
+    """Годовая доходность в % позиции, удерживаемой horizon часов: (carry + разница цен - fee) * YEAR / horizon.
+    Ставки, разница цен и fee (вход и выход обеих ног) - в %. rate_2 не задана - фьючерс + спот, carry = rate_1 * выплаты.
+    Иначе carry = |rate_1| * выплаты_1 - sign(rate_1) * rate_2 * выплаты_2: хедж держится весь срок и платит свои выплаты"""
+    rate_1 = np.asarray(rate_1, dtype=float)
+    count_1 = settlements(interval_1, time_1, now, horizon)
+    if rate_2 is None:
+        out = np.multiply(rate_1, count_1, out=out)
+    else:
+        out = np.sign(rate_1, out=out)
+        np.multiply(out, rate_2, out=out)
+        np.multiply(out, settlements(interval_2, time_2, now, horizon), out=out)
+        np.subtract(np.abs(rate_1) * count_1, out, out=out)
+    np.add(out, price_difference, out=out)
+    np.subtract(out, fee, out=out)
+    return np.multiply(out, YEAR / horizon, out=out)
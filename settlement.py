@@ -0,0 +1,64 @@
+import numpy as np
+
+from clock import server_clock
+from market_store import symbol_table
+
+"""
+Календарь выплат финансирования для планирования опроса.
+
+Время ближайшей выплаты каждого символа берётся из колонок time MarketStore всех бирж (nextFundingTime бирж
+и расчётные 0/8/16 часов UTC у Mexc - всё, что лежит в rate_times). Биржа опрашивается раз в fast секунд, пока
+хотя бы у одного её символа (фьючерс или спот) выплата на любой бирже наступит в ближайшие window секунд.
+Иначе она спит до начала ближайшего такого окна, но не дольше slow секунд. Запросы тратятся там, где
+скоро выплата, а не равномерно по времени.
+Scanner с calendar пересчитывает строки символов с близкой выплатой сразу, а остальные - не чаще раза в slow секунд.
+"""
+
+
+class SettlementCalendar:
+    def __init__(self, window=10 * 60, fast=0.5, slow=30.0) -> None:
+        self.window = window # с до выплаты, когда символ считается близким к выплате
+        self.fast = fast # Интервал опроса биржи с близкими выплатами, с
+        self.slow = slow # Наибольший интервал опроса остальных бирж, с
+
+    def now(self):
+        """Текущее время в формате rate_times (UTC, мс) по медиане часов бирж"""
+        return server_clock.now()
+
+    def settlements(self, exchanges, now):
+        """Ближайшая будущая выплата по всем биржам для каждого id символа, мс (inf - неизвестна)"""
+        nearest = np.full(len(symbol_table), np.inf)
+        for exchange in exchanges:
+            store = exchange.futures_market
+            times = store.time[:store.size]
+            with np.errstate(invalid='ignore'):
+                np.fmin(nearest[:store.size], np.where(times > now, times, np.inf), out=nearest[:store.size])
+        return nearest
+
+    def upcoming(self, exchanges, now=None):
+        """Стандартные символы, выплата по которым наступит в ближайшие window секунд"""
+        now = self.now() if now is None else now
+        ids = np.nonzero(self.settlements(exchanges, now) <= now + self.window * 1000)[0]
+        names = symbol_table.names
+        return {names[index] for index in ids}
+
+    def interval(self, exchange, exchanges, now=None):
+        """Сколько секунд ждать до следующего опроса биржи"""
+        now = self.now() if now is None else now
+        nearest = self.settlements(exchanges, now)
+        soonest = np.inf
+        for store in (exchange.futures_market, exchange.spot_market):
+            listed = ~np.isnan(store.ask[:store.size])
+            if listed.any():
+                soonest = min(soonest, nearest[:store.size][listed].min())
+        wait = (soonest - now) / 1000 - self.window # Секунд до начала окна ближайшей выплаты
+        return float(min(self.slow, max(self.fast, wait)))
+
+    def report(self, exchanges, now=None):
+        now = self.now() if now is None else now
+        nearest = self.settlements(exchanges, now)
+        if not np.isfinite(nearest).any():
+            return "settlements: unknown"
+        soonest = nearest.min()
+        count = int((nearest <= now + self.window * 1000).sum())
+        return f"next settlement in {(soonest - now) / 60_000:.1f} min, {count} symbols within {self.window / 60:.0f} min"
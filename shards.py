@@ -0,0 +1,275 @@
+import asyncio
+import multiprocessing
+import time
+from multiprocessing import connection as connections, shared_memory
+
+import numpy as np
+
+from http_client import client_manager
+from market_store import MarketStore, symbol_table
+from metadata_cache import metadata_cache
+from metrics import metrics
+from scanner import Scanner
+from streaming import create_streams
+
+"""
+Шардированный режим: ввод-вывод бирж в отдельных процессах.
+
+Биржи делятся между workers процессами (ShardWorker). Каждый процесс со своим event loop и пулом соединений
+опрашивает свои биржи (или слушает их WebSocket), разбирает ответы и после каждого опроса копирует колонки
+MarketStore в общую память (SharedColumns). По Pipe процесса (свой у каждого, без общих блокировок) уходит только
+короткое сообщение: имя блока и новые стандартные символы процесса. Главный процесс (ShardedScanner) переносит
+колонки в свои MarketStore одной векторной записью, определяет изменившиеся символы и пересчитывает таблицу как обычный Scanner.
+Разбор ответов идёт на других ядрах, а пересчёт таблицы в главном процессе не задерживает следующий опрос.
+Выигрыш есть, только если свободных ядер не меньше workers + 1. На одном ядре процессы делят его с пересчётом таблицы:
+в benchmark.py shards (4 биржи x 3000 символов, 4 процесса) опросов в секунду не больше (21.1 -> 16.5 ... 22.0 -> 21.8),
+таблиц в секунду меньше (~12 -> ~7), выигрыш только в задержке event loop. Поэтому по умолчанию шарды выключены.
+"""
+
+HEADER = 4 # int64: счётчик записи, число символов, ёмкость, резерв
+METRICS_INTERVAL = 5.0 # Как часто шард отправляет снимок своих метрик, с
+
+
+class SharedColumns:
+    """Колонки MarketStore.COLUMNS одного MarketStore в общей памяти.
+    Счётчик записи нечётный, пока процесс-шард пишет: читатель повторяет чтение, если счётчик изменился"""
+    def __init__(self, capacity=None, name=None) -> None:
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=(HEADER + len(MarketStore.COLUMNS) * capacity) * 8)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.header = np.ndarray(HEADER, dtype=np.int64, buffer=self.memory.buf)
+        if name is None:
+            self.header[:] = (0, 0, capacity, 0)
+        self.capacity = int(self.header[2])
+        self.columns = np.ndarray((len(MarketStore.COLUMNS), self.capacity), dtype=np.float64, buffer=self.memory.buf, offset=HEADER * 8)
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def write(self, store):
+        size = store.size
+        self.header[0] += 1
+        for index, column in enumerate(MarketStore.COLUMNS):
+            self.columns[index, :size] = getattr(store, column)[:size]
+        self.header[1] = size
+        self.header[0] += 1
+
+    def read(self, attempts=3):
+        """(число символов, копия колонок [колонка, символ]) или None, если запись не закончилась"""
+        for _ in range(attempts):
+            sequence = int(self.header[0])
+            if sequence % 2:
+                continue
+            size = int(self.header[1])
+            columns = self.columns[:, :size].copy()
+            if int(self.header[0]) == sequence:
+                return size, columns
+        return None
+
+    def close(self, unlink=False):
+        del self.header, self.columns # Представления numpy держат буфер, без них close() не освободит память
+        self.memory.close()
+        if unlink:
+            self.memory.unlink()
+
+
+class ShardWorker(Scanner):
+    """Процесс ввода-вывода: опрос своих бирж и выкладка их колонок в общую память"""
+    def __init__(self, number, exchanges, fetch, connection, **options) -> None:
+        super().__init__(exchanges, self._fetch, None, None, None, None, watch=(), **options)
+        self.number = number
+        self.source = fetch # async fetch(exchange) - как у Scanner
+        self.connection = connection # Конец Pipe: сообщения в главный процесс, от него - команда остановки
+        self.blocks = {} # {(биржа, рынок): SharedColumns}
+        self.sent = 0 # Сколько стандартных символов процесса уже отправлено
+        self.metrics_sent = 0.0 # time.monotonic() последней отправки метрик
+        for exchange in exchanges:
+            exchange.on_listings = self._send_listings
+
+    async def _fetch(self, exchange):
+        await self.source(exchange)
+        self.share(exchange)
+
+    def _send_listings(self, exchange, market):
+        primary = exchange.primary_data if market == 'futures' else exchange.primary_data_spot
+        self.connection.send(('listings', self.number, exchange.get_name(),
+                              (market, dict(primary), exchange.multipliers[market], exchange.contract_sizes[market])))
+
+    def share(self, exchange):
+        blocks = []
+        for market, store in (('futures', exchange.futures_market), ('spot', exchange.spot_market)):
+            if store.size == 0:
+                continue
+            key = (exchange.get_name(), market)
+            block = self.blocks.get(key)
+            if block is None or block.capacity < store.size:
+                # Новый блок под выросший MarketStore. Старый удаляется: главный процесс перейдёт на новый по имени
+                if block is not None:
+                    block.close(unlink=True)
+                block = self.blocks[key] = SharedColumns(capacity=len(store.ask))
+            block.write(store)
+            blocks.append((market, block.name))
+
+        names = symbol_table.names[self.sent:]
+        offset, self.sent = self.sent, len(symbol_table.names)
+        self.connection.send(('update', self.number, exchange.get_name(), (offset, names, blocks)))
+        if metrics.enabled and time.monotonic() - self.metrics_sent >= METRICS_INTERVAL:
+            self.metrics_sent = time.monotonic()
+            self.connection.send(('metrics', self.number, None, metrics.snapshot()))
+
+    async def serve(self, stream_markets=None):
+        """Работает до команды остановки или закрытия Pipe главным процессом. stream_markets - рынки, тикеры которых приходят по WebSocket"""
+        streams = [item for item in create_streams(self.exchanges) if item.market in stream_markets] if stream_markets else []
+        task = asyncio.gather(self.run(), *(item.run() for item in streams))
+        loop = asyncio.get_running_loop()
+        try:
+            while not task.done():
+                if await loop.run_in_executor(None, self.connection.poll, 0.5):
+                    break
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            for block in self.blocks.values():
+                block.close(unlink=True)
+            self.blocks.clear()
+
+
+def run_worker(number, exchanges, fetch, connection, stream_markets, options, metrics_enabled=False, redirect=None):
+    """Точка входа процесса-шарда. exchanges - [(класс биржи, spot, использовать metadata_cache)]"""
+    metrics.enabled = metrics_enabled
+    client_manager.redirect = redirect
+    objects = [cls(spot=spot, metadata_cache=metadata_cache if cached else None) for cls, spot, cached in exchanges]
+    worker = ShardWorker(number, objects, fetch, connection, **options)
+    try:
+        asyncio.run(worker.serve(stream_markets))
+    except (KeyboardInterrupt, BrokenPipeError):
+        pass
+
+
+class ShardedScanner(Scanner):
+    """Scanner, у которого биржи опрашиваются в workers процессах. Главный процесс только собирает колонки и считает таблицу"""
+    def __init__(self, exchanges, fetch, build_table, symbol_column, sort_by, publish, workers=2, stream_markets=None, **options) -> None:
+        super().__init__(exchanges, fetch, build_table, symbol_column, sort_by, publish, **options)
+        self.workers = max(1, min(workers, len(exchanges)))
+        self.stream_markets = stream_markets
+        self.by_name = {exchange.get_name(): exchange for exchange in exchanges}
+
+        self.context = multiprocessing.get_context('spawn')
+        self.stopping = False
+        self.processes = {} # {номер шарда: Process}
+        self.connections = {} # {номер шарда: конец Pipe главного процесса}
+        self.remaps = {} # {номер шарда: [id главного процесса по id процесса-шарда]}
+        self.blocks = {} # {(биржа, рынок): SharedColumns}
+        self.received = 0 # Применённых снимков бирж
+
+    def _start(self, number):
+        shard = [(type(exchange), exchange.spot, exchange.metadata_cache is not None) for exchange in self.exchanges[number::self.workers]]
+        options = {'ticker_intervals': self.ticker_intervals, 'default_interval': self.default_interval, 'metadata_interval': self.metadata_interval,
+                   'calendar': self.calendar} # Календарь выплат шард видит только по своим биржам
+        if number in self.connections:
+            self.connections[number].close()
+        connection, child = self.context.Pipe()
+        process = self.context.Process(target=run_worker, name=f"shard-{number}", daemon=True,
+                                       args=(number, shard, self.fetch, child, self.stream_markets, options, metrics.enabled, client_manager.redirect))
+        process.start()
+        child.close()
+        self.processes[number] = process
+        self.connections[number] = connection
+        self.remaps[number] = []
+
+    async def run(self):
+        for number in range(self.workers):
+            self._start(number)
+
+        self.tasks = [asyncio.create_task(self._receive())]
+        try:
+            await self._recompute_loop()
+        finally:
+            for task in self.tasks:
+                task.cancel()
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+            self.stopping = True
+            for number, process in self.processes.items():
+                try:
+                    self.connections[number].send(None)
+                except OSError:
+                    pass
+                await asyncio.get_running_loop().run_in_executor(None, process.join, 5)
+                if process.is_alive():
+                    process.terminate()
+                self.connections[number].close()
+            for block in self.blocks.values():
+                block.close()
+            self.blocks.clear()
+            await client_manager.close()
+
+    def _drain(self):
+        """Все накопившиеся сообщения шардов; ждёт первое не дольше секунды"""
+        messages = []
+        for connection in connections.wait(list(self.connections.values()), timeout=1.0):
+            try:
+                while connection.poll():
+                    messages.append(connection.recv())
+            except (EOFError, OSError): # Процесс завершился - перезапуск ниже, в _receive
+                pass
+        return messages
+
+    async def _receive(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            changed = set()
+            for kind, number, name, payload in await loop.run_in_executor(None, self._drain):
+                if kind == 'metrics':
+                    metrics.remote[f"shard-{number}"] = payload
+                    continue
+                exchange = self.by_name[name]
+                if kind == 'listings':
+                    market, listings, multipliers, contract_sizes = payload
+                    exchange.contract_sizes[market] = contract_sizes
+                    exchange.set_listings(market, listings, multipliers)
+                else:
+                    changed |= self._apply(number, exchange, *payload)
+            if changed:
+                self.dirty |= changed
+                self.changed.set()
+
+            for number, process in list(self.processes.items()):
+                if not process.is_alive() and not self.stopping:
+                    print(f"shard-{number} exited with code {process.exitcode}, restarting")
+                    self._start(number)
+
+    def _apply(self, number, exchange, offset, names, blocks):
+        remap = self.remaps[number]
+        if offset != len(remap): # Процесс перезапущен: id символов начинаются заново
+            del remap[offset:]
+            if offset > len(remap):
+                return set()
+        remap.extend(symbol_table.intern(name) for name in names)
+        ids = np.array(remap, dtype=np.intp)
+
+        before = self._state(exchange)
+        for market, block_name in blocks:
+            block = self._attach(exchange.get_name(), market, block_name)
+            data = block.read() if block is not None else None
+            if data is None:
+                continue
+            size, columns = data
+            store = exchange.futures_market if market == 'futures' else exchange.spot_market
+            store.update(ids[:size], **dict(zip(MarketStore.COLUMNS, columns)))
+        self.received += 1
+        return self._diff(exchange, before)
+
+    def _attach(self, exchange, market, name):
+        block = self.blocks.get((exchange, market))
+        if block is not None and block.name == name:
+            return block
+        try:
+            attached = SharedColumns(name=name)
+        except FileNotFoundError: # Блок уже заменён шардом, следующее сообщение придёт с новым
+            return None
+        if block is not None:
+            block.close()
+        self.blocks[(exchange, market)] = attached
+        return attached
@@ -0,0 +1,331 @@
+import asyncio
+import gzip
+import json
+import time
+import uuid
+
+import numpy as np
+
+from http_client import client_manager
+from decoder import loads
+from metrics import metrics
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+"""
+Потоковое получение тикеров и ставок финансирования через публичные WebSocket бирж.
+
+Поток обновляет на месте те же словари, что и REST запросы биржи:
+symbols_prices, symbols_prices_spot, funding_rates и rate_times.
+При обрыве соединения поток переподключается с экспоненциальной задержкой, заново подписывается
+и догружает пропущенные данные обычным REST запросом биржи (main__get_symbols).
+Сообщение со временем биржи раньше уже применённого по тому же символу и каналу (переупорядоченное
+или повтор после переподключения) отбрасывается, чтобы не откатить цену или ставку назад.
+url можно переопределить, чтобы подключиться к локальному моку (mock_exchange.MockStream).
+"""
+
+class ExchangeStream:
+    url = None
+    market = 'futures' # futures или spot
+    ping_interval = 20 # с
+    batch = 10 # Количество символов в одном сообщении подписки
+
+    def __init__(self, exchange, symbols=None, url=None, reconnect_delay=1.0, max_reconnect_delay=60.0) -> None:
+        self.exchange = exchange
+        self.symbols = symbols # Стандартные символы для подписки (None - все символы биржи)
+        if url is not None:
+            self.url = url
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+
+        self.reconnects = 0
+        self.messages = 0
+        self.last_seen = {} # {(канал, биржевый символ): время биржи последнего применённого сообщения}
+
+    @property
+    def primary_data(self):
+        return self.exchange.primary_data if self.market == 'futures' else self.exchange.primary_data_spot
+
+    @property
+    def reverse_data(self):
+        return self.exchange.reverse_data if self.market == 'futures' else self.exchange.reverse_data_spot
+
+    @property
+    def prices(self):
+        return self.exchange.symbols_prices if self.market == 'futures' else self.exchange.symbols_prices_spot
+
+    async def run(self):
+        if websockets is None:
+            raise ImportError("Для потоковых данных нужен пакет websockets: pip install websockets")
+
+        delay = self.reconnect_delay
+        while True:
+            try:
+                if len(self.exchange.primary_data) == 0:
+                    await self.exchange.load_primary_data()
+
+                async with websockets.connect(await self.connect_url(), max_size=None, ping_interval=None) as ws:
+                    # Сначала подписка, потом REST снимок: обновления, пришедшие во время снимка, применятся поверх него
+                    for message in self.subscriptions():
+                        await ws.send(json.dumps(message))
+                    await self.backfill()
+                    delay = self.reconnect_delay
+
+                    pinger = asyncio.create_task(self._ping(ws))
+                    try:
+                        async for raw in ws:
+                            message = self.decode(raw)
+                            if message is not None:
+                                self.messages += 1
+                                await self.on_message(ws, message)
+                    finally:
+                        pinger.cancel()
+            except Exception as e:
+                metrics.count('stream_errors_total', exchange=self.exchange.get_name(), market=self.market, error=type(e).__name__)
+                print(f"{self.exchange.get_name()} {self.market} stream: {e!r}")
+
+            self.reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    async def connect_url(self) -> str:
+        return self.url
+
+    async def backfill(self):
+        """Догружает состояние через REST, чтобы закрыть пропуск за время переподключения"""
+        try:
+            await self.exchange.main__get_symbols()
+        except Exception as e:
+            print(f"{self.exchange.get_name()} backfill: {e!r}")
+
+    def exchange_symbols(self):
+        if self.symbols is None:
+            return list(self.primary_data)
+        return [self.reverse_data[symbol] for symbol in self.symbols if symbol in self.reverse_data]
+
+    def chunks(self, items):
+        return [items[i:i + self.batch] for i in range(0, len(items), self.batch)]
+
+    def subscriptions(self):
+        return []
+
+    def ping_message(self):
+        return None
+
+    def decode(self, raw):
+        return loads(raw)
+
+    async def on_message(self, ws, message):
+        pass
+
+    async def _ping(self, ws):
+        message = self.ping_message()
+        if message is None:
+            return
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            await ws.send(json.dumps(message))
+
+    def fresh(self, channel, exchange_symbol, ts):
+        """False - сообщение старше последнего применённого по символу и каналу. ts - время биржи (None - не проверяется)"""
+        try:
+            ts = float(ts)
+        except (TypeError, ValueError):
+            return True
+        last = self.last_seen.get((channel, exchange_symbol))
+        if last is not None and ts < last:
+            metrics.count('dropped_rows_total', exchange=self.exchange.get_name(), endpoint=f"{self.market} stream", reason='stale')
+            return False
+        self.last_seen[(channel, exchange_symbol)] = ts
+        return True
+
+    def update_quote(self, exchange_symbol, ask, bid, ts=None):
+        """Обновляет ask/bid символа. Пустые поля (дельта-обновления) берутся из предыдущего значения"""
+        key = self.primary_data.get(exchange_symbol)
+        if key is None or not self.fresh('quote', exchange_symbol, ts):
+            return
+        quote = self.prices.get(key, {})
+        multiplier = self.exchange.multipliers[self.market].get(exchange_symbol, 1) # Цена 1000PEPE - за 1000 монет
+        try:
+            ask = float(ask) / multiplier if ask not in (None, '') else quote.get('ask')
+            bid = float(bid) / multiplier if bid not in (None, '') else quote.get('bid')
+        except ValueError:
+            metrics.count('dropped_rows_total', exchange=self.exchange.get_name(), endpoint=f"{self.market} stream", reason='malformed')
+            return
+        if ask is not None and bid is not None:
+            self.prices.set(key, ask, bid)
+
+    def update_funding(self, exchange_symbol, rate=None, next_time=None, ts=None, channel='funding'):
+        key = self.exchange.primary_data.get(exchange_symbol)
+        if key is None or not self.fresh(channel, exchange_symbol, ts):
+            return
+        try:
+            if rate not in (None, ''):
+                self.exchange.funding_rates[key] = float(rate)
+            if next_time not in (None, ''):
+                store = self.exchange.futures_market
+                self.exchange.store_times(store, np.array([store.intern(key)]), np.array([float(int(next_time))]))
+        except ValueError:
+            metrics.count('dropped_rows_total', exchange=self.exchange.get_name(), endpoint=f"{self.market} stream", reason='malformed')
+
+
+class BybitStream(ExchangeStream):
+    url = "wss://stream.bybit.com/v5/public/linear"
+
+    def subscriptions(self):
+        topics = [f"tickers.{symbol}" for symbol in self.exchange_symbols()]
+        return [{"op": "subscribe", "args": chunk} for chunk in self.chunks(topics)]
+
+    def ping_message(self):
+        return {"op": "ping"}
+
+    async def on_message(self, ws, message):
+        if not message.get('topic', '').startswith('tickers.'):
+            return
+        data = message['data']
+        self.update_funding(data['symbol'], data.get('fundingRate'), data.get('nextFundingTime'), message.get('ts'))
+        self.update_quote(data['symbol'], data.get('ask1Price'), data.get('bid1Price'), message.get('ts'))
+
+
+class BybitSpotStream(ExchangeStream):
+    url = "wss://stream.bybit.com/v5/public/spot"
+    market = 'spot'
+
+    def subscriptions(self):
+        topics = [f"orderbook.1.{symbol}" for symbol in self.exchange_symbols()]
+        return [{"op": "subscribe", "args": chunk} for chunk in self.chunks(topics)]
+
+    def ping_message(self):
+        return {"op": "ping"}
+
+    async def on_message(self, ws, message):
+        if not message.get('topic', '').startswith('orderbook.1.'):
+            return
+        data = message['data']
+        ask = data['a'][0][0] if data.get('a') else None
+        bid = data['b'][0][0] if data.get('b') else None
+        self.update_quote(data['s'], ask, bid, message.get('ts'))
+
+
+class MexcStream(ExchangeStream):
+    """Спот Mexc отдаёт данные в protobuf, поэтому для спота остаются REST запросы"""
+    url = "wss://contract.mexc.com/edge"
+    ping_interval = 15
+
+    def subscriptions(self):
+        messages = [{"method": "sub.tickers", "param": {}}]
+        # Время следующей выплаты приходит только в канале funding.rate, подписка на каждый символ отдельно
+        messages += [{"method": "sub.funding.rate", "param": {"symbol": symbol}} for symbol in self.exchange_symbols()]
+        return messages
+
+    def ping_message(self):
+        return {"method": "ping"}
+
+    async def on_message(self, ws, message):
+        channel = message.get('channel')
+        if channel == 'push.tickers':
+            for data in message['data']:
+                self.update_funding(data['symbol'], data.get('fundingRate'), ts=message.get('ts'))
+                self.update_quote(data['symbol'], data.get('ask1'), data.get('bid1'), message.get('ts'))
+        elif channel == 'push.funding.rate':
+            data = message['data']
+            self.update_funding(data['symbol'], data.get('rate'), data.get('nextSettleTime'), message.get('ts'), channel)
+
+
+class BingxStream(ExchangeStream):
+    """Ставки финансирования Bingx по WebSocket не публикует, их догружает REST"""
+    url = "wss://open-api-swap.bingx.com/swap-market"
+
+    def subscriptions(self):
+        return [{"id": uuid.uuid4().hex, "reqType": "sub", "dataType": f"{symbol}@bookTicker"} for symbol in self.exchange_symbols()]
+
+    def decode(self, raw):
+        if isinstance(raw, bytes):
+            raw = gzip.decompress(raw).decode()
+        if raw == 'Ping':
+            return raw
+        return loads(raw)
+
+    async def on_message(self, ws, message):
+        if message == 'Ping':
+            await ws.send('Pong')
+            return
+        data_type = message.get('dataType', '')
+        if not data_type.endswith('@bookTicker') or 'data' not in message:
+            return
+        data = message['data']
+        self.update_quote(data_type.split('@')[0], data.get('a'), data.get('b'), data.get('E'))
+
+
+class BingxSpotStream(BingxStream):
+    url = "wss://open-api-ws.bingx.com/market"
+    market = 'spot'
+
+
+class KucoinStream(ExchangeStream):
+    """Kucoin выдаёт адрес WebSocket вместе с токеном через REST запрос bullet-public"""
+    url = None
+    token_url = "https://api-futures.kucoin.com/api/v1/bullet-public"
+    batch = 100
+
+    def __init__(self, exchange, symbols=None, url=None, **kwargs) -> None:
+        super().__init__(exchange, symbols, url, **kwargs)
+        self.fixed_url = url is not None
+
+    async def connect_url(self) -> str:
+        if self.fixed_url:
+            return self.url
+        response = await client_manager.post(self.token_url)
+        data = response.json()['data']
+        server = data['instanceServers'][0]
+        self.ping_interval = server['pingInterval'] / 1000
+        return f"{server['endpoint']}?token={data['token']}&connectId={uuid.uuid4().hex}"
+
+    def topics(self):
+        return [f"/contractMarket/tickerV2:{','.join(chunk)}" for chunk in self.chunks(self.exchange_symbols())] + \
+            [f"/contract/instrument:{','.join(chunk)}" for chunk in self.chunks(self.exchange_symbols())]
+
+    def subscriptions(self):
+        return [{"id": uuid.uuid4().hex, "type": "subscribe", "topic": topic, "response": True} for topic in self.topics()]
+
+    def ping_message(self):
+        return {"id": str(int(time.time() * 1000)), "type": "ping"}
+
+    async def on_message(self, ws, message):
+        if message.get('type') != 'message':
+            return
+        topic, data = message['topic'], message['data']
+        if topic.startswith('/contractMarket/tickerV2:'):
+            self.update_quote(data['symbol'], data.get('bestAskPrice'), data.get('bestBidPrice'), data.get('ts'))
+        elif topic.startswith('/contract/instrument:') and message.get('subject') == 'funding.rate':
+            self.update_funding(topic.split(':')[1], data.get('fundingRate'), ts=data.get('timestamp'))
+
+
+class KucoinSpotStream(KucoinStream):
+    token_url = "https://api.kucoin.com/api/v1/bullet-public"
+    market = 'spot'
+
+    def topics(self):
+        return [f"/market/ticker:{','.join(chunk)}" for chunk in self.chunks(self.exchange_symbols())]
+
+    async def on_message(self, ws, message):
+        if message.get('type') != 'message' or not message['topic'].startswith('/market/ticker:'):
+            return
+        data = message['data']
+        self.update_quote(message['topic'].split(':')[1], data.get('bestAsk'), data.get('bestBid'), data.get('time'))
+
+
+# {имя биржи: классы потоков}
+STREAMS = {
+    "Bybit": [BybitStream, BybitSpotStream],
+    "Mexc": [MexcStream],
+    "Bingx": [BingxStream, BingxSpotStream],
+    "Kucoin": [KucoinStream, KucoinSpotStream],
+}
+
+
+def create_streams(exchanges, symbols=None):
+    return [stream(exchange, symbols) for exchange in exchanges for stream in STREAMS.get(exchange.get_name(), [])]
@@ -0,0 +1,116 @@
+import re
+from collections import defaultdict
+
+import numpy as np
+
+from market_store import symbol_table
+
+"""
+Реестр стандартных символов.
+
+Все биржи строят стандартный символ 'BASE/QUOTE' через SymbolRegistry.standard: переименованные тикеры
+приводятся к одному имени (ALIASES, например XBT -> BTC у Kucoin), а тикеры с множителем (1000PEPE)
+к базовой монете с множителем цены (PEPE/USDT, цена делится на 1000). DENY_LIST исключает листинги,
+DENY_SPOT_PAIRS и DENY_FUTURES_PAIRS - пары бирж фьючерс + спот и фьючерс + фьючерс, у которых одинаковый тикер
+означает разные монеты.
+
+Реестр знает, на каких биржах листингован каждый символ, и поддерживает пересечения
+futures x futures (символ есть на двух и более фьючерсных биржах) и futures x spot. Пересечения
+обновляются только по символам, листинг которых изменился.
+"""
+
+ALIASES = {
+    "XBT": "BTC", # Kucoin фьючерсы
+}
+
+# Префикс-множитель тикера: 1000PEPE, 10000LADYS, 1000000MOG
+MULTIPLIER_PREFIX = re.compile(r"^(10{3,})([A-Z].*)$")
+
+# (биржа, стандартный символ) - листинг не используется вовсе
+DENY_LIST = set()
+
+# (биржа фьючерса, биржа спота, стандартный символ) - пара фьючерс + спот не строится: тикер обозначает разные монеты
+# (например, спот QI на Mexc). Только для root_futures_spot.py
+DENY_SPOT_PAIRS = {
+    ("Bybit", "Mexc", "QI/USDT"),
+    ("Bybit", "Bybit", "FB/USDT"),
+    ("Mexc", "Mexc", "QI/USDT"),
+    ("Mexc", "Bybit", "FB/USDT"),
+}
+
+# (основная биржа, биржа хеджирования, стандартный символ) - пара фьючерс + фьючерс не строится (root.py)
+DENY_FUTURES_PAIRS = set()
+
+
+class SymbolRegistry:
+    def __init__(self, symbols=None, aliases=None, deny=None, deny_spot_pairs=None, deny_futures_pairs=None) -> None:
+        self.symbols = symbol_table if symbols is None else symbols # market_store.SymbolTable - символ <-> id
+        self.aliases = ALIASES if aliases is None else aliases
+        self.deny = DENY_LIST if deny is None else deny
+        self.deny_spot_pairs = DENY_SPOT_PAIRS if deny_spot_pairs is None else deny_spot_pairs
+        self.deny_futures_pairs = DENY_FUTURES_PAIRS if deny_futures_pairs is None else deny_futures_pairs
+
+        self.listings = {'futures': {}, 'spot': {}} # {рынок: {биржа: set(id)}}
+        self.venues = {'futures': defaultdict(set), 'spot': defaultdict(set)} # {рынок: {id: set(биржа)}}
+        self.futures_futures = set() # id символов, листингованных на двух и более фьючерсных биржах
+        self.futures_spot = set() # id символов, у которых есть и фьючерс, и спот
+        self.version = 0 # Растёт при каждом изменении пересечений
+        self._masks = {}
+
+    def standard(self, base, quote):
+        """(стандартный символ, множитель цены) по базовой и котируемой валюте биржи"""
+        base, quote = base.upper(), quote.upper()
+        multiplier = 1
+        match = MULTIPLIER_PREFIX.match(base)
+        if match:
+            multiplier, base = int(match.group(1)), match.group(2)
+        base = self.aliases.get(base, base)
+        return f"{base}/{self.aliases.get(quote, quote)}", multiplier
+
+    def denied(self, exchange, symbol):
+        return (exchange, symbol) in self.deny
+
+    def denied_spot_pair(self, exchange_futures, exchange_spot, symbol):
+        return (exchange_futures, exchange_spot, symbol) in self.deny_spot_pairs
+
+    def update(self, exchange, market, symbols):
+        """Заменяет листинг биржи на рынке (стандартные символы). Пересчитываются только изменившиеся символы"""
+        new = {self.symbols.intern(symbol) for symbol in symbols}
+        old = self.listings[market].get(exchange, set())
+        self.listings[market][exchange] = new
+
+        changed = old ^ new
+        for index in changed:
+            if index in new:
+                self.venues[market][index].add(exchange)
+            else:
+                self.venues[market][index].discard(exchange)
+
+            futures, spot = self.venues['futures'].get(index), self.venues['spot'].get(index)
+            self._place(self.futures_futures, index, futures and len(futures) >= 2)
+            self._place(self.futures_spot, index, futures and spot)
+        if changed:
+            self.version += 1
+
+    def _place(self, intersection, index, member):
+        if member:
+            intersection.add(index)
+        else:
+            intersection.discard(index)
+
+    def names(self, intersection):
+        """Стандартные символы пересечения ('futures_futures' или 'futures_spot')"""
+        names = self.symbols.names
+        return [names[index] for index in list(getattr(self, intersection))] # list() - копия за один шаг: таблица может строиться в потоке Scanner
+
+    def mask(self, intersection, size):
+        """Булев массив длины size: True для id из пересечения. Кэшируется до следующего изменения листингов"""
+        cached = self._masks.get(intersection)
+        if cached is None or cached[:2] != (self.version, size):
+            mask = np.zeros(size, dtype=bool)
+            mask[[index for index in list(getattr(self, intersection)) if index < size]] = True
+            cached = self._masks[intersection] = (self.version, size, mask)
+        return cached[2]
+
+
+symbol_registry = SymbolRegistry()
@@ -0,0 +1,69 @@
+import asyncio
+
+import pandas as pd
+
+from alerts import Alerts, deliver
+
+"""
+Alerts: события только при пересечении порогов, гистерезис enter/exit, debounce, step и пропавшие строки.
+"""
+
+
+def table(rows):
+    return pd.DataFrame(rows, columns=['symbol', 'main_exchange', 'hadge_exchange', 'score'])
+
+
+def kinds(events):
+    return [(event.kind, event.key[0], event.value) for event in events]
+
+
+def test_enter_and_exit_only_on_crossing():
+    alerts = Alerts('score')
+    alerts.subscribe(None, enter=0.5)
+    assert alerts.replace({'A'}, table([('A', 'Bybit', 'Mexc', 0.4)]), now=0) == []
+    assert kinds(alerts.replace({'A'}, table([('A', 'Bybit', 'Mexc', 0.6)]), now=1)) == [('enter', 'A', 0.6)]
+    assert alerts.replace({'A'}, table([('A', 'Bybit', 'Mexc', 0.6)]), now=2) == [] # Значение не изменилось
+    assert kinds(alerts.replace({'A'}, table([('A', 'Bybit', 'Mexc', 0.7)]), now=2)) == [('update', 'A', 0.7)]
+    assert kinds(alerts.replace({'A'}, table([('A', 'Bybit', 'Mexc', 0.5)]), now=3)) == [('exit', 'A', 0.5)]
+
+
+def test_hysteresis_keeps_row_active_between_thresholds():
+    alerts = Alerts('score')
+    alerts.subscribe(None, enter=0.5, exit=0.3, step=1.0)
+    events = []
+    for now, value in enumerate([0.6, 0.45, 0.55, 0.35, 0.45, 0.3, 0.45]):
+        events += alerts.replace({'A'}, table([('A', 'Bybit', 'Mexc', value)]), now=now)
+    # Колебания между 0.3 и 0.5 не дают выхода, после выхода 0.45 ниже enter - нового входа нет
+    assert kinds(events) == [('enter', 'A', 0.6), ('exit', 'A', 0.3)]
+
+
+def test_debounce_requires_condition_to_hold():
+    alerts = Alerts('score')
+    alerts.subscribe(None, enter=0.5, debounce=10)
+    assert alerts.replace({'A'}, table([('A', 'Bybit', 'Mexc', 0.6)]), now=0) == []
+    assert alerts.replace({'A'}, table([('A', 'Bybit', 'Mexc', 0.4)]), now=5) == [] # Дребезг: ожидание сброшено
+    assert alerts.replace({'A'}, table([('A', 'Bybit', 'Mexc', 0.6)]), now=6) == []
+    assert alerts.replace({'B'}, table([]), now=12) == [] # Условие держится только 6 с
+    # Пересчёт другого символа проверяет ожидающие переходы
+    assert kinds(alerts.replace({'B'}, table([]), now=16)) == [('enter', 'A', 0.6)]
+
+
+def test_update_step_and_missing_rows():
+    alerts = Alerts('score')
+    alerts.subscribe(None, enter=0.5, step=0.1)
+    alerts.replace({'A'}, table([('A', 'Bybit', 'Mexc', 0.6)]), now=0)
+    assert alerts.replace({'A'}, table([('A', 'Bybit', 'Mexc', 0.65)]), now=1) == []
+    assert kinds(alerts.replace({'A'}, table([('A', 'Bybit', 'Mexc', 0.75)]), now=2)) == [('update', 'A', 0.75)]
+    events = alerts.replace({'A'}, table([]), now=3) # Строка пропала из таблицы
+    assert [(event.kind, event.row['score']) for event in events] == [('exit', 0.75)]
+
+
+def test_filters_by_symbols_and_pairs():
+    alerts = Alerts('score')
+    queue = asyncio.Queue()
+    alerts.subscribe(queue, enter=0.5, symbols={'A'}, pairs={('Bybit', 'Mexc')})
+    rows = table([('A', 'Bybit', 'Mexc', 0.6), ('A', 'Mexc', 'Bybit', 0.6), ('B', 'Bybit', 'Mexc', 0.6)])
+    events = alerts.replace({'A', 'B'}, rows, now=0)
+    assert [event.key for event in events] == [('A', 'Bybit', 'Mexc')]
+    asyncio.run(deliver(events))
+    assert queue.get_nowait() is events[0]
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import Panels, ffill, simulate
+
+"""
+backtest.simulate: вход по entry, удержание между порогами, выход ниже exit, закрытие в конце периода, выплаты и комиссии.
+"""
+
+NOTIONAL = 1000.0
+
+
+def leg(steps, price=1.0, rate=0.0, times=None):
+    return {
+        'ask': np.full((steps, 1), price),
+        'bid': np.full((steps, 1), price),
+        'rate': np.full((steps, 1), rate),
+        'time': np.array(times if times is not None else [0.0] * steps, dtype=float)[:, None],
+    }
+
+
+def run(score, leg_1, leg_2, fee_1=0.0, fee_2=0.0, entry=0.1, exit=0.0, side=-1, funding_2=True):
+    score = np.array(score, dtype=float)[:, None]
+    return simulate(leg_1, leg_2, np.full(score.shape, side), score, NOTIONAL, fee_1, fee_2, entry, exit, funding_2=funding_2)
+
+
+def test_enters_at_entry_and_exits_below_exit():
+    trades, funding, price_pnl, fees, turnover = run([0.0, 0.2, 0.05, -0.1, 0.0], leg(5), leg(5))
+    assert trades == 1
+    assert price_pnl == 0
+    assert turnover == pytest.approx(4 * NOTIONAL) # Вход и выход обеих ног
+
+
+def test_no_entry_between_thresholds():
+    assert run([0.05, 0.09, 0.0], leg(3), leg(3))[0] == 0
+
+
+def test_reenters_after_exit():
+    assert run([0.2, -0.1, 0.2, -0.1], leg(4), leg(4))[0] == 2
+
+
+def test_open_position_is_closed_at_the_end():
+    trades, _, _, _, turnover = run([0.0, 0.2, 0.2], leg(3), leg(3))
+    assert trades == 1
+    assert turnover == pytest.approx(4 * NOTIONAL)
+
+
+def test_entry_prices_are_fixed_at_entry():
+    leg_1 = leg(4)
+    leg_1['ask'][:, 0] = leg_1['bid'][:, 0] = [1.0, 1.0, 0.9, 0.9] # SHORT фьючерса зарабатывает на падении
+    _, _, price_pnl, _, _ = run([0.0, 0.2, 0.2, -0.1], leg_1, leg(4))
+    assert price_pnl == pytest.approx(NOTIONAL * 0.1)
+
+
+def test_funding_counts_settlements_while_held():
+    # Выплата на шаге 2 (время следующей выплаты сдвинулось), позиция открыта на шаге 1: SHORT получает ставку, LONG хедж платит свою
+    leg_1 = leg(5, rate=0.001, times=[8, 8, 16, 16, 24])
+    leg_2 = leg(5, rate=0.0004, times=[8, 8, 16, 16, 24])
+    _, funding, _, _, _ = run([0.0, 0.2, 0.2, -0.1, 0.0], leg_1, leg_2)
+    assert funding == pytest.approx(NOTIONAL * (0.001 - 0.0004))
+    # Фьючерс + спот: у спота нет выплат
+    _, funding, _, _, _ = run([0.0, 0.2, 0.2, -0.1, 0.0], leg_1, leg_2, funding_2=False)
+    assert funding == pytest.approx(NOTIONAL * 0.001)
+
+
+def test_fees_on_entry_and_exit():
+    _, _, _, fees, _ = run([0.2, -0.1], leg(2), leg(2), fee_1=0.001, fee_2=0.002)
+    assert fees == pytest.approx(2 * NOTIONAL * (0.001 + 0.002))
+
+
+def test_panels_forward_fill_history():
+    history = pd.DataFrame({
+        'time': [0, 0, 60_000, 120_000],
+        'exchange': ['Bybit', 'Bybit', 'Bybit', 'Bybit'],
+        'market': ['futures'] * 4,
+        'symbol': ['A/USDT', 'B/USDT', 'A/USDT', 'B/USDT'],
+        'ask': [1.0, 2.0, 1.1, 2.2], 'bid': [1.0, 2.0, 1.1, 2.2],
+        'funding_rate': [0.001, np.nan, np.nan, 0.002],
+        'next_funding_time': [8.0, 8.0, 8.0, 16.0],
+    })
+    panels = Panels.from_history(history)
+    assert list(panels.times) == [0, 60_000, 120_000]
+    assert list(panels.symbols) == ['A/USDT', 'B/USDT']
+    rate = panels.data[('Bybit', 'futures')]['rate']
+    np.testing.assert_array_equal(rate, [[0.001, np.nan], [0.001, np.nan], [0.001, 0.002]])
+    np.testing.assert_array_equal(ffill(np.array([[np.nan], [1.0], [np.nan]])), [[np.nan], [1.0], [1.0]])
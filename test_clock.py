@@ -0,0 +1,62 @@
+from email.utils import formatdate
+
+import numpy as np
+import pytest
+
+from clock import HOUR, INTERVALS, ServerClock, learn_intervals
+
+"""
+ServerClock: границы сдвига часов по заголовку Date и их сужение; learn_intervals: только интервалы из INTERVALS.
+"""
+
+
+def date(seconds):
+    return formatdate(seconds, usegmt=True)
+
+
+def test_single_response_bounds_offset():
+    clock = ServerClock()
+    # Запрос отправлен в 100.2 с, ответ получен в 100.4 с, Date биржи 102 (округлён до секунды): сдвиг в [1.6 с, 2.8 с]
+    clock.observe('host', date(102), 100.2, 100.4)
+    low, high = clock.bounds['host']
+    assert (low, high) == pytest.approx((1600, 2800))
+    assert clock.offset('host') == pytest.approx(2200)
+
+
+def test_bounds_narrow_with_more_responses():
+    clock = ServerClock()
+    clock.observe('host', date(102), 100.2, 100.4) # [1600, 2800]
+    clock.observe('host', date(103), 100.9, 101.1) # [1900, 3100]
+    assert clock.bounds['host'] == pytest.approx((1900, 2800))
+
+
+def test_disjoint_bounds_restart_estimate():
+    clock = ServerClock()
+    clock.observe('host', date(102), 100.2, 100.4)
+    clock.observe('host', date(200), 100.5, 100.6) # Часы переведены: интервалы не пересекаются
+    assert clock.bounds['host'] == pytest.approx((99400, 100500))
+
+
+def test_missing_or_broken_date_is_ignored():
+    clock = ServerClock()
+    clock.observe('host', None, 0, 1)
+    clock.observe('host', 'not a date', 0, 1)
+    assert clock.bounds == {}
+    assert clock.offset('host') == 0.0
+
+
+def test_unknown_host_uses_median_offset():
+    clock = ServerClock()
+    for host, skew in (('a', 1), ('b', 5), ('c', 100)):
+        clock.observe(host, date(1000 + skew), 1000.0, 1000.0)
+    assert clock.offset('unknown') == pytest.approx(5500)
+    assert 'a +1500' in clock.report()
+
+
+def test_learn_intervals_accepts_only_known_intervals():
+    previous = np.array([0, 0, 0, 0, 0, 0, np.nan, 8 * HOUR]) * 1.0
+    current = np.array([HOUR, 4 * HOUR, 8 * HOUR + 20_000, 16 * HOUR, 24 * HOUR, 3 * HOUR, 8 * HOUR, 8 * HOUR])
+    learned = learn_intervals(previous, current)
+    np.testing.assert_array_equal(learned[:3], [HOUR, 4 * HOUR, 8 * HOUR]) # Время выплаты может дрожать на секунды
+    assert np.isnan(learned[3:]).all() # Пропуск выплат, 3 ч, неизвестное прошлое время, без смены
+    assert 16 * HOUR not in INTERVALS
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from decoder import RowsDecoder, loads
+from exchanges import Bybit
+
+pytest.importorskip("msgspec")
+
+"""
+RowsDecoder: числа в строках, отсутствующие и null поля, ответ не по схеме (разбор через loads).
+"""
+
+FIELDS = {'symbol': 'symbol', 'ask': 'ask1Price', 'bid': 'bid1Price', 'funding_rate': 'fundingRate', 'next_funding_time': None}
+
+
+def payload(rows):
+    return json.dumps({"result": {"list": rows}}).encode()
+
+
+def test_decodes_only_requested_fields_as_numbers():
+    decoder = RowsDecoder('result.list', FIELDS)
+    assert decoder.fields == ['symbol', 'ask', 'bid', 'funding_rate']
+    records = decoder.decode(payload([{"symbol": "AUSDT", "ask1Price": "1.01", "bid1Price": 1, "fundingRate": "0.0001", "volume24h": "5"}]))
+    assert [(record.symbol, record.ask, record.bid, record.funding_rate) for record in records] == [("AUSDT", 1.01, 1.0, 0.0001)]
+    assert not hasattr(records[0], 'volume24h')
+
+
+def test_missing_and_null_fields_become_none():
+    decoder = RowsDecoder('result.list', FIELDS)
+    records = decoder.decode(payload([
+        {"symbol": "AUSDT", "ask1Price": "1.01", "bid1Price": "1.0"},
+        {"symbol": "BUSDT", "ask1Price": None, "bid1Price": "2.0", "fundingRate": "0.0002"},
+        {"ask1Price": "3.0", "bid1Price": "2.9", "fundingRate": "0.0003"},
+    ]))
+    assert [(record.symbol, record.ask, record.funding_rate) for record in records] == [("AUSDT", 1.01, None), ("BUSDT", None, 0.0002),
+                                                                                         (None, 3.0, 0.0003)]
+
+
+def test_rows_with_missing_fields_are_dropped_by_the_adapter():
+    exchange = Bybit(spot=False)
+    exchange.set_listings('futures', {'DAUSDT': 'DA/USDT', 'DBUSDT': 'DB/USDT'})
+    endpoint = exchange.tickers[0]
+    records = endpoint.decoder.decode(payload([
+        {"symbol": "DAUSDT", "ask1Price": "1.01", "bid1Price": "1.0", "fundingRate": "0.0001", "nextFundingTime": "1700000000000"},
+        {"symbol": "DBUSDT", "ask1Price": "2.0", "bid1Price": None, "fundingRate": "0.0002", "nextFundingTime": "1700000000000"},
+    ]))
+    exchange.parse_records(endpoint, records)
+    assert exchange.symbols_prices['DA/USDT'] == {'ask': 1.01, 'bid': 1.0}
+    assert 'DB/USDT' not in exchange.symbols_prices
+    assert 'DB/USDT' not in exchange.funding_rates
+
+
+def test_payload_outside_schema_falls_back_to_loads():
+    decoder = RowsDecoder('result.list', FIELDS)
+    content = payload([{"symbol": "AUSDT", "ask1Price": "", "bid1Price": "1.0"}]) # Пустая строка вместо цены
+    assert decoder.decode(content) is None
+    assert loads(content)['result']['list'][0]['ask1Price'] == ""
+
+
+def test_top_level_list():
+    decoder = RowsDecoder('', {'symbol': 'symbol', 'ask': 'askPrice', 'bid': 'bidPrice'})
+    records = decoder.decode(b'[{"symbol": "AUSDT", "askPrice": "1.5", "bidPrice": "1.4"}]')
+    assert (records[0].symbol, records[0].ask, records[0].bid) == ("AUSDT", 1.5, 1.4)
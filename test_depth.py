@@ -0,0 +1,59 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+
+import root
+import root_futures_spot
+from exchanges import Bybit, Kucoin
+
+"""
+apply_depth обоих скриптов: стаканы пересчитывают только первые candidates строк, остальные строки
+остаются в таблице с ценами лучшего уровня (depth=False), таблица пересортирована.
+"""
+
+
+class Books:
+    """Стаканы с одной ценой исполнения на сторону: продажа по 0.9, покупка по 1.1"""
+    def __init__(self) -> None:
+        self.legs = []
+
+    async def fetch(self, legs):
+        self.legs += legs
+
+    def price(self, exchange, market, symbol, side):
+        return 0.9 if side == 'sell' else 1.1
+
+
+def futures_table():
+    rows = [('DA/USDT', 0.5), ('DB/USDT', 0.4), ('DC/USDT', 0.3)]
+    dataFrame = pd.DataFrame({
+        'symbol': [symbol for symbol, _ in rows], 'main_exchange': 'Bybit', 'route_1': 'SHORT', 'hadge_exchange': 'Kucoin', 'route_2': 'LONG',
+        'rate_1(%)': [rate for _, rate in rows], 'rate_2(%)': 0.0, 'price_1': 1.0, 'price_2': 1.0, 'price_difference(%)': 0.0, 'fee(%)': 0.0,
+        'time_1': np.nan, 'time_2': np.nan, 'interval_1(h)': 8.0, 'interval_2(h)': 8.0,
+    })
+    return root.score_table(dataFrame)
+
+
+def test_futures_depth_keeps_rows_past_candidates():
+    books = Books()
+    table = asyncio.run(root.apply_depth(futures_table(), [Bybit(spot=False), Kucoin(spot=False)], books, candidates=1))
+    assert len(table) == 3
+    assert len(books.legs) == 2 # Стаканы только для обеих ног первой строки
+    assert list(table['symbol']) == ['DB/USDT', 'DC/USDT', 'DA/USDT'] # DA после стакана: 0.5 + (100 - 1.1 / 0.9 * 100)
+    assert list(table['depth']) == [False, False, True]
+    assert table.loc[table['symbol'] == 'DB/USDT', 'price_1'].item() == 1.0
+
+
+def test_spot_depth_keeps_rows_past_candidates():
+    dataFrame = pd.DataFrame({
+        'exchange_f': 'Bybit', 'symbol_f': ['SA/USDT', 'SB/USDT'], 'price_f': 1.0, 'funding_rate %': [0.5, 0.4],
+        'exchange_s': 'Kucoin', 'symbol_s': ['SA/USDT', 'SB/USDT'], 'price_s': 0.99, 'fee(%)': 0.0, 'time_f': np.nan, 'interval_f(h)': 8.0,
+    })
+    dataFrame = root_futures_spot.score_table(dataFrame)
+    table = asyncio.run(root_futures_spot.apply_depth(dataFrame, [Bybit(), Kucoin()], Books(), candidates=1))
+    # Без horizon таблица спота сортируется по ставке: порядок тот же, % первой строки пересчитан по стакану
+    assert list(table['symbol_f']) == ['SA/USDT', 'SB/USDT']
+    assert list(table['depth']) == [True, False]
+    assert table['price_f'].tolist() == [0.9, 1.0]
+    assert table['%'].tolist() == [0.5 + 100 - 1.1 / 0.9 * 100, 0.4 + 1.0]
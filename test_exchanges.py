@@ -0,0 +1,75 @@
+import asyncio
+import json
+
+from exchanges import Bingx, Kucoin
+from metadata_cache import MetadataCache
+
+"""
+ExchangeAdapter: запрос, который одновременно список символов и тикеры (Kucoin contracts/active), скачивается один раз за цикл;
+requires_quote отбрасывает ставки символов без цены, но не время выплаты.
+"""
+
+CONTRACTS = "https://api-futures.kucoin.com/api/v1/contracts/active"
+TICKERS = "https://api-futures.kucoin.com/api/v1/allTickers"
+PAYLOADS = {
+    CONTRACTS: {'data': [{'symbol': 'KAUSDTM', 'baseCurrency': 'KA', 'quoteCurrency': 'USDT', 'multiplier': 1.0,
+                          'fundingFeeRate': 0.0001, 'nextFundingRateTime': 3_600_000, 'fundingRateGranularity': 28_800_000}]},
+    TICKERS: {'data': [{'symbol': 'KAUSDTM', 'bestAskPrice': '1.01', 'bestBidPrice': '1.0'}]},
+}
+
+
+class Response:
+    def __init__(self, url) -> None:
+        self.content = json.dumps(PAYLOADS[url]).encode()
+
+
+def counting(exchange):
+    """Подменяет запросы к бирже ответами PAYLOADS и записывает url запросов"""
+    calls = []
+
+    async def request(request):
+        calls.append(request.url)
+        await asyncio.sleep(0.01) # Запрос ещё идёт, когда его ждёт второй узел
+        return Response(request.url)
+    exchange.request = request
+    return calls
+
+
+def test_cold_cycle_downloads_contracts_once():
+    kucoin = Kucoin(spot=False)
+    calls = counting(kucoin)
+    asyncio.run(kucoin.main__get_symbols())
+    assert sorted(calls) == [TICKERS, CONTRACTS]
+    assert kucoin.primary_data == {'KAUSDTM': 'KA/USDT'}
+    assert kucoin.symbols_prices['KA/USDT']['ask'] == 1.01
+
+    calls.clear()
+    asyncio.run(kucoin.main__get_symbols()) # Следующий цикл не берёт ответ прошлого
+    assert sorted(calls) == [TICKERS, CONTRACTS]
+
+
+def test_cache_hit_shares_revalidation_request(tmp_path):
+    cache = MetadataCache(tmp_path / "metadata.sqlite")
+    kucoin = Kucoin(spot=False, metadata_cache=cache)
+    counting(kucoin)
+    asyncio.run(kucoin.main__get_symbols())
+
+    async def first_cycle(kucoin):
+        await kucoin.main__get_symbols()
+        await kucoin.revalidation
+
+    kucoin = Kucoin(spot=False, metadata_cache=cache)
+    calls = counting(kucoin)
+    asyncio.run(first_cycle(kucoin))
+    # Фоновое обновление списка символов и узел тикеров ждут одну загрузку contracts/active
+    assert sorted(calls) == [TICKERS, CONTRACTS]
+
+
+def test_requires_quote_masks_only_rate():
+    bingx = Bingx(spot=False)
+    bingx.set_listings('futures', {'BA-USDT': 'BA/USDT', 'BB-USDT': 'BB/USDT'})
+    bingx.symbols_prices['BA/USDT'] = {'ask': 1.0, 'bid': 0.99} # У BB/USDT цены нет
+    premium_index = bingx.tickers[1]
+    bingx.store_tickers(premium_index, [('BA-USDT', 0.0001, 1_700_000_000_000), ('BB-USDT', 0.0002, 1_700_000_000_000)])
+    assert dict(bingx.funding_rates) == {'BA/USDT': 0.0001}
+    assert bingx.rate_times['BA/USDT'] == bingx.rate_times['BB/USDT'] == 1_700_000_000_000
@@ -0,0 +1,60 @@
+from clock import HOUR
+from funding_cache import FundingScheduleCache
+
+"""
+FundingScheduleCache: попадания до выплаты, интервал по соседним выплатам и расчётное время fallback.
+"""
+
+
+def test_get_serves_time_until_settlement():
+    cache = FundingScheduleCache()
+    assert cache.get('Mexc', 'A/USDT', 0) is None
+    cache.set('Mexc', 'A/USDT', 8 * HOUR)
+    assert cache.get('Mexc', 'A/USDT', 8 * HOUR - 1) == 8 * HOUR
+    assert cache.get('Mexc', 'A/USDT', 8 * HOUR) is None # Выплата наступила
+    assert (cache.hits, cache.misses, cache.invalidations) == (1, 2, 1)
+
+
+def test_set_learns_interval_from_consecutive_settlements():
+    cache = FundingScheduleCache()
+    cache.set('Mexc', 'A/USDT', 8 * HOUR)
+    assert cache.interval('Mexc', 'A/USDT') is None
+    cache.set('Mexc', 'A/USDT', 12 * HOUR)
+    assert cache.interval('Mexc', 'A/USDT') == 4 * HOUR
+    cache.set('Mexc', 'A/USDT', 12 * HOUR) # То же время - интервал не меняется
+    assert cache.interval('Mexc', 'A/USDT') == 4 * HOUR
+
+
+def test_set_ignores_gaps_that_are_not_an_interval():
+    cache = FundingScheduleCache()
+    cache.set('Mexc', 'A/USDT', 0)
+    cache.set('Mexc', 'A/USDT', 8 * HOUR)
+    # Символ вернулся после двух пропущенных выплат: 24 ч - не интервал
+    cache.set('Mexc', 'A/USDT', 32 * HOUR)
+    assert cache.interval('Mexc', 'A/USDT') == 8 * HOUR
+
+    cache.set('Mexc', 'B/USDT', 0)
+    cache.set('Mexc', 'B/USDT', 16 * HOUR)
+    assert cache.interval('Mexc', 'B/USDT') is None
+
+
+def test_set_keeps_interval_from_response():
+    cache = FundingScheduleCache()
+    cache.set('Mexc', 'A/USDT', 0, 4 * HOUR)
+    cache.set('Mexc', 'A/USDT', 8 * HOUR, 4 * HOUR) # Ответ биржи важнее разницы выплат
+    assert cache.interval('Mexc', 'A/USDT') == 4 * HOUR
+
+
+def test_fallback_is_computed_once_per_settlement():
+    cache = FundingScheduleCache()
+    calls = []
+
+    def compute(value):
+        calls.append(value)
+        return value
+
+    assert cache.fallback('Mexc', 0, lambda: compute(8 * HOUR)) == 8 * HOUR
+    assert cache.fallback('Mexc', HOUR, lambda: compute(16 * HOUR)) == 8 * HOUR
+    assert cache.fallback('Mexc', 8 * HOUR, lambda: compute(16 * HOUR)) == 16 * HOUR
+    assert calls == [8 * HOUR, 16 * HOUR]
+    assert cache.get('Bybit', None, 0) is None # Расчётное время своё у каждой биржи
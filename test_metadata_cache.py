@@ -0,0 +1,63 @@
+import metadata_cache
+from clock import HOUR
+from exchanges import Bybit
+from metadata_cache import MetadataCache
+
+"""
+MetadataCache: первичные данные и интервалы выплат после перезапуска, недействительность при смене версии и по max_age.
+"""
+
+
+def listed():
+    exchange = Bybit()
+    exchange.set_listings('futures', {'MCAUSDT': 'MCA/USDT', '1000MCBUSDT': 'MCB/USDT'}, {'1000MCBUSDT': 1000})
+    exchange.set_listings('spot', {'MCAUSDT': 'MCA/USDT'})
+    exchange.contract_sizes['futures'] = {'MCAUSDT': 1.0}
+    exchange.funding_intervals['MCA/USDT'] = 4 * HOUR
+    return exchange
+
+
+def test_round_trip_restores_listings_and_intervals(tmp_path):
+    cache = MetadataCache(tmp_path / "metadata.sqlite")
+    cache.save(listed())
+
+    exchange = Bybit()
+    assert cache.load(exchange)
+    assert exchange.primary_data == {'MCAUSDT': 'MCA/USDT', '1000MCBUSDT': 'MCB/USDT'}
+    assert exchange.reverse_data_spot == {'MCA/USDT': 'MCAUSDT'}
+    assert exchange.multipliers['futures'] == {'1000MCBUSDT': 1000}
+    assert exchange.contract_sizes['futures'] == {'MCAUSDT': 1.0}
+    assert exchange.funding_intervals['MCA/USDT'] == 4 * HOUR
+    assert 'MCB/USDT' not in exchange.funding_intervals
+
+
+def test_version_change_invalidates(tmp_path, monkeypatch):
+    cache = MetadataCache(tmp_path / "metadata.sqlite")
+    cache.save(listed())
+    monkeypatch.setattr(metadata_cache, 'CACHE_VERSION', metadata_cache.CACHE_VERSION + 1)
+    exchange = Bybit()
+    assert not cache.load(exchange)
+    assert exchange.primary_data == {}
+
+    cache.save(listed()) # Запись новой версии заменяет старую
+    assert cache.load(Bybit())
+
+
+def test_instrument_requests_change_invalidates(tmp_path, monkeypatch):
+    cache = MetadataCache(tmp_path / "metadata.sqlite")
+    cache.save(listed())
+    monkeypatch.setattr(Bybit, 'instruments', Bybit.instruments[:1])
+    assert not cache.load(Bybit())
+
+
+def test_expired_and_spot_less_entries_are_not_used(tmp_path):
+    cache = MetadataCache(tmp_path / "metadata.sqlite", max_age=-1)
+    cache.save(listed())
+    assert not cache.load(Bybit())
+
+    cache = MetadataCache(tmp_path / "futures.sqlite")
+    exchange = Bybit(spot=False)
+    exchange.set_listings('futures', {'MCAUSDT': 'MCA/USDT'})
+    cache.save(exchange)
+    assert not cache.load(Bybit()) # Для спота записи без спота недостаточно
+    assert cache.load(Bybit(spot=False))
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from clock import HOUR
+from exchanges import Bybit, Kucoin
+from pairing import drop_denied, join_symbols, pair_futures
+from symbol_registry import symbol_registry
+
+"""
+Векторное построение пар pairing.py: self-join по коду символа, исключение пар DENY_FUTURES_PAIRS
+и порог ставки с приведением к одному интервалу выплат (interval=).
+"""
+
+
+def exchanges():
+    bybit, kucoin = Bybit(spot=False), Kucoin(spot=False)
+    bybit.set_listings('futures', {'PAAUSDT': 'PAA/USDT', 'PABUSDT': 'PAB/USDT'})
+    kucoin.set_listings('futures', {'PAAUSDTM': 'PAA/USDT'})
+    for exchange, rate, ask, bid, interval in ((bybit, 0.002, 1.01, 1.0, 8), (kucoin, 0.0006, 1.02, 1.015, 4)):
+        exchange.funding_rates['PAA/USDT'] = rate
+        exchange.symbols_prices['PAA/USDT'] = {'ask': ask, 'bid': bid}
+        exchange.funding_intervals['PAA/USDT'] = interval * HOUR
+        exchange.rate_times['PAA/USDT'] = 8 * HOUR
+    # Символ только одной биржи в пары не попадает
+    bybit.funding_rates['PAB/USDT'] = 0.01
+    bybit.symbols_prices['PAB/USDT'] = {'ask': 2.0, 'bid': 2.0}
+    return [bybit, kucoin]
+
+
+def test_join_symbols_pairs_rows_with_equal_codes():
+    codes = np.array([5, 3, 5, 7, 3])
+    left, right = join_symbols(codes, np.array([0, 1, 3]))
+    assert sorted(zip(left.tolist(), right.tolist())) == [(0, 0), (0, 2), (1, 1), (1, 4), (3, 3)]
+    left, right = join_symbols(codes, np.array([], dtype=int))
+    assert len(left) == len(right) == 0
+
+
+def test_pair_futures_builds_directions_prices_and_fees():
+    table = pair_futures(exchanges(), min_rate=0.1, scale=100)
+    assert len(table) == 1
+    row = table.iloc[0]
+    assert (row['symbol'], row['main_exchange'], row['route_1'], row['hadge_exchange'], row['route_2']) == ('PAA/USDT', 'Bybit', 'SHORT', 'Kucoin', 'LONG')
+    assert (row['price_1'], row['price_2']) == (1.0, 1.02) # SHORT продаёт по bid, хедж покупает по ask
+    assert row['price_difference(%)'] == pytest.approx(-2.0)
+    assert row['fee(%)'] == pytest.approx((Bybit.TAKER_FEE * 2 + Kucoin.TAKER_FEE * 2) * 100)
+    assert (row['rate_1(%)'], row['rate_2(%)']) == pytest.approx((0.2, 0.06))
+    assert (row['interval_1(h)'], row['interval_2(h)']) == (8, 4)
+
+
+def test_pair_futures_normalizes_threshold_to_interval():
+    # 0.06% раз в 4 ч - это 0.12% за 8 ч: выше порога 0.1% на 8-часовую выплату
+    table = pair_futures(exchanges(), min_rate=0.1, scale=100, interval=8)
+    assert sorted(zip(table['main_exchange'], table['hadge_exchange'])) == [('Bybit', 'Kucoin'), ('Kucoin', 'Bybit')]
+    # На 2-часовую выплату оба порога выше: 0.2% / 4 = 0.05%, 0.06% / 2 = 0.03%
+    assert pair_futures(exchanges(), min_rate=0.1, scale=100, interval=2).empty
+
+
+def test_pair_futures_uses_default_interval_when_unknown():
+    objects = exchanges()
+    del objects[1].funding_intervals['PAA/USDT'] # DEFAULT_INTERVAL 8 ч: порог не меняется
+    table = pair_futures(objects, min_rate=0.1, scale=100, interval=8)
+    assert list(table['main_exchange']) == ['Bybit']
+
+
+def test_drop_denied_removes_only_listed_direction(monkeypatch):
+    monkeypatch.setattr(symbol_registry, 'deny_futures_pairs', {('Bybit', 'Kucoin', 'PAA/USDT')})
+    table = pair_futures(exchanges(), min_rate=0.1, scale=100, interval=8)
+    assert list(zip(table['main_exchange'], table['hadge_exchange'])) == [('Kucoin', 'Bybit')]
+
+    objects = exchanges()
+    code = symbol_registry.symbols.ids['PAA/USDT']
+    codes, numbers = np.array([code, code, code + 1]), np.array([0, 1, 0])
+    left, right = drop_denied(objects, codes, numbers, np.array([0, 1, 2]), np.array([1, 0, 2]))
+    assert list(zip(left.tolist(), right.tolist())) == [(1, 0), (2, 2)]
@@ -0,0 +1,68 @@
+import math
+import random
+
+import pandas as pd
+
+from ranker import OpportunityRanker
+
+"""
+OpportunityRanker: замена строк символа, удаление и порядок top() совпадают с полной сортировкой таблицы.
+"""
+
+
+def table(rows):
+    return pd.DataFrame(rows, columns=['symbol', 'pair', 'score'])
+
+
+def full_sort(rows):
+    return table(rows).sort_values('score', ascending=False, kind='stable', na_position='last').reset_index(drop=True)
+
+
+def test_replace_keeps_descending_order():
+    ranker = OpportunityRanker('score', k=2)
+    ranker.replace({'A', 'B', 'C'}, table([('A', 'x', 0.1), ('B', 'x', 0.5), ('C', 'x', 0.3), ('A', 'y', 0.4)]))
+    assert list(ranker.top(len(ranker))['score']) == [0.5, 0.4, 0.3, 0.1]
+    assert list(ranker.top()['symbol']) == ['B', 'A'] # k по умолчанию
+    assert len(ranker) == 4
+
+
+def test_update_replaces_all_rows_of_symbol():
+    rows = [('A', 'x', 0.1), ('A', 'y', 0.4), ('B', 'x', 0.5), ('C', 'x', 0.3)]
+    ranker = OpportunityRanker('score')
+    ranker.replace({'A', 'B', 'C'}, table(rows))
+
+    # A пересчитан: одна пара осталась с новой оценкой, вторая пропала
+    ranker.replace({'A'}, table([('A', 'x', 0.9)]))
+    rows = [row for row in rows if row[0] != 'A'] + [('A', 'x', 0.9)]
+    pd.testing.assert_frame_equal(ranker.top(), full_sort(rows))
+
+
+def test_symbol_without_rows_is_removed():
+    ranker = OpportunityRanker('score')
+    ranker.replace({'A', 'B'}, table([('A', 'x', 0.1), ('B', 'x', 0.5)]))
+    ranker.replace({'B'}, table([]))
+    assert list(ranker.top()['symbol']) == ['A']
+    ranker.remove('A')
+    ranker.remove('missing')
+    assert len(ranker) == 0 and ranker.rows == {} and ranker.groups == {}
+
+
+def test_nan_scores_go_last_and_ties_keep_insertion_order():
+    ranker = OpportunityRanker('score')
+    ranker.replace({'A', 'B', 'C', 'D'}, table([('A', 'x', math.nan), ('B', 'x', 0.2), ('C', 'x', 0.2), ('D', 'x', 0.3)]))
+    assert list(ranker.top()['symbol']) == ['D', 'B', 'C', 'A']
+
+
+def test_many_updates_match_full_sort():
+    generator = random.Random(1)
+    current = {}
+    ranker = OpportunityRanker('score')
+    for _ in range(200):
+        symbols = {f"S{generator.randrange(30)}" for _ in range(generator.randrange(1, 5))}
+        rows = [(symbol, pair, round(generator.uniform(-1, 1), 3)) for symbol in symbols for pair in 'xy' if generator.random() < 0.7]
+        ranker.replace(symbols, table(rows))
+        for symbol in symbols:
+            current[symbol] = [row for row in rows if row[0] == symbol]
+    expected = full_sort([row for rows in current.values() for row in rows])
+    assert list(ranker.top()['score']) == list(expected['score'])
+    assert sorted(map(tuple, ranker.top().values.tolist())) == sorted(map(tuple, expected.values.tolist()))
@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from http_client import ClientManager
+from mock_exchange import MockExchange
+from rate_limit import RequestScheduler, TokenBucket
+
+"""
+RequestScheduler и TokenBucket против MockExchange, который, как биржа, отвечает 429 при превышении лимита.
+"""
+
+
+async def send_all(server, scheduler, count):
+    manager = ClientManager(http2=False, scheduler=scheduler)
+    try:
+        responses = await asyncio.gather(*(manager.get(f"{server.base_url}/api/v1/contract/funding_rate/S{i}") for i in range(count)))
+    finally:
+        await manager.close()
+    return [response.status_code for response in responses]
+
+
+async def limited(server_options, scheduler_options, count):
+    server = MockExchange(routes={"/api/v1/contract/funding_rate": {"data": {}}}, **server_options)
+    await server.start()
+    try:
+        scheduler = RequestScheduler(**scheduler_options(server.base_url.split("//")[1]))
+        return await send_all(server, scheduler, count), server, scheduler
+    finally:
+        await server.stop()
+
+
+def test_bucket_stays_within_host_limit():
+    # Мок пропускает 25 запросов за 0.5 с. Запас 5 + пополнение 40/с за 0.5 с - ровно 25
+    statuses, server, scheduler = asyncio.run(limited({'rate_limit': (25, 0.5)}, lambda host: {'limits': {host: (40, 5, 10)}}, 60))
+    assert statuses == [200] * 60
+    assert server.rejected == 0
+    assert scheduler.retried == 0
+
+
+def test_bucket_grants_no_more_than_capacity_plus_refill():
+    async def acquire_all():
+        bucket = TokenBucket(rate=50, capacity=5)
+        granted = []
+        async def acquire():
+            await bucket.acquire()
+            granted.append(time.monotonic())
+        await asyncio.gather(*(acquire() for _ in range(30)))
+        return granted
+
+    granted = sorted(asyncio.run(acquire_all()))
+    for index, started in enumerate(granted):
+        window = [moment for moment in granted[index:] if moment - started <= 0.1]
+        assert len(window) <= 5 + 50 * 0.1 + 1 # +1 - токен, пополненный на границе окна
+    assert granted[-1] - granted[0] >= (30 - 5) / 50 * 0.9
+
+
+def test_429_pauses_host_and_retries():
+    # Без лимита в планировщике мок отвечает 429 с Retry-After, повтор получает ответ после паузы хоста
+    statuses, server, scheduler = asyncio.run(limited({'rate_limit': (4, 0.3)}, lambda host: {'limits': {}, 'retries': 5, 'backoff': 0.05}, 8))
+    assert statuses == [200] * 8
+    assert server.rejected > 0
+    assert scheduler.throttled == server.rejected
+
+
+def test_5xx_is_retried_with_backoff():
+    statuses, server, scheduler = asyncio.run(limited({'errors': 0.3, 'seed': 1}, lambda host: {'limits': {}, 'retries': 6, 'backoff': 0.01}, 20))
+    assert statuses == [200] * 20
+    assert server.failed > 0
+    assert scheduler.retried == server.failed
+
+    scheduler = RequestScheduler(backoff=0.1, max_backoff=0.5)
+    delays = [scheduler.delay(attempt) for attempt in range(5)]
+    assert delays[0] == pytest.approx(0.1, rel=0.2)
+    assert delays[2] == pytest.approx(0.4, rel=0.2)
+    assert max(delays) <= 0.5 * 1.2
+    assert scheduler.delay(0, httpx.Response(429, headers={'Retry-After': '0.25'})) == 0.25
+
+
+def test_transport_error_is_retried_then_raised():
+    attempts = []
+
+    async def send():
+        attempts.append(time.monotonic())
+        raise httpx.ConnectError("connection refused")
+
+    scheduler = RequestScheduler(limits={}, retries=3, backoff=0.02)
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(scheduler.request("example.com", send))
+    assert len(attempts) == 4
+    assert scheduler.retried == 3
+    pauses = [later - earlier for earlier, later in zip(attempts, attempts[1:])]
+    assert pauses[2] > pauses[0] # Экспоненциальная задержка
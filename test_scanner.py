@@ -0,0 +1,48 @@
+import asyncio
+
+import pandas as pd
+
+from exchanges import Bybit
+from scanner import Scanner
+from streaming import BybitStream
+
+"""
+Регрессия непрерывного режима с --stream: fetch ничего не запрашивает, а тикеры WebSocket приходят,
+пока Scanner._poll спит между опросами. Такие изменения должны попасть в пересчёт таблицы.
+"""
+
+
+async def idle(exchange):
+    pass
+
+
+def build_table(exchanges, symbols):
+    return pd.DataFrame({'symbol': sorted(symbols), 'score': 1.0})
+
+
+async def _stream_scenario():
+    exchange = Bybit(spot=False)
+    exchange.set_listings('futures', {'STREAMUSDT': 'STREAM/USDT'})
+    stream = BybitStream(exchange)
+    published = []
+    scanner = Scanner([exchange], idle, build_table, 'symbol', 'score', published.append, default_interval=0.02)
+    tasks = [asyncio.create_task(scanner._poll(exchange)), asyncio.create_task(scanner._recompute_loop())]
+    try:
+        await asyncio.sleep(0.05) # Несколько опросов без изменений
+        assert published == []
+        for update in range(10):
+            stream.update_quote('STREAMUSDT', 1.01 + update, 1.0 + update)
+            stream.update_funding('STREAMUSDT', rate=0.001 * (update + 1))
+            await asyncio.sleep(0.03)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return scanner, published
+
+
+def test_stream_updates_between_polls_are_rescored():
+    scanner, published = asyncio.run(_stream_scenario())
+    assert len(published) >= 5
+    assert list(published[-1]['symbol']) == ['STREAM/USDT']
+    assert scanner.dirty == set()
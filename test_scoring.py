@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from clock import HOUR
+from scoring import YEAR, annualized_score, opportunity_score, settlements
+
+"""
+opportunity_score против формулы result(%) исходного root.py (вложенный np.where над DataFrame) и % root_futures_spot.py.
+"""
+
+
+def baseline_result(dataFrame):
+    """result(%) исходного root.py"""
+    result = np.where(
+        (dataFrame['time_1'] == dataFrame['time_2']) |
+        (pd.isna(dataFrame['time_1']) | pd.isna(dataFrame['time_2'])),
+        np.where(
+            (dataFrame['rate_1(%)'] > 0) & (dataFrame['rate_2(%)'] > 0),
+            dataFrame['rate_1(%)'] - dataFrame['rate_2(%)'],
+            np.where(
+                (dataFrame['rate_1(%)'] < 0) & (dataFrame['rate_2(%)'] < 0),
+                abs(dataFrame['rate_1(%)']) - abs(dataFrame['rate_2(%)']),
+                np.where(
+                    (dataFrame['rate_1(%)'] > 0) & (dataFrame['rate_2(%)'] < 0),
+                    abs(dataFrame['rate_1(%)']) + abs(dataFrame['rate_2(%)']),
+                    np.where(
+                        (dataFrame['rate_1(%)'] < 0) & (dataFrame['rate_2(%)'] > 0),
+                        abs(dataFrame['rate_1(%)']) + abs(dataFrame['rate_2(%)']),
+                        abs(dataFrame['rate_1(%)'])
+                    )
+                )
+            )
+        ),
+        abs(dataFrame['rate_1(%)'])
+    )
+    return result + dataFrame['price_difference(%)'] - dataFrame['fee(%)']
+
+
+def random_pairs(count=2000, seed=0):
+    random = np.random.default_rng(seed)
+    rates = np.array([-0.3, -0.05, 0.0, 0.05, 0.3])
+    times = np.array([8 * HOUR, 16 * HOUR, np.nan])
+    return pd.DataFrame({
+        'rate_1(%)': np.where(random.random(count) < 0.2, random.choice(rates, count), random.normal(0, 0.2, count)),
+        'rate_2(%)': np.where(random.random(count) < 0.2, random.choice(rates, count), random.normal(0, 0.2, count)),
+        'price_difference(%)': random.normal(0, 0.5, count),
+        'fee(%)': random.choice([0.0, 0.24, 0.4], count),
+        'time_1': random.choice(times, count),
+        'time_2': random.choice(times, count),
+    })
+
+
+def test_futures_score_matches_baseline():
+    pairs = random_pairs()
+    score = opportunity_score(pairs['rate_1(%)'].to_numpy(), pairs['price_difference(%)'].to_numpy(), pairs['fee(%)'].to_numpy(),
+                              rate_2=pairs['rate_2(%)'].to_numpy(), time_1=pairs['time_1'].to_numpy(), time_2=pairs['time_2'].to_numpy())
+    np.testing.assert_allclose(score, baseline_result(pairs), rtol=0, atol=1e-12)
+
+
+def test_hedge_rate_counts_only_on_same_settlement():
+    score = opportunity_score([0.3, 0.3, 0.3, -0.3], 0.0, 0.0, rate_2=[0.1, 0.1, -0.1, 0.1],
+                              time_1=[8 * HOUR, 8 * HOUR, np.nan, 8 * HOUR], time_2=[8 * HOUR, 16 * HOUR, 16 * HOUR, 8 * HOUR])
+    np.testing.assert_allclose(score, [0.2, 0.3, 0.4, 0.4])
+
+
+def test_spot_score_is_signed_rate_plus_difference_minus_fee():
+    score = opportunity_score([0.3, -0.2], [0.1, -0.05], 0.24)
+    np.testing.assert_allclose(score, [0.3 + 0.1 - 0.24, -0.2 - 0.05 - 0.24])
+
+
+def test_score_writes_into_out():
+    out = np.empty(2)
+    result = opportunity_score([0.3, 0.1], [0.0, 0.0], 0.0, rate_2=[0.1, 0.1], out=out)
+    assert result is out
+    np.testing.assert_allclose(out, [0.2, 0.0])
+
+
+def test_settlements_within_horizon():
+    now = 0
+    # Выплата через 1 ч и каждые 8 ч: за 24 ч - в 1, 9 и 17 ч
+    assert settlements(8, time=1 * HOUR, now=now) == 3
+    assert settlements(8, time=30 * HOUR, now=now) == 0
+    # Время неизвестно или уже прошло - равномерно horizon / interval
+    np.testing.assert_allclose(settlements([4, np.nan], time=[np.nan, -HOUR], now=now), [6, 3])
+
+
+def test_annualized_score_compares_intervals():
+    # 0.1% раз в 4 ч против хеджа 0.1% раз в 8 ч: за 24 ч 6 выплат против 3
+    score = annualized_score(np.array([0.1]), 0.0, 0.0, [4], rate_2=[0.1], interval_2=[8], horizon=24)
+    assert score == pytest.approx([(0.6 - 0.3) * YEAR / 24])
+    spot = annualized_score(np.array([0.1]), 0.05, 0.2, [8], horizon=24)
+    assert spot == pytest.approx([(0.3 + 0.05 - 0.2) * YEAR / 24])
@@ -0,0 +1,45 @@
+import pytest
+
+from exchanges import Bybit, Mexc
+from settlement import SettlementCalendar
+
+"""
+SettlementCalendar: символы с близкой выплатой и интервал опроса биржи по ближайшей выплате на любой бирже.
+"""
+
+MINUTE = 60_000
+NOW = 1_700_000_000_000
+
+
+def exchanges():
+    bybit, mexc = Bybit(), Mexc()
+    for exchange in (bybit, mexc):
+        exchange.set_listings('futures', {f'SA{exchange.name}': 'SA/USDT', f'SB{exchange.name}': 'SB/USDT'})
+        exchange.symbols_prices['SA/USDT'] = exchange.symbols_prices['SB/USDT'] = {'ask': 1.0, 'bid': 1.0}
+    bybit.rate_times['SA/USDT'] = NOW + 5 * MINUTE
+    bybit.rate_times['SB/USDT'] = NOW - MINUTE # Прошедшая выплата не учитывается
+    mexc.rate_times['SB/USDT'] = NOW + 60 * MINUTE
+    return bybit, mexc
+
+
+def test_upcoming_symbols_within_window():
+    calendar = SettlementCalendar(window=10 * 60)
+    objects = exchanges()
+    assert {'SA/USDT', 'SB/USDT'} & calendar.upcoming(objects, NOW) == {'SA/USDT'}
+    assert {'SA/USDT', 'SB/USDT'} & calendar.upcoming(objects, NOW + 55 * MINUTE) == {'SB/USDT'}
+
+
+def test_interval_fast_near_settlement_and_slow_otherwise():
+    calendar = SettlementCalendar(window=10 * 60, fast=0.5, slow=30.0)
+    bybit, mexc = exchanges()
+    # У обеих бирж есть SA/USDT с выплатой на Bybit через 5 минут: выплата на любой бирже ускоряет опрос
+    assert calendar.interval(mexc, [bybit, mexc], NOW) == 0.5
+    del bybit.rate_times['SA/USDT']
+    # Ближайшая выплата через 60 минут: окно начнётся через 50 минут, но ждать не дольше slow
+    assert calendar.interval(mexc, [bybit, mexc], NOW) == 30.0
+    assert calendar.interval(mexc, [bybit, mexc], NOW + 49.8 * MINUTE) == pytest.approx(12.0)
+
+
+def test_report_counts_symbols_within_window():
+    calendar = SettlementCalendar(window=10 * 60)
+    assert calendar.report(exchanges(), NOW).startswith("next settlement in 5.0 min")
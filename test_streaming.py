@@ -0,0 +1,164 @@
+import asyncio
+import gzip
+import json
+import time
+
+import pytest
+
+from exchanges import Bingx, Bybit, Kucoin, Mexc
+from http_client import client_manager
+from mock_exchange import MockExchange, MockStream
+from streaming import (BingxSpotStream, BingxStream, BybitSpotStream, BybitStream, KucoinSpotStream, KucoinStream,
+                       MexcStream)
+
+pytest.importorskip("websockets")
+
+"""
+Потоки streaming.py против mock_exchange.MockStream: разбор кадров каждой биржи в MarketStore,
+переподключение с повторной подпиской и догрузкой через REST после обрыва, отбрасывание устаревших сообщений.
+REST запросы догрузки уходят в MockExchange (client_manager.redirect), как при --replay.
+"""
+
+
+async def until(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "условие не выполнилось"
+        await asyncio.sleep(0.01)
+
+
+async def run_stream(stream_class, exchange, frames, condition, **options):
+    """Запускает поток против MockStream с кадрами frames, пока не выполнится condition(stream, server)"""
+    server = MockStream(frames, **options)
+    rest = MockExchange(routes={"/api.bybit.com/v5/market/tickers": {"result": {"list": []}}})
+    await server.start()
+    await rest.start()
+    client_manager.redirect = rest.base_url
+    stream = stream_class(exchange, url=server.url, reconnect_delay=0.01)
+    task = asyncio.create_task(stream.run())
+    try:
+        await until(lambda: condition(stream, server))
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        client_manager.redirect = None
+        await client_manager.close()
+        await server.stop()
+        await rest.stop()
+    return stream, server, rest
+
+
+def bybit():
+    exchange = Bybit()
+    exchange.set_listings('futures', {'WSAUSDT': 'WSA/USDT', '1000WSBUSDT': 'WSB/USDT'}, {'1000WSBUSDT': 1000})
+    exchange.set_listings('spot', {'WSAUSDT': 'WSA/USDT'})
+    return exchange
+
+
+def test_bybit_parses_tickers_and_funding():
+    exchange = bybit()
+    frames = [
+        {"success": True, "op": "subscribe"},
+        {"topic": "tickers.WSAUSDT", "ts": 1000, "data": {"symbol": "WSAUSDT", "ask1Price": "1.01", "bid1Price": "1.00",
+                                                          "fundingRate": "0.0005", "nextFundingTime": "1700000000000"}},
+        {"topic": "tickers.1000WSBUSDT", "ts": 1000, "data": {"symbol": "1000WSBUSDT", "ask1Price": "2.2", "bid1Price": "2.0"}},
+        {"topic": "tickers.WSAUSDT", "ts": 1100, "data": {"symbol": "WSAUSDT", "bid1Price": "1.005"}}, # Дельта без ask
+    ]
+    stream, server, _ = asyncio.run(run_stream(BybitStream, exchange, frames, lambda stream, server: stream.messages == len(frames)))
+
+    assert exchange.symbols_prices['WSA/USDT'] == {'ask': 1.01, 'bid': 1.005}
+    assert exchange.symbols_prices['WSB/USDT'] == pytest.approx({'ask': 0.0022, 'bid': 0.002}) # Цена за 1000 монет
+    assert exchange.funding_rates['WSA/USDT'] == 0.0005
+    assert exchange.rate_times['WSA/USDT'] == 1700000000000
+    subscriptions = [json.loads(message) for message in server.received[0]]
+    assert {"op": "subscribe", "args": ["tickers.WSAUSDT", "tickers.1000WSBUSDT"]} in subscriptions
+
+
+def test_bybit_spot_parses_orderbook():
+    exchange = bybit()
+    frames = [{"topic": "orderbook.1.WSAUSDT", "ts": 1000, "data": {"s": "WSAUSDT", "a": [["1.02", "5"]], "b": [["0.99", "7"]]}}]
+    asyncio.run(run_stream(BybitSpotStream, exchange, frames, lambda stream, server: stream.messages == len(frames)))
+    assert exchange.symbols_prices_spot['WSA/USDT'] == {'ask': 1.02, 'bid': 0.99}
+    assert 'WSA/USDT' not in exchange.symbols_prices
+
+
+def test_mexc_parses_tickers_and_funding_rate():
+    exchange = Mexc(spot=False)
+    exchange.set_listings('futures', {'WSA_USDT': 'WSA/USDT'})
+    frames = [
+        {"channel": "push.tickers", "ts": 1000, "data": [{"symbol": "WSA_USDT", "ask1": 1.01, "bid1": 1.0, "fundingRate": 0.0001}]},
+        {"channel": "push.funding.rate", "ts": 1001, "data": {"symbol": "WSA_USDT", "rate": 0.0002, "nextSettleTime": 1700000000000}},
+    ]
+    asyncio.run(run_stream(MexcStream, exchange, frames, lambda stream, server: stream.messages == len(frames)))
+    assert exchange.symbols_prices['WSA/USDT'] == {'ask': 1.01, 'bid': 1.0}
+    assert exchange.funding_rates['WSA/USDT'] == 0.0002
+    assert exchange.rate_times['WSA/USDT'] == 1700000000000
+
+
+def test_bingx_parses_gzip_frames_and_answers_ping():
+    exchange = Bingx()
+    exchange.set_listings('futures', {'WSA-USDT': 'WSA/USDT'})
+    exchange.set_listings('spot', {'WSA-USDT': 'WSA/USDT'})
+    frames = [
+        gzip.compress(b"Ping"),
+        gzip.compress(json.dumps({"dataType": "WSA-USDT@bookTicker", "data": {"E": 1000, "a": "1.01", "b": "1.0"}}).encode()),
+    ]
+    _, server, _ = asyncio.run(run_stream(BingxStream, exchange, frames, lambda stream, server: stream.messages == len(frames)))
+    assert exchange.symbols_prices['WSA/USDT'] == {'ask': 1.01, 'bid': 1.0}
+    assert 'Pong' in server.received[0]
+
+    asyncio.run(run_stream(BingxSpotStream, exchange, frames[1:], lambda stream, server: stream.messages == 1))
+    assert exchange.symbols_prices_spot['WSA/USDT'] == {'ask': 1.01, 'bid': 1.0}
+
+
+def test_kucoin_parses_ticker_and_funding():
+    exchange = Kucoin()
+    exchange.set_listings('futures', {'WSAUSDTM': 'WSA/USDT'})
+    exchange.set_listings('spot', {'WSA-USDT': 'WSA/USDT'})
+    frames = [
+        {"type": "welcome"},
+        {"type": "message", "topic": "/contractMarket/tickerV2:WSAUSDTM",
+         "data": {"symbol": "WSAUSDTM", "bestAskPrice": "1.01", "bestBidPrice": "1.0", "ts": 1000000000}},
+        {"type": "message", "topic": "/contract/instrument:WSAUSDTM", "subject": "funding.rate", "data": {"fundingRate": 0.0003, "timestamp": 1000}},
+    ]
+    asyncio.run(run_stream(KucoinStream, exchange, frames, lambda stream, server: stream.messages == len(frames)))
+    assert exchange.symbols_prices['WSA/USDT'] == {'ask': 1.01, 'bid': 1.0}
+    assert exchange.funding_rates['WSA/USDT'] == 0.0003
+
+    frames = [{"type": "message", "topic": "/market/ticker:WSA-USDT", "data": {"bestAsk": "1.02", "bestBid": "0.99", "time": 1000}}]
+    asyncio.run(run_stream(KucoinSpotStream, exchange, frames, lambda stream, server: stream.messages == len(frames)))
+    assert exchange.symbols_prices_spot['WSA/USDT'] == {'ask': 1.02, 'bid': 0.99}
+
+
+def test_reconnects_resubscribes_and_backfills_after_drop():
+    exchange = Bybit(spot=False)
+    exchange.set_listings('futures', {'WSAUSDT': 'WSA/USDT'})
+    frames = [
+        {"topic": "tickers.WSAUSDT", "ts": 1000, "data": {"symbol": "WSAUSDT", "ask1Price": "1.01", "bid1Price": "1.0"}},
+        {"topic": "tickers.WSAUSDT", "ts": 2000, "data": {"symbol": "WSAUSDT", "ask1Price": "1.03", "bid1Price": "1.02"}},
+    ]
+    # Первое соединение обрывается после первого кадра, второе получает оба. Пауза между кадрами - время на подписку и догрузку
+    stream, server, rest = asyncio.run(run_stream(BybitStream, exchange, frames, lambda stream, server: stream.messages == 3,
+                                                  interval=0.2, drop_after=1))
+
+    assert server.connections == 2
+    assert stream.reconnects >= 1
+    assert [json.loads(message) for message in server.received[1]] == [{"op": "subscribe", "args": ["tickers.WSAUSDT"]}]
+    assert rest.requests == 2 # Догрузка тикеров через REST после каждого подключения
+    assert exchange.symbols_prices['WSA/USDT'] == {'ask': 1.03, 'bid': 1.02}
+
+
+def test_stale_updates_are_ignored():
+    exchange = Bybit(spot=False)
+    exchange.set_listings('futures', {'WSAUSDT': 'WSA/USDT'})
+    frames = [
+        {"topic": "tickers.WSAUSDT", "ts": 2000, "data": {"symbol": "WSAUSDT", "ask1Price": "1.03", "bid1Price": "1.02", "fundingRate": "0.0004"}},
+        # Опоздавшее сообщение: старше уже применённого
+        {"topic": "tickers.WSAUSDT", "ts": 1000, "data": {"symbol": "WSAUSDT", "ask1Price": "0.9", "bid1Price": "0.89", "fundingRate": "0.0001"}},
+        # Повтор после переподключения приходит с тем же временем и применяется
+        {"topic": "tickers.WSAUSDT", "ts": 2000, "data": {"symbol": "WSAUSDT", "ask1Price": "1.04"}},
+    ]
+    stream, _, _ = asyncio.run(run_stream(BybitStream, exchange, frames, lambda stream, server: stream.messages == len(frames)))
+    assert exchange.symbols_prices['WSA/USDT'] == {'ask': 1.04, 'bid': 1.02}
+    assert exchange.funding_rates['WSA/USDT'] == 0.0004
+    assert stream.last_seen[('quote', 'WSAUSDT')] == 2000